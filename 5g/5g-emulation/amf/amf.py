@@ -1,37 +1,98 @@
 # amf.py
-import socket, logging
-
-logging.basicConfig(filename='amf.log', level=logging.DEBUG)
-
-def listen_gnb():
-    s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-    s.bind(('', 9001))
-    data, _ = s.recvfrom(1024)
-    logging.info("Received NAS from gNB")
-    return data
-
-def auth_with_ausf():
-    s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-    s.sendto(b'AUTH_REQ', ('192.168.0.3', 9002)) #ausf connections
-    logging.info("Requested authentication")
-
-def get_profile_from_udm():
-    s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-    s.sendto(b'GET_PROFILE', ('192.168.0.4', 9003)) # udm connections
-    logging.info("Requested profile")
-
-def request_ip_from_upf():
-    s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-    s.sendto(b'ALLOC_IP', ('192.168.0.5', 9004)) #upf
-    logging.info("Requested IP from UPF")
-
-def send_ip_to_ue():
-    s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-    s.sendto(b'10.0.0.5', ('10.0.0.5', 8000)) #ue
-    logging.info("Sent IP to UE")
-
-listen_gnb()
-auth_with_ausf()
-get_profile_from_udm()
-request_ip_from_upf()
-send_ip_to_ue()
+import logging
+
+from common import pdu
+from common.udp_runtime import UDPEndpoint, address_from_env, run
+
+AMF_ADDRESS = address_from_env("AMF_ADDRESS", ('', 9001))
+AUSF_ADDRESS = address_from_env("AUSF_ADDRESS", ('192.168.0.3', 9002)) #ausf connections
+UDM_ADDRESS = address_from_env("UDM_ADDRESS", ('192.168.0.4', 9003)) # udm connections
+UPF_ADDRESS = address_from_env("UPF_ADDRESS", ('192.168.0.5', 9004)) #upf
+
+class AMF:
+    """Runs a registration procedure per NAS message from the gNB; all of them
+    share one socket, so many UEs can be mid-procedure at the same time."""
+
+    def __init__(self, endpoint, ausf=AUSF_ADDRESS, udm=UDM_ADDRESS, upf=UPF_ADDRESS):
+        self.endpoint = endpoint
+        self.ausf = ausf
+        self.udm = udm
+        self.upf = upf
+        # ue_id -> K_SEAF of registered UEs
+        self.security_contexts = {}
+
+    async def auth_with_ausf(self, ue_id):
+        logging.info("Requested authentication")
+        reply = await self.endpoint.request(self.ausf, pdu.AUTH_REQUEST, ue_id)
+        if reply.cause() != pdu.CAUSE_OK:
+            return reply.cause()
+        k_seaf = reply.get(pdu.IE_K_SEAF)
+        if k_seaf is None:
+            return pdu.CAUSE_AUTH_FAILED
+        self.security_contexts[ue_id] = bytes(k_seaf)
+        return pdu.CAUSE_OK
+
+    async def get_profile_from_udm(self, ue_id):
+        logging.info("Requested profile")
+        reply = await self.endpoint.request(self.udm, pdu.PROFILE_REQUEST, ue_id)
+        if reply.cause() != pdu.CAUSE_OK:
+            return reply.cause(), None
+        return pdu.CAUSE_OK, reply.require(pdu.IE_DNN)
+
+    async def request_ip_from_upf(self, ue_id, dnn):
+        logging.info("Requested IP from UPF")
+        reply = await self.endpoint.request(self.upf, pdu.IP_ALLOC_REQUEST, ue_id, ((pdu.IE_DNN, dnn),))
+        if reply.cause() != pdu.CAUSE_OK:
+            return reply.cause(), None
+        return pdu.CAUSE_OK, reply.require(pdu.IE_UE_IP, 4)
+
+    async def release_ip_at_upf(self, ue_id):
+        logging.info("Released IP at UPF")
+        reply = await self.endpoint.request(self.upf, pdu.IP_RELEASE_REQUEST, ue_id)
+        return reply.cause()
+
+    async def handle(self, request, addr):
+        if request.msg_type == pdu.REGISTRATION_REQUEST:
+            return await self.handle_registration(request, addr)
+        if request.msg_type == pdu.DEREGISTRATION_REQUEST:
+            return await self.handle_deregistration(request, addr)
+        return None
+
+    async def handle_registration(self, request, addr):
+        ue_id = request.ue_id
+        logging.info("Received NAS from gNB for imsi-%015d", ue_id)
+        try:
+            cause = await self.auth_with_ausf(ue_id)
+            if cause == pdu.CAUSE_OK:
+                cause, dnn = await self.get_profile_from_udm(ue_id)
+            if cause == pdu.CAUSE_OK:
+                cause, address = await self.request_ip_from_upf(ue_id, dnn)
+        except pdu.DecodeError as e:
+            # A peer answered OK without an IE it owes us
+            logging.warning("Malformed answer for imsi-%015d: %s", ue_id, e)
+            cause = pdu.CAUSE_MALFORMED
+        if cause != pdu.CAUSE_OK:
+            logging.warning("Registration of imsi-%015d rejected, cause %d", ue_id, cause)
+            return pdu.REGISTRATION_REJECT, (pdu.cause(cause),)
+        # The IP goes back to the UE through the gNB, as the answer to its request
+        logging.info("Sent IP to UE")
+        return pdu.REGISTRATION_ACCEPT, ((pdu.IE_UE_IP, address),)
+
+    async def handle_deregistration(self, request, addr):
+        ue_id = request.ue_id
+        logging.info("Received deregistration from gNB for imsi-%015d", ue_id)
+        self.security_contexts.pop(ue_id, None)
+        # The UE's address goes back to the UPF pool for the next registration
+        cause = await self.release_ip_at_upf(ue_id)
+        if cause != pdu.CAUSE_OK:
+            logging.warning("Deregistration of imsi-%015d failed, cause %d", ue_id, cause)
+        return pdu.DEREGISTRATION_ACCEPT, (pdu.cause(cause),)
+
+async def serve(address=AMF_ADDRESS, **peers):
+    endpoint = await UDPEndpoint.open(address)
+    endpoint.handler = AMF(endpoint, **peers).handle
+    return endpoint
+
+if __name__ == '__main__':
+    logging.basicConfig(filename='amf.log', level=logging.DEBUG)
+    run(serve)
@@ -1,14 +1,25 @@
 # ausf.py
-import socket, logging
+import hmac, logging, os
 
-logging.basicConfig(filename='ausf.log', level=logging.DEBUG)
+from common import pdu
+from common.udp_runtime import UDPEndpoint, address_from_env, run
 
-def serve():
-    s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-    s.bind(('', 9002))
-    while True:
-        data, addr = s.recvfrom(1024)
-        logging.info("Received authentication request")
-        s.sendto(b'AUTH_OK', addr)
+AUSF_ADDRESS = address_from_env("AUSF_ADDRESS", ('', 9002))
+# Home network key the per-UE K_SEAF is derived from
+HOME_KEY = os.environ.get("AUSF_HOME_KEY", "5g-emulation-home-key").encode()
 
-serve()
+def derive_k_seaf(ue_id):
+    return hmac.digest(HOME_KEY, ue_id.to_bytes(8, 'big'), 'sha256')
+
+async def handle(request, addr):
+    if request.msg_type != pdu.AUTH_REQUEST:
+        return None
+    logging.info("Received authentication request for imsi-%015d", request.ue_id)
+    return pdu.AUTH_RESPONSE, (pdu.cause(pdu.CAUSE_OK), (pdu.IE_K_SEAF, derive_k_seaf(request.ue_id)))
+
+async def serve(address=AUSF_ADDRESS):
+    return await UDPEndpoint.open(address, handle)
+
+if __name__ == '__main__':
+    logging.basicConfig(filename='ausf.log', level=logging.DEBUG)
+    run(serve)
@@ -0,0 +1 @@
+# Helpers shared by the 5g-emulation network functions
@@ -0,0 +1,160 @@
+import socket
+import struct
+
+# Fixed header: message type, flags, body length, transaction ID, UE ID.
+# The UE ID is the numeric IMSI (MCC+MNC+MSIN fits in 64 bits).
+HEADER = struct.Struct("!BBHIQ")
+# Body: type-length-value information elements
+IE_HEADER = struct.Struct("!BH")
+MAX_PDU = 1472  # one UDP datagram on a 1500-byte MTU
+
+FLAG_RESPONSE = 0x01
+
+# Message types
+REGISTRATION_REQUEST = 1
+REGISTRATION_ACCEPT = 2
+REGISTRATION_REJECT = 3
+AUTH_REQUEST = 4
+AUTH_RESPONSE = 5
+PROFILE_REQUEST = 6
+PROFILE_RESPONSE = 7
+IP_ALLOC_REQUEST = 8
+IP_ALLOC_RESPONSE = 9
+DEREGISTRATION_REQUEST = 10
+DEREGISTRATION_ACCEPT = 11
+IP_RELEASE_REQUEST = 12
+IP_RELEASE_RESPONSE = 13
+
+# Information elements
+IE_CAUSE = 1      # 1 byte, see CAUSE_*
+IE_UE_IP = 2      # 4 bytes, IPv4
+IE_K_SEAF = 3     # 32 bytes
+IE_DNN = 4        # ASCII
+IE_RES = 5        # authentication response
+
+CAUSE_OK = 0
+CAUSE_AUTH_FAILED = 1
+CAUSE_UNKNOWN_UE = 2
+CAUSE_NO_RESOURCES = 3
+CAUSE_MALFORMED = 4
+
+
+class DecodeError(ValueError):
+    pass
+
+
+class PDU:
+    """A received PDU. The body and IE values are memoryviews into the
+    datagram, so decoding copies nothing."""
+
+    __slots__ = ("msg_type", "flags", "txid", "ue_id", "body")
+
+    def __init__(self, msg_type, flags, txid, ue_id, body):
+        self.msg_type = msg_type
+        self.flags = flags
+        self.txid = txid
+        self.ue_id = ue_id
+        self.body = body
+
+    @property
+    def is_response(self):
+        return bool(self.flags & FLAG_RESPONSE)
+
+    def ies(self):
+        """Yields (tag, value) for every IE in the body."""
+        body = self.body
+        offset = 0
+        end = len(body)
+        while offset < end:
+            if offset + IE_HEADER.size > end:
+                raise DecodeError("truncated IE header")
+            tag, length = IE_HEADER.unpack_from(body, offset)
+            offset += IE_HEADER.size
+            if offset + length > end:
+                raise DecodeError(f"IE {tag} overruns the body")
+            yield tag, body[offset:offset + length]
+            offset += length
+
+    def get(self, tag, default=None):
+        # Same walk as ies(), without a generator: this runs for every IE read
+        body = self.body
+        offset = 0
+        end = len(body)
+        while offset + IE_HEADER.size <= end:
+            ie_tag, length = IE_HEADER.unpack_from(body, offset)
+            offset += IE_HEADER.size
+            if ie_tag == tag:
+                if offset + length > end:
+                    raise DecodeError(f"IE {tag} overruns the body")
+                return body[offset:offset + length]
+            offset += length
+        return default
+
+    def require(self, tag, size=None):
+        """get() for an IE the message cannot do without; DecodeError if it
+        is missing or not size bytes long."""
+        value = self.get(tag)
+        if value is None:
+            raise DecodeError(f"missing IE {tag}")
+        if size is not None and len(value) != size:
+            raise DecodeError(f"IE {tag} is {len(value)} bytes, expected {size}")
+        return value
+
+    def cause(self):
+        value = self.get(IE_CAUSE)
+        return value[0] if value is not None and len(value) else CAUSE_OK
+
+    def ue_ip(self):
+        value = self.get(IE_UE_IP)
+        return socket.inet_ntoa(value) if value is not None else None
+
+
+def decode(data):
+    """Parses one datagram (bytes, bytearray or memoryview) into a PDU."""
+    view = data if isinstance(data, memoryview) else memoryview(data)
+    if len(view) < HEADER.size:
+        raise DecodeError("shorter than the PDU header")
+    msg_type, flags, length, txid, ue_id = HEADER.unpack_from(view)
+    if HEADER.size + length > len(view):
+        raise DecodeError("body shorter than its declared length")
+    return PDU(msg_type, flags, txid, ue_id, view[HEADER.size:HEADER.size + length])
+
+
+class Encoder:
+    """Encodes PDUs into one preallocated buffer.
+
+    encode() returns a memoryview of the buffer that is only valid until the
+    next encode(); hand it straight to sendto(), or bytes() it to keep it.
+    """
+
+    def __init__(self, size=MAX_PDU):
+        self.buffer = bytearray(size)
+        self.view = memoryview(self.buffer)
+
+    def encode(self, msg_type, txid, ue_id, ies=(), flags=0):
+        buffer = self.buffer
+        size = len(buffer)
+        offset = HEADER.size
+        for tag, value in ies:
+            length = len(value)
+            end = offset + IE_HEADER.size + length
+            if end > size:
+                raise ValueError("PDU exceeds the encoder buffer")
+            IE_HEADER.pack_into(buffer, offset, tag, length)
+            buffer[offset + IE_HEADER.size:end] = value
+            offset = end
+        HEADER.pack_into(buffer, 0, msg_type, flags, offset - HEADER.size, txid, ue_id)
+        return self.view[:offset]
+
+
+def cause(code):
+    return (IE_CAUSE, bytes((code,)))
+
+
+def ue_ip(address):
+    return (IE_UE_IP, socket.inet_aton(address))
+
+
+def imsi_to_ue_id(imsi):
+    """"imsi-001010000000001" or "001010000000001" -> 1010000000001."""
+    return int(imsi[5:] if imsi.startswith("imsi-") else imsi)
@@ -0,0 +1,183 @@
+import asyncio
+import collections
+import itertools
+import logging
+import os
+import random
+import socket
+
+from common.pdu import FLAG_RESPONSE, DecodeError, Encoder, decode
+
+RESPONSE_TIMEOUT = float(os.environ.get("NF_RESPONSE_TIMEOUT", "0.5"))  # seconds, doubled per retry
+RETRIES = int(os.environ.get("NF_RETRIES", "3"))
+# Answered requests remembered per endpoint, so a retransmitted request gets
+# the same answer instead of running the handler twice
+REPLY_CACHE_SIZE = 65536
+# Socket buffers sized for bursts from thousands of concurrent procedures; the
+# kernel caps them at net.core.rmem_max / wmem_max
+SOCKET_BUFFER = int(os.environ.get("NF_SOCKET_BUFFER", str(4 << 20)))
+
+
+def address_from_env(name, default):
+    """"host:port" from the environment, or the default (host, port)."""
+    value = os.environ.get(name)
+    if not value:
+        return default
+    host, _, port = value.rpartition(":")
+    return (host, int(port))
+
+
+class UDPEndpoint(asyncio.DatagramProtocol):
+    """One long-lived UDP socket that both serves requests and makes them.
+
+    Messages are PDUs (common/pdu.py). Outgoing requests get a transaction
+    ID and wait on a future that the matching response resolves, so any
+    number of procedures can be in flight on the socket at once. Unanswered
+    requests are retransmitted with exponential backoff and fail with
+    asyncio.TimeoutError after the last try. Incoming requests run
+    handler(pdu, addr) as a task; it returns (msg_type, ies) to answer with
+    the request's transaction and UE ID, or None for no reply.
+    """
+
+    def __init__(self, handler=None, timeout=RESPONSE_TIMEOUT, retries=RETRIES, drop_rate=0.0):
+        self.handler = handler
+        self.timeout = timeout
+        self.retries = retries
+        # Fraction of outgoing datagrams discarded, to exercise retransmission
+        self.drop_rate = drop_rate
+        self.loop = None
+        self.transport = None
+        # txid -> response future and retransmission timer of own requests
+        self.pending = {}
+        self.timers = {}
+        self.txids = itertools.count(random.getrandbits(32))
+        self.replies = collections.OrderedDict()
+        # Requests being handled; the loop only keeps weak references to tasks
+        self.tasks = set()
+        self.encoder = Encoder()
+        self.stats = collections.Counter()
+
+    @classmethod
+    async def open(cls, local_addr, handler=None, **kwargs):
+        loop = asyncio.get_running_loop()
+        _, endpoint = await loop.create_datagram_endpoint(lambda: cls(handler, **kwargs), local_addr=local_addr)
+        return endpoint
+
+    @property
+    def address(self):
+        return self.transport.get_extra_info("sockname")[:2]
+
+    def connection_made(self, transport):
+        self.loop = asyncio.get_running_loop()
+        self.transport = transport
+        sock = transport.get_extra_info("socket")
+        for option in (socket.SO_RCVBUF, socket.SO_SNDBUF):
+            sock.setsockopt(socket.SOL_SOCKET, option, SOCKET_BUFFER)
+
+    def _send(self, datagram, addr):
+        if self.drop_rate and random.random() < self.drop_rate:
+            self.stats["dropped"] += 1
+            return
+        self.transport.sendto(datagram, addr)
+
+    def datagram_received(self, data, addr):
+        try:
+            pdu = decode(data)
+        except DecodeError:
+            self.stats["malformed"] += 1
+            return
+        if pdu.is_response:
+            future = self.pending.get(pdu.txid)
+            if future is not None and not future.done():
+                future.set_result(pdu)
+            else:
+                # Answer to a request that was retransmitted or gave up
+                self.stats["late_responses"] += 1
+            return
+        if self.handler is None:
+            return
+
+        key = (addr, pdu.txid)
+        if key in self.replies:
+            self.stats["duplicate_requests"] += 1
+            reply = self.replies[key]
+            # None while the first copy is still being handled
+            if reply is not None:
+                self._send(reply, addr)
+            return
+        self.replies[key] = None
+        if len(self.replies) > REPLY_CACHE_SIZE:
+            self.replies.popitem(last=False)
+        task = self.loop.create_task(self._serve(pdu, addr, key))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    async def _serve(self, pdu, addr, key):
+        try:
+            response = await self.handler(pdu, addr)
+        except asyncio.TimeoutError as e:
+            # A peer further down the chain is unreachable; stay silent so
+            # the requester retransmits or times out in turn
+            logging.warning("Request from %s failed: %s", addr, e)
+            self.replies.pop(key, None)
+            return
+        except Exception:
+            logging.exception("Handler failed for request from %s", addr)
+            # Let a retransmission try again
+            self.replies.pop(key, None)
+            return
+        if response is None:
+            return
+        msg_type, ies = response
+        # Kept for retransmitted requests, so this one is copied out of the encoder
+        reply = bytes(self.encoder.encode(msg_type, pdu.txid, pdu.ue_id, ies, FLAG_RESPONSE))
+        self.replies[key] = reply
+        self._send(reply, addr)
+
+    async def request(self, addr, msg_type, ue_id=0, ies=(), timeout=None, retries=None):
+        """Sends a request PDU and returns the response PDU. ies is a
+        sequence of (tag, value) pairs, re-encoded on every retransmission."""
+        timeout = self.timeout if timeout is None else timeout
+        retries = self.retries if retries is None else retries
+        txid = next(self.txids) & 0xffffffff
+        future = self.loop.create_future()
+        self.pending[txid] = future
+        self._transmit(txid, addr, msg_type, ue_id, ies, timeout, retries, 0)
+        try:
+            return await future
+        finally:
+            del self.pending[txid]
+            self.timers.pop(txid).cancel()
+
+    def _transmit(self, txid, addr, msg_type, ue_id, ies, timeout, retries, attempt):
+        # Driven by a timer rather than a wait_for() per try, and a method
+        # rather than a closure so a request leaves no reference cycles for
+        # the garbage collector: a pending request is one future and one timer
+        future = self.pending[txid]
+        if future.done():
+            return
+        if attempt > retries:
+            self.stats["timeouts"] += 1
+            future.set_exception(asyncio.TimeoutError(
+                f"no response from {addr[0]}:{addr[1]} after {retries + 1} tries"))
+            return
+        if attempt:
+            self.stats["retransmissions"] += 1
+        self._send(self.encoder.encode(msg_type, txid, ue_id, ies), addr)
+        self.timers[txid] = self.loop.call_later(timeout * 2 ** attempt, self._transmit, txid, addr, msg_type,
+                                                 ue_id, ies, timeout, retries, attempt + 1)
+
+    def close(self):
+        if self.transport is not None:
+            self.transport.close()
+
+
+def run(serve):
+    """Runs serve() (a coroutine opening the NF's endpoints) until interrupted."""
+    async def main():
+        await serve()
+        await asyncio.Event().wait()
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
@@ -1,20 +1,14 @@
 # gnb.py
-import socket, logging, os
+import logging, os
 import subprocess
 
-logging.basicConfig(filename='gnb.log', level=logging.DEBUG)
+from common import pdu
+from common.udp_runtime import UDPEndpoint, address_from_env, run
 
-def receive_from_ue():
-    s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-    s.bind(('', 9000))
-    data, _ = s.recvfrom(1024)
-    logging.info("Received registration from UE")
-    return data
-
-def send_to_amf(data):
-    s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-    s.sendto(data, ('192.168.0.2', 9001))
-    logging.info("Forwarded to AMF")
+GNB_ADDRESS = address_from_env("GNB_ADDRESS", ('', 9000))
+AMF_ADDRESS = address_from_env("AMF_ADDRESS", ('192.168.0.2', 9001))
+# Skip host network changes, for running on loopback (loadgen.py --local)
+DRY_RUN = os.environ.get("NF_DRY_RUN") == "1"
 
 # def setup_gtp():
 #     os.system("ip link add gtp0 type gtp")
@@ -23,6 +17,8 @@ def send_to_amf(data):
 #     logging.info("GTP tunnel created")
 
 def setup_gtp():
+    if DRY_RUN:
+        return
     try:
         subprocess.run(["ip", "link", "add", "gtp0", "type", "gtp"], check=True)
         subprocess.run(["ip", "addr", "add", "10.1.1.1/24", "dev", "gtp0"], check=True)
@@ -30,6 +26,23 @@ def setup_gtp():
     except subprocess.CalledProcessError as e:
         print(f"Error setting up GTP: {e}")
 
-data = receive_from_ue()
-send_to_amf(data)
-setup_gtp()
+async def serve(address=GNB_ADDRESS, amf=AMF_ADDRESS):
+    endpoint = await UDPEndpoint.open(address)
+
+    async def send_to_amf(request, addr):
+        # Relay the UE's request and hand the AMF's answer back to the UE
+        if request.msg_type not in (pdu.REGISTRATION_REQUEST, pdu.DEREGISTRATION_REQUEST):
+            return None
+        logging.info("Received %s from UE",
+                     "registration" if request.msg_type == pdu.REGISTRATION_REQUEST else "deregistration")
+        reply = await endpoint.request(amf, request.msg_type, request.ue_id, list(request.ies()))
+        logging.info("Forwarded to AMF")
+        return reply.msg_type, list(reply.ies())
+
+    endpoint.handler = send_to_amf
+    return endpoint
+
+if __name__ == '__main__':
+    logging.basicConfig(filename='gnb.log', level=logging.DEBUG)
+    setup_gtp()
+    run(serve)
@@ -0,0 +1,152 @@
+"""Registration load generator for the 5g-emulation UDP network functions.
+
+Runs --ues registrations (UE -> gNB -> AMF -> AUSF/UDM/UPF and back), one per
+UE ID, with at most --concurrency in flight, all multiplexed over one UE-side
+socket, and reports throughput, p50/p95/p99 latency and the retransmission
+counters. With --deregister each UE deregisters right after it is accepted,
+which hands its address back to the UPF pool.
+
+With --local every NF runs in this process on loopback ports with host
+network changes disabled, so no Docker is needed; --drop-rate discards that
+fraction of every NF's outgoing datagrams to exercise retransmission:
+
+    python loadgen.py --local --ues 20000 --concurrency 512
+    python loadgen.py --local --ues 2000 --drop-rate 0.05
+    python loadgen.py --local --ues 20000 --deregister
+
+Against the compose deployment, run it on the access network:
+
+    python loadgen.py --gnb 10.0.0.10:9000 --ues 1000
+"""
+import argparse
+import asyncio
+import collections
+import importlib.util
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, ROOT)
+from common import pdu  # noqa: E402
+from common.udp_runtime import UDPEndpoint  # noqa: E402
+
+LOOPBACK = ('127.0.0.1', 0)
+FIRST_UE_ID = pdu.imsi_to_ue_id("imsi-001010000000001")
+
+
+def load_nf(name):
+    spec = importlib.util.spec_from_file_location(name, os.path.join(ROOT, name, f"{name}.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+async def start_local_core(drop_rate):
+    """Starts every NF on an ephemeral loopback port; returns the gNB address
+    and the endpoints, whose stats are reported at the end."""
+    os.environ["NF_DRY_RUN"] = "1"
+    # Room for millions of UEs
+    os.environ.setdefault("UPF_UE_SUBNET", "10.128.0.0/9")
+    ausf = await load_nf("ausf").serve(LOOPBACK)
+    udm = await load_nf("udm").serve(LOOPBACK)
+    upf = await load_nf("upf").serve(LOOPBACK)
+    amf = await load_nf("amf").serve(LOOPBACK, ausf=ausf.address, udm=udm.address, upf=upf.address)
+    gnb = await load_nf("gnb").serve(LOOPBACK, amf=amf.address)
+    endpoints = {"gnb": gnb, "amf": amf, "ausf": ausf, "udm": udm, "upf": upf}
+    for endpoint in endpoints.values():
+        endpoint.drop_rate = drop_rate
+    return gnb.address, endpoints
+
+
+def percentile(samples, p):
+    return samples[min(len(samples) - 1, int(len(samples) * p / 100))] if samples else float("nan")
+
+
+async def run(args):
+    endpoints = {}
+    if args.local:
+        gnb, endpoints = await start_local_core(args.drop_rate)
+    else:
+        host, _, port = args.gnb.rpartition(":")
+        gnb = (host, int(port))
+    ue = await UDPEndpoint.open(LOOPBACK if args.local else ('', 0), drop_rate=args.drop_rate if args.local else 0.0)
+    endpoints["ue"] = ue
+
+    latencies = []
+    deregistrations = []
+    errors = collections.Counter()
+    slots = asyncio.Semaphore(args.concurrency)
+
+    # Addresses held by registered UEs; one handed out twice is a pool bug
+    addresses = set()
+
+    async def register(ue_id):
+        async with slots:
+            start = time.perf_counter()
+            try:
+                reply = await ue.request(gnb, pdu.REGISTRATION_REQUEST, ue_id)
+            except asyncio.TimeoutError:
+                errors["timeout"] += 1
+                return
+            if reply.msg_type != pdu.REGISTRATION_ACCEPT:
+                errors[f"rejected (cause {reply.cause()})"] += 1
+                return
+            latencies.append(time.perf_counter() - start)
+            address = reply.ue_ip()
+            if address in addresses:
+                errors["duplicate UE addresses"] += 1
+            addresses.add(address)
+            if not args.deregister:
+                return
+            # Released at the UPF before the accept gets back here, so it
+            # may already belong to another UE by then
+            addresses.discard(address)
+            start = time.perf_counter()
+            try:
+                reply = await ue.request(gnb, pdu.DEREGISTRATION_REQUEST, ue_id)
+            except asyncio.TimeoutError:
+                errors["deregistration timeout"] += 1
+                return
+            if reply.cause() != pdu.CAUSE_OK:
+                errors[f"deregistration failed (cause {reply.cause()})"] += 1
+                return
+            deregistrations.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(register(FIRST_UE_ID + i) for i in range(args.ues)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    deregistrations.sort()
+    print(f"{len(latencies)}/{args.ues} registrations in {elapsed:.2f} s "
+          f"({len(latencies) / elapsed:.0f}/s, concurrency {args.concurrency})")
+    print(f"latency p50 {percentile(latencies, 50) * 1e3:.2f} ms, p95 {percentile(latencies, 95) * 1e3:.2f} ms, "
+          f"p99 {percentile(latencies, 99) * 1e3:.2f} ms")
+    if args.deregister:
+        print(f"{len(deregistrations)} deregistrations, p50 {percentile(deregistrations, 50) * 1e3:.2f} ms, "
+              f"p99 {percentile(deregistrations, 99) * 1e3:.2f} ms")
+    if errors:
+        print("errors: " + ", ".join(f"{kind} {count}" for kind, count in errors.items()))
+    for name, endpoint in endpoints.items():
+        if endpoint.stats:
+            print(f"{name}: " + ", ".join(f"{key} {value}" for key, value in sorted(endpoint.stats.items())))
+    for endpoint in endpoints.values():
+        endpoint.close()
+    return 1 if errors["timeout"] or errors["deregistration timeout"] else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--local", action="store_true", help="run every NF in this process on loopback")
+    parser.add_argument("--gnb", default="10.0.0.10:9000", help="gNB host:port when not --local")
+    parser.add_argument("--ues", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=256)
+    parser.add_argument("--drop-rate", type=float, default=0.0, help="fraction of datagrams dropped (--local)")
+    parser.add_argument("--deregister", action="store_true", help="deregister each UE once it is accepted")
+    args = parser.parse_args()
+    return asyncio.run(run(args))
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -1,14 +1,22 @@
 # udm.py
-import socket, logging
+import logging, os
 
-logging.basicConfig(filename='udm.log', level=logging.DEBUG)
+from common import pdu
+from common.udp_runtime import UDPEndpoint, address_from_env, run
 
-def serve():
-    s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-    s.bind(('', 9003))
-    while True:
-        data, addr = s.recvfrom(1024)
-        logging.info("Received profile request")
-        s.sendto(b'USER_PROFILE_OK', addr)
+UDM_ADDRESS = address_from_env("UDM_ADDRESS", ('', 9003))
+# Every subscriber gets the same profile
+DEFAULT_DNN = os.environ.get("UDM_DEFAULT_DNN", "internet").encode()
 
-serve()
+async def handle(request, addr):
+    if request.msg_type != pdu.PROFILE_REQUEST:
+        return None
+    logging.info("Received profile request for imsi-%015d", request.ue_id)
+    return pdu.PROFILE_RESPONSE, (pdu.cause(pdu.CAUSE_OK), (pdu.IE_DNN, DEFAULT_DNN))
+
+async def serve(address=UDM_ADDRESS):
+    return await UDPEndpoint.open(address, handle)
+
+if __name__ == '__main__':
+    logging.basicConfig(filename='udm.log', level=logging.DEBUG)
+    run(serve)
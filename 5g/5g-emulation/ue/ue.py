@@ -1,19 +1,25 @@
 # ue.py
-import socket, time, logging, os
+import asyncio, logging, os
 
-logging.basicConfig(filename='ue.log', level=logging.DEBUG)
+from common import pdu
+from common.udp_runtime import UDPEndpoint, address_from_env
 
-def send_registration():
-    s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-    s.sendto(b'UE_REG_REQUEST', ('10.0.0.10', 9000))
-    logging.info("Sent registration to gNB")
+UE_ADDRESS = address_from_env("UE_ADDRESS", ('', 8000))
+GNB_ADDRESS = address_from_env("GNB_ADDRESS", ('10.0.0.10', 9000))
+UE_ID = pdu.imsi_to_ue_id(os.environ.get("UE_IMSI", "imsi-001010000000001"))
 
-def wait_for_ip():
-    s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-    s.bind(('', 8000))
-    data, _ = s.recvfrom(1024)
-    ip = data.decode()
+async def send_registration(endpoint, gnb=GNB_ADDRESS, ue_id=UE_ID):
+    logging.info("Sent registration to gNB")
+    # Retransmitted until the gNB answers; the answer carries the UE's IP
+    reply = await endpoint.request(gnb, pdu.REGISTRATION_REQUEST, ue_id)
+    if reply.msg_type != pdu.REGISTRATION_ACCEPT:
+        logging.error(f"Registration rejected, cause {reply.cause()}")
+        return None
+    ip = reply.ue_ip()
     logging.info(f"Received IP: {ip}")
+    return ip
+
+def configure_ip(ip):
     os.system(f"ip addr add {ip}/24 dev eth0")  # simple example
     os.system("ip route add default via 10.0.0.10")
 
@@ -21,6 +27,16 @@ def test_connectivity():
     logging.info("Testing internet connectivity...")
     os.system("ping -c 3 8.8.8.8 >> ue_ping.log 2>> ue_ping.err")
 
-send_registration()
-wait_for_ip()
-test_connectivity()
+async def main():
+    endpoint = await UDPEndpoint.open(UE_ADDRESS)
+    try:
+        return await send_registration(endpoint)
+    finally:
+        endpoint.close()
+
+if __name__ == '__main__':
+    logging.basicConfig(filename='ue.log', level=logging.DEBUG)
+    ip = asyncio.run(main())
+    if ip:
+        configure_ip(ip)
+        test_connectivity()
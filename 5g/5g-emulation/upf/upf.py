@@ -1,17 +1,88 @@
 # upf.py
-import socket, logging, os
-
-logging.basicConfig(filename='upf.log', level=logging.DEBUG)
-
-def serve():
-    s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-    s.bind(('', 9004))
-    while True:
-        data, addr = s.recvfrom(1024)
-        if data == b'ALLOC_IP':
-            logging.info("Allocating IP to UE")
-            # Setup NAT for internet access
-            os.system("iptables -t nat -A POSTROUTING -s 10.0.0.0/24 -o eth0 -j MASQUERADE")
-            s.sendto(b'IP_ALLOC_OK', addr)
-
-serve()
+import ipaddress, logging, os
+
+from common import pdu
+from common.udp_runtime import UDPEndpoint, address_from_env, run
+
+UPF_ADDRESS = address_from_env("UPF_ADDRESS", ('', 9004))
+UE_SUBNET = ipaddress.ip_network(os.environ.get("UPF_UE_SUBNET", "10.0.0.0/24"))
+# The single compose UE has always been given 10.0.0.5
+FIRST_HOST = 5
+# NF addresses on the UE subnet, never handed out: the access bridge gateway
+# and the gNB (docker-compose.yml)
+RESERVED = frozenset(ipaddress.ip_address(address) for address in
+                     os.environ.get("UPF_RESERVED_ADDRESSES", "10.0.0.1,10.0.0.10").split(",") if address)
+# Skip host network changes, for running on loopback (loadgen.py --local)
+DRY_RUN = os.environ.get("NF_DRY_RUN") == "1"
+
+class AddressPool:
+    """UE addresses handed out in order, one per UE ID; asking again for the
+    same UE (a retried registration) returns the address it already has.
+    Released addresses are reused before new ones, reserved ones are skipped."""
+
+    def __init__(self, subnet=UE_SUBNET, first_host=FIRST_HOST, reserved=RESERVED):
+        self.next = int(subnet.network_address) + first_host
+        self.last = int(subnet.broadcast_address) - 1
+        self.reserved = {int(address) for address in reserved}
+        self.free = []
+        self.by_ue = {}
+
+    def allocate(self, ue_id):
+        address = self.by_ue.get(ue_id)
+        if address is None:
+            if self.free:
+                address = self.free.pop()
+            else:
+                while self.next in self.reserved:
+                    self.next += 1
+                if self.next > self.last:
+                    return None
+                address = self.next.to_bytes(4, 'big')
+                self.next += 1
+            self.by_ue[ue_id] = address
+        return address
+
+    def release(self, ue_id):
+        """Returns the UE's address to the pool; False if it had none."""
+        address = self.by_ue.pop(ue_id, None)
+        if address is None:
+            return False
+        self.free.append(address)
+        return True
+
+pool = AddressPool()
+
+def setup_nat():
+    # Setup NAT for internet access, once for the whole UE subnet
+    if not DRY_RUN:
+        os.system(f"iptables -t nat -C POSTROUTING -s {UE_SUBNET} -o eth0 -j MASQUERADE 2>/dev/null"
+                  f" || iptables -t nat -A POSTROUTING -s {UE_SUBNET} -o eth0 -j MASQUERADE")
+    logging.info("NAT configured")
+
+async def handle(request, addr):
+    if request.msg_type == pdu.IP_RELEASE_REQUEST:
+        if not pool.release(request.ue_id):
+            return pdu.IP_RELEASE_RESPONSE, (pdu.cause(pdu.CAUSE_UNKNOWN_UE),)
+        logging.info("Released IP of UE imsi-%015d", request.ue_id)
+        return pdu.IP_RELEASE_RESPONSE, (pdu.cause(pdu.CAUSE_OK),)
+    if request.msg_type != pdu.IP_ALLOC_REQUEST:
+        return None
+    try:
+        request.require(pdu.IE_DNN)
+    except pdu.DecodeError as e:
+        logging.warning("Malformed IP request for imsi-%015d: %s", request.ue_id, e)
+        return pdu.IP_ALLOC_RESPONSE, (pdu.cause(pdu.CAUSE_MALFORMED),)
+    address = pool.allocate(request.ue_id)
+    if address is None:
+        logging.warning("UE address pool exhausted")
+        return pdu.IP_ALLOC_RESPONSE, (pdu.cause(pdu.CAUSE_NO_RESOURCES),)
+    logging.info("Allocating IP to UE imsi-%015d", request.ue_id)
+    return pdu.IP_ALLOC_RESPONSE, (pdu.cause(pdu.CAUSE_OK), (pdu.IE_UE_IP, address))
+
+async def serve(address=UPF_ADDRESS):
+    return await UDPEndpoint.open(address, handle)
+
+if __name__ == '__main__':
+    logging.basicConfig(filename='upf.log', level=logging.DEBUG)
+    setup_nat()
+    run(serve)
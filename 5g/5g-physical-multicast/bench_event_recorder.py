@@ -0,0 +1,83 @@
+"""Cost of recording per-UE ACK/NACK events: text logging against the recorder.
+
+The text baseline is the per-UE logging the simulator used to do: one
+eagerly formatted logging.info call per member per packet, written through
+a handler to /dev/null, so the cost is formatting and logging, not the disk.
+The recorder appends each packet's receptions to its columnar buffer with
+one record_many() call, in memory (ring) or streamed to a binary file.
+
+    python bench_event_recorder.py --members 100 1000 10000 --packets 200
+"""
+import argparse
+import logging
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from event_recorder import EVENT_RECEPTION, EventRecorder, load, summarize
+
+
+def text_log(logger, packet_ids, ue_ids, acks):
+    for packet_id, packet_acks in zip(packet_ids, acks):
+        for ue_id, ack in zip(ue_ids, packet_acks):
+            logger.info(f"PHY: UE {ue_id} received packet {packet_id} -> {'ACK' if ack else 'NACK'}")
+
+
+def record(recorder, packet_ids, ue_ids, acks):
+    for packet_id, packet_acks in zip(packet_ids, acks):
+        recorder.record_many(EVENT_RECEPTION, ue_ids, packet_id, packet_acks)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--members", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--packets", type=int, default=200)
+    args = parser.parse_args()
+
+    logger = logging.getLogger("bench")
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    logger.addHandler(logging.FileHandler(os.devnull))
+    rng = np.random.default_rng(1)
+    directory = tempfile.mkdtemp()
+
+    print(f"{'members':>8} {'recording':>14} {'events/s':>12} {'speedup':>8} {'bytes/event':>12}")
+    for members in args.members:
+        ue_ids = np.arange(1, members + 1)
+        packet_ids = np.arange(1, args.packets + 1)
+        acks = rng.random((args.packets, members)) < 0.9
+        events = acks.size
+
+        # The text log is slow enough at many members that fewer packets suffice
+        text_packets = max(1, min(args.packets, 200_000 // members))
+        start = time.perf_counter()
+        text_log(logger, packet_ids[:text_packets], ue_ids.tolist(), acks[:text_packets].tolist())
+        text_rate = text_packets * members / (time.perf_counter() - start)
+        print(f"{members:>8} {'text logging':>14} {text_rate:>12.3g} {1:>8.1f}")
+
+        ring = EventRecorder(capacity=1 << 20)
+        start = time.perf_counter()
+        record(ring, packet_ids, ue_ids, acks)
+        rate = events / (time.perf_counter() - start)
+        print(f"{members:>8} {'recorder ring':>14} {rate:>12.3g} {rate / text_rate:>8.0f}")
+
+        path = os.path.join(directory, f"events-{members}.bin")
+        streamed = EventRecorder(capacity=1 << 16, path=path)
+        start = time.perf_counter()
+        record(streamed, packet_ids, ue_ids, acks)
+        streamed.close()
+        rate = events / (time.perf_counter() - start)
+        print(f"{members:>8} {'recorder file':>14} {rate:>12.3g} {rate / text_rate:>8.0f} "
+              f"{os.path.getsize(path) / events:>12.1f}")
+
+        records = load(path)
+        assert summarize(records) == streamed.summary() == ring.summary()
+        assert np.array_equal(records["value"].reshape(acks.shape), acks)
+        os.remove(path)
+    os.rmdir(directory)
+
+
+if __name__ == '__main__':
+    main()
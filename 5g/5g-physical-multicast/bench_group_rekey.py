@@ -0,0 +1,90 @@
+"""Rekey cost of the LKH group key tree against group size and batch size.
+
+For each group size, times single joins and leaves on a populated tree and
+reports rekey messages, bytes and CPU time per event. The last column is
+the message count of naive rekeying, which unicasts the new group key to
+every member.
+
+The churn table replays a random join/leave stream arriving at --event-rate
+per second against the largest group, batched by BatchRekeyScheduler with
+different max_pending thresholds, and reports rekey cost next to the
+forward-secrecy lag each batch size costs.
+
+    python bench_group_rekey.py --sizes 100 1000 10000 100000 --events 1000
+"""
+import argparse
+import random
+import time
+
+from group_key_manager import BatchRekeyScheduler, KeyTree
+
+
+def measure(tree, events, op):
+    messages = size = 0
+    start = time.process_time()
+    for member_id in events:
+        rekey = op(member_id)
+        messages += len(rekey)
+        size += sum(message.size for message in rekey)
+    cpu = time.process_time() - start
+    return messages / len(events), size / len(events), cpu / len(events) * 1e6
+
+
+def churn(size, max_pending, events, event_rate):
+    tree = KeyTree(g_rnti=1000, capacity=size)
+    tree.join_many(range(size))
+    now = [0.0]
+    scheduler = BatchRekeyScheduler(tree, interval=float("inf"), max_pending=max_pending,
+                                    clock=lambda: now[0])
+    members = list(range(size))
+    next_id = size
+    start = time.process_time()
+    for _ in range(events):
+        now[0] += 1.0 / event_rate
+        if random.random() < 0.5:
+            scheduler.request_join(next_id)
+            members.append(next_id)
+            next_id += 1
+        else:
+            index = random.randrange(len(members))
+            members[index], members[-1] = members[-1], members[index]
+            scheduler.request_leave(members.pop())
+    scheduler.flush()
+    cpu = time.process_time() - start
+    return scheduler.metrics.summary(), cpu / events * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000, 100000])
+    parser.add_argument("--events", type=int, default=1000)
+    parser.add_argument("--batches", type=int, nargs="+", default=[1, 8, 64, 512])
+    parser.add_argument("--event-rate", type=float, default=100.0, help="membership changes per second")
+    args = parser.parse_args()
+
+    print(f"{'members':>8} {'op':>6} {'msgs/event':>11} {'bytes/event':>12} {'cpu us/event':>13} {'naive msgs':>11}")
+    for size in args.sizes:
+        tree = KeyTree(g_rnti=1000, capacity=size)
+        start = time.process_time()
+        tree.join_many(range(size))
+        setup = time.process_time() - start
+
+        leavers = random.sample(range(size), min(args.events, size))
+        for op_name, op, events in (("leave", tree.leave, leavers), ("join", tree.join, leavers)):
+            msgs, size_bytes, cpu_us = measure(tree, events, op)
+            print(f"{size:>8} {op_name:>6} {msgs:>11.1f} {size_bytes:>12.0f} {cpu_us:>13.1f} {size:>11}")
+        print(f"{'':>8} initial keying of {size} members: {setup * 1e3:.0f} ms CPU")
+
+    size = max(args.sizes)
+    print(f"\nchurn on {size} members, {args.event_rate:.0f} events/s")
+    print(f"{'batch':>6} {'msgs/event':>11} {'bytes/event':>12} {'cpu us/event':>13} "
+          f"{'mean lag s':>11} {'p95 lag s':>10}")
+    for max_pending in args.batches:
+        summary, cpu_us = churn(size, max_pending, args.events, args.event_rate)
+        print(f"{max_pending:>6} {summary['messages_per_event']:>11.1f} "
+              f"{summary['bytes'] / summary['events']:>12.0f} {cpu_us:>13.1f} "
+              f"{summary['mean_leave_lag']:>11.3f} {summary['p95_leave_lag']:>10.3f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+"""Multicast group membership at scale: indexed member sets against a scan.
+
+Splits --ues connected UEs over --groups groups, then times the per-packet
+member lookup (the MemberSet index against np.flatnonzero over the UETable's
+g_rnti column, which the PHY would otherwise need per packet) and the rate of
+incremental group moves (leave one group, join another, rekeying only the
+key-tree paths involved).
+
+    python bench_multicast_groups.py --ues 100000 --groups 200 500
+"""
+import argparse
+import importlib.util
+import logging
+import os
+import time
+
+import numpy as np
+
+spec = importlib.util.spec_from_file_location(
+    "gnb_multicast", os.path.join(os.path.dirname(os.path.abspath(__file__)), "gnb-multicast.py"))
+gnb_multicast = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(gnb_multicast)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--ues", type=int, default=100000)
+    parser.add_argument("--groups", type=int, nargs="+", default=[200, 500])
+    parser.add_argument("--lookups", type=int, default=1000)
+    parser.add_argument("--moves", type=int, default=5000)
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.WARNING)
+    rng = np.random.default_rng(1)
+
+    print(f"{'ues':>7} {'groups':>6} {'setup s':>8} {'index us':>9} {'scan us':>9} {'speedup':>8} {'moves/s':>9}")
+    for num_groups in args.groups:
+        rrc = gnb_multicast.RRCLayer(clock=gnb_multicast.SlotClock().time)
+        ue_ids = list(range(1, args.ues + 1))
+        start = time.perf_counter()
+        rrc.connect_ues(ue_ids)
+        g_rntis = [rrc.create_multicast_group(ue_ids[i::num_groups]) for i in range(num_groups)]
+        setup = time.perf_counter() - start
+        assert len(rrc.groups) == num_groups
+
+        g_rnti = g_rntis[len(g_rntis) // 2]
+        column = rrc.ues.g_rnti
+        assert np.array_equal(np.sort(rrc.members(g_rnti)), np.flatnonzero(column == g_rnti))
+        start = time.perf_counter()
+        for _ in range(args.lookups):
+            rrc.members(g_rnti)
+        index = (time.perf_counter() - start) / args.lookups * 1e6
+        start = time.perf_counter()
+        for _ in range(args.lookups):
+            np.flatnonzero(column == g_rnti)
+        scan = (time.perf_counter() - start) / args.lookups * 1e6
+
+        movers = rng.integers(1, args.ues + 1, args.moves)
+        targets = rng.integers(0, num_groups, args.moves)
+        start = time.perf_counter()
+        for ue_id, target in zip(movers.tolist(), targets.tolist()):
+            rrc.join_multicast_group(ue_id, g_rntis[target])
+        moves = args.moves / (time.perf_counter() - start)
+        assert sum(len(rrc.members(g)) for g in g_rntis) == args.ues
+        assert np.array_equal(np.sort(rrc.members(g_rnti)), np.flatnonzero(column == g_rnti))
+
+        print(f"{args.ues:>7} {num_groups:>6} {setup:>8.2f} {index:>9.2f} {scan:>9.1f} {scan / index:>8.0f} "
+              f"{moves:>9.0f}")
+
+
+if __name__ == '__main__':
+    main()
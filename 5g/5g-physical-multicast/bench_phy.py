@@ -0,0 +1,74 @@
+"""Multicast PHY ACK/NACK throughput, per-object loop against the batched PHY.
+
+The loop baseline is the previous PHYLayer: one UE object, random.random()
+and logging call (disabled) per member per packet. The batched PHY draws
+outcomes for the whole group, one packet or --batch packets per call, into
+the struct-of-arrays UETable.
+
+    python bench_phy.py --sizes 1000 10000 100000 --packets 200
+"""
+import argparse
+import importlib.util
+import logging
+import os
+import random
+import time
+from dataclasses import dataclass
+
+spec = importlib.util.spec_from_file_location(
+    "gnb_multicast", os.path.join(os.path.dirname(os.path.abspath(__file__)), "gnb-multicast.py"))
+gnb_multicast = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(gnb_multicast)
+
+
+@dataclass
+class LoopUE:
+    ue_id: int
+    last_ack: bool = False
+
+
+def loop_transmit(packet_id, ues, reliability=0.9):
+    results = {}
+    for ue in ues:
+        success = random.random() < reliability
+        results[ue.ue_id] = success
+        ue.last_ack = success
+        logging.info(f"PHY: UE {ue.ue_id} received packet {packet_id} -> {'ACK' if success else 'NACK'}")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--packets", type=int, default=200)
+    parser.add_argument("--batch", type=int, default=50, help="packets per batched PHY call")
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.WARNING)
+
+    print(f"{'members':>8} {'phy':>14} {'packets/s':>11} {'outcomes/s':>12} {'speedup':>8}")
+    for size in args.sizes:
+        ues = [LoopUE(ue_id) for ue_id in range(size)]
+        # The loop is slow enough at 100k members that fewer packets suffice
+        loop_packets = max(1, min(args.packets, 2_000_000 // size))
+        start = time.perf_counter()
+        for packet_id in range(loop_packets):
+            loop_transmit(packet_id, ues)
+        loop_rate = loop_packets / (time.perf_counter() - start)
+        print(f"{size:>8} {'object loop':>14} {loop_rate:>11.0f} {loop_rate * size:>12.3g} {1:>8.1f}")
+
+        table = gnb_multicast.UETable()
+        rows = table.add(range(size))
+        phy = gnb_multicast.PHYLayer(seed=1)
+        packets = [gnb_multicast.MulticastPacket(i, "", 1000, i) for i in range(args.packets)]
+        for label, batch in (("batched x1", 1), (f"batched x{args.batch}", args.batch)):
+            start = time.perf_counter()
+            for first in range(0, args.packets, batch):
+                phy.transmit_batch(packets[first:first + batch], table, rows)
+            rate = args.packets / (time.perf_counter() - start)
+            print(f"{size:>8} {label:>14} {rate:>11.0f} {rate * size:>12.3g} {rate / loop_rate:>8.1f}")
+        ack_rate = phy.draw_acks(args.packets, size).mean()
+        assert abs(ack_rate - phy.channel_reliability) < 0.01, ack_rate
+
+
+if __name__ == '__main__':
+    main()
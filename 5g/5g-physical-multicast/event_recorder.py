@@ -0,0 +1,191 @@
+import argparse
+import math
+from typing import BinaryIO, Dict, Optional
+
+import numpy as np
+
+# Columns of a record, 21 bytes per event
+COLUMNS = {"slot": np.uint32, "event": np.uint8, "ue_id": np.int64, "packet_id": np.uint32, "value": np.int32}
+# File: MAGIC, then row groups of a little-endian uint32 record count
+# followed by each column's values in COLUMNS order
+MAGIC = b"GNBEVT2\n"
+ROW_GROUP = np.dtype("<u4")
+
+# Event types; value holds the per-event result
+EVENT_RRC_CONNECTED = 1  # value: 0
+EVENT_GROUP_CREATED = 2  # value: G-RNTI, one record per member
+EVENT_GROUP_RELEASED = 3  # value: G-RNTI, ue_id 0
+EVENT_JOIN = 4  # value: G-RNTI
+EVENT_LEAVE = 5  # value: G-RNTI
+EVENT_REKEY = 6  # value: rekey messages sent, ue_id 0
+EVENT_TB_SCHEDULED = 7  # value: HARQ attempt, 0 = new data
+EVENT_RECEPTION = 8  # value: 1 = ACK, 0 = NACK
+EVENT_PACKET_DROPPED = 9  # value: RBs the packet needed
+EVENT_NAMES = {
+    EVENT_RRC_CONNECTED: "rrc_connected",
+    EVENT_GROUP_CREATED: "group_created",
+    EVENT_GROUP_RELEASED: "group_released",
+    EVENT_JOIN: "join",
+    EVENT_LEAVE: "leave",
+    EVENT_REKEY: "rekey",
+    EVENT_TB_SCHEDULED: "tb_scheduled",
+    EVENT_RECEPTION: "reception",
+    EVENT_PACKET_DROPPED: "packet_dropped",
+}
+
+class EventRecorder:
+    """Columnar (slot, event, ue_id, packet_id, value) log of a simulation.
+
+    Each column is one preallocated array of capacity entries. With a path,
+    full columns are appended to the file as a row group and reused, so the
+    file holds every event; without one they are a ring that keeps the last
+    capacity events. Totals per event type are kept as records arrive, so
+    summary() covers the whole run either way. The slot comes from clock,
+    any object with a slot attribute (the simulator's SlotClock).
+    """
+
+    def __init__(self, clock=None, capacity: int = 1 << 20, path: Optional[str] = None):
+        self.clock = clock
+        self.capacity = capacity
+        self.columns = {name: np.zeros(capacity, dtype) for name, dtype in COLUMNS.items()}
+        self.size = 0  # records in the buffer
+        self.next = 0  # ring write position
+        self.counts = np.zeros(256, np.int64)  # records per event type
+        self.values = np.zeros(256, np.int64)  # value sums per event type
+        self.file: Optional[BinaryIO] = None
+        if path is not None:
+            self.file = open(path, "wb")
+            self.file.write(MAGIC)
+
+    def __len__(self) -> int:
+        return int(self.counts.sum())
+
+    def record(self, event: int, ue_id: int = 0, packet_id: int = 0, value: int = 0):
+        """Append one event at the current slot."""
+        if self.size == self.capacity and self.file is not None:
+            self.flush()
+        index = self.next
+        columns = self.columns
+        columns["slot"][index] = self.clock.slot if self.clock is not None else 0
+        columns["event"][index] = event
+        columns["ue_id"][index] = ue_id
+        columns["packet_id"][index] = packet_id
+        columns["value"][index] = value
+        self.next = (index + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
+        self.counts[event] += 1
+        self.values[event] += value
+
+    def record_many(self, event: int, ue_id=0, packet_id=0, value=0):
+        """Append one event per element of ue_id, packet_id and value
+        broadcast together, e.g. UE IDs (1, n), packet IDs (p, 1) and an
+        ACK array (p, n) for p packets to n UEs, with one array copy per
+        column instead of a Python call per event."""
+        shape = np.broadcast(ue_id, packet_id, value).shape
+        count = math.prod(shape)
+        if not count:
+            return
+        self.counts[event] += count
+        # Every value element is repeated equally often by the broadcast
+        self.values[event] += int(np.sum(value)) * (count // np.size(value))
+        capacity = self.capacity
+        slot = self.clock.slot if self.clock is not None else 0
+        columns = self.columns
+        if count <= capacity - self.next and (self.file is None or count <= capacity - self.size):
+            # Fits without wrapping: broadcast straight into the columns
+            end = self.next + count
+            columns["slot"][self.next:end] = slot
+            columns["event"][self.next:end] = event
+            columns["ue_id"][self.next:end].reshape(shape)[...] = ue_id
+            columns["packet_id"][self.next:end].reshape(shape)[...] = packet_id
+            columns["value"][self.next:end].reshape(shape)[...] = value
+            self.next = end % capacity
+            self.size = min(self.size + count, capacity)
+            return
+        ue_id, packet_id, value = (np.ravel(column) for column in np.broadcast_arrays(ue_id, packet_id, value))
+        if self.file is None and count > capacity:
+            # Only the last capacity fit in the ring
+            ue_id, packet_id, value = ue_id[-capacity:], packet_id[-capacity:], value[-capacity:]
+            count = capacity
+        start = 0
+        while start < count:
+            if self.size == capacity and self.file is not None:
+                self.flush()
+            end = start + min(count - start, capacity - self.next)
+            chunk = slice(self.next, self.next + end - start)
+            columns["slot"][chunk] = slot
+            columns["event"][chunk] = event
+            columns["ue_id"][chunk] = ue_id[start:end]
+            columns["packet_id"][chunk] = packet_id[start:end]
+            columns["value"][chunk] = value[start:end]
+            self.next = (self.next + end - start) % capacity
+            self.size = min(self.size + end - start, capacity)
+            start = end
+
+    def records(self) -> Dict[str, np.ndarray]:
+        """The buffered records as columns, oldest first (copies)."""
+        if self.size < self.capacity:
+            return {name: column[self.next - self.size:self.next].copy() for name, column in self.columns.items()}
+        return {name: np.concatenate((column[self.next:], column[:self.next])) for name, column in self.columns.items()}
+
+    def flush(self):
+        """Append the buffered records to the file as a row group and empty
+        the buffer."""
+        if self.file is None or not self.size:
+            return
+        self.file.write(ROW_GROUP.type(self.size).tobytes())
+        for column in self.records().values():
+            column.astype(column.dtype.newbyteorder("<"), copy=False).tofile(self.file)
+        self.size = 0
+        self.next = 0
+
+    def close(self):
+        if self.file is not None:
+            self.flush()
+            self.file.close()
+            self.file = None
+
+    def summary(self) -> Dict[str, int]:
+        """Events per type over the run, plus the ACKs among receptions."""
+        summary = {name: int(self.counts[event]) for event, name in EVENT_NAMES.items() if self.counts[event]}
+        if self.counts[EVENT_RECEPTION]:
+            summary["acks"] = int(self.values[EVENT_RECEPTION])
+        return summary
+
+def load(path: str) -> Dict[str, np.ndarray]:
+    """Columns of a file written by EventRecorder, all row groups joined."""
+    groups = {name: [] for name in COLUMNS}
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not an event recording")
+        while True:
+            header = f.read(ROW_GROUP.itemsize)
+            if not header:
+                break
+            count = int(np.frombuffer(header, ROW_GROUP)[0])
+            for name, dtype in COLUMNS.items():
+                column = np.fromfile(f, np.dtype(dtype).newbyteorder("<"), count)
+                if len(column) != count:
+                    raise ValueError(f"{path} is truncated")
+                groups[name].append(column)
+    return {name: np.concatenate(chunks) if chunks else np.zeros(0, COLUMNS[name])
+            for name, chunks in groups.items()}
+
+def summarize(records: Dict[str, np.ndarray]) -> Dict[str, int]:
+    """Same totals as EventRecorder.summary(), from loaded records."""
+    counts = np.bincount(records["event"], minlength=256)
+    summary = {name: int(counts[event]) for event, name in EVENT_NAMES.items() if counts[event]}
+    if counts[EVENT_RECEPTION]:
+        summary["acks"] = int(records["value"][records["event"] == EVENT_RECEPTION].sum())
+    return summary
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Summarize a gNB multicast event recording")
+    parser.add_argument("path")
+    args = parser.parse_args()
+    records = load(args.path)
+    if len(records["event"]):
+        print(f"{len(records['event'])} events, slots {records['slot'].min()}..{records['slot'].max()}, "
+              f"{len(np.unique(records['ue_id'][records['ue_id'] != 0]))} UEs")
+    for name, count in summarize(records).items():
+        print(f"{name:>16} {count}")
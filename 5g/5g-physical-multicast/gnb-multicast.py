@@ -1,19 +1,122 @@
-import random
+import argparse
+import heapq
+import itertools
+import math
 import time
-from dataclasses import dataclass
-from typing import List, Dict
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Callable, Iterable, List, Dict, Optional
 import logging
 
-# Configure logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+import numpy as np
+
+from event_recorder import (EVENT_GROUP_CREATED, EVENT_GROUP_RELEASED, EVENT_JOIN, EVENT_LEAVE,
+                            EVENT_PACKET_DROPPED, EVENT_RECEPTION, EVENT_REKEY, EVENT_RRC_CONNECTED,
+                            EVENT_TB_SCHEDULED, EventRecorder)
+from group_key_manager import GroupKeyManager, RekeyMessage
 
 # Data structures
+RRC_IDLE = 0
+RRC_CONNECTED = 1
+RRC_STATE_NAMES = ("IDLE", "CONNECTED")
+
+class UETable:
+    """Per-UE state as parallel NumPy arrays, one row per UE.
+
+    ue_id, rrc_state (RRC_*), g_rnti (0 = no group) and last_ack
+    (ACK/NACK of the last transmission) are columns, so layers update whole
+    groups with one array operation instead of touching UE objects.
+    """
+
+    def __init__(self, capacity: int = 1024):
+        self.count = 0
+        self.ue_id = np.zeros(capacity, np.int64)
+        self.rrc_state = np.zeros(capacity, np.uint8)
+        self.g_rnti = np.zeros(capacity, np.int32)
+        self.last_ack = np.zeros(capacity, bool)
+        self.rows: Dict[int, int] = {}  # ue_id -> row
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __contains__(self, ue_id: int) -> bool:
+        return ue_id in self.rows
+
+    def add(self, ue_ids: Iterable[int]) -> np.ndarray:
+        """Rows of the given UEs, appending IDLE rows for new ones."""
+        rows = self.rows
+        new = [ue_id for ue_id in dict.fromkeys(ue_ids) if ue_id not in rows]
+        if new:
+            end = self.count + len(new)
+            if end > len(self.ue_id):
+                self._grow(end)
+            self.ue_id[self.count:end] = new
+            rows.update(zip(new, range(self.count, end)))
+            self.count = end
+        return self.rows_of(ue_ids)
+
+    def rows_of(self, ue_ids: Iterable[int]) -> np.ndarray:
+        rows = self.rows
+        return np.fromiter((rows[ue_id] for ue_id in ue_ids), np.int64)
+
+    def _grow(self, needed: int):
+        capacity = max(needed, 2 * len(self.ue_id))
+        for name in ("ue_id", "rrc_state", "g_rnti", "last_ack"):
+            column = getattr(self, name)
+            grown = np.zeros(capacity, column.dtype)
+            grown[:self.count] = column[:self.count]
+            setattr(self, name, grown)
+
+class MemberSet:
+    """UE rows of one multicast group: a dense array plus a row -> position
+    index, so joins and leaves are O(1) (a leave moves the last member into
+    the gap) and rows() hands the PHY the members without any scan."""
+
+    def __init__(self, capacity: int = 16):
+        self.array = np.empty(capacity, np.int64)
+        self.size = 0
+        self.position: Dict[int, int] = {}
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __contains__(self, row: int) -> bool:
+        return row in self.position
+
+    def rows(self) -> np.ndarray:
+        """The member rows; a view that is only valid until the next change."""
+        return self.array[:self.size]
+
+    def add_many(self, rows: Iterable[int]):
+        new = [row for row in dict.fromkeys(rows) if row not in self.position]
+        end = self.size + len(new)
+        if end > len(self.array):
+            grown = np.empty(max(end, 2 * len(self.array)), np.int64)
+            grown[:self.size] = self.array[:self.size]
+            self.array = grown
+        self.array[self.size:end] = new
+        self.position.update(zip(new, range(self.size, end)))
+        self.size = end
+
+    def add(self, row: int):
+        self.add_many((row,))
+
+    def remove(self, row: int) -> bool:
+        index = self.position.pop(row, None)
+        if index is None:
+            return False
+        self.size -= 1
+        if index != self.size:
+            moved = int(self.array[self.size])
+            self.array[index] = moved
+            self.position[moved] = index
+        return True
+
+
 @dataclass
-class UE:
-    ue_id: int
-    rrc_state: str  # "IDLE", "CONNECTED"
-    g_rnti: int  # Group RNTI for multicast
-    last_ack: bool  # Last transmission ACK/NACK
+class MulticastGroup:
+    g_rnti: int
+    members: MemberSet = field(default_factory=MemberSet)
 
 @dataclass
 class MulticastPacket:
@@ -22,120 +125,581 @@ class MulticastPacket:
     size: int  # in bytes
     slot: int
 
+# Event priorities within a slot: RRC decisions, then MAC scheduling, then PHY
+PRIORITY_RRC = 0
+PRIORITY_MAC = 1
+PRIORITY_PHY = 2
+
+# Discrete-event engine
+class SlotClock:
+    """Virtual slot clock driving the simulator from an event priority queue.
+
+    Events are (slot, priority, callback) entries; run() pops them in order
+    and jumps straight to the next slot that has work, so idle slots cost
+    nothing and millions of slots run as fast as the callbacks allow. With
+    realtime=True each slot is held until its wall-clock time, for demos.
+    """
+
+    def __init__(self, slot_duration: float = 1e-3, realtime: bool = False):
+        self.slot_duration = slot_duration  # seconds per slot
+        self.realtime = realtime
+        self.slot = 0
+        self.queue: list = []
+        self.sequence = itertools.count()  # FIFO among equal (slot, priority)
+        self.events_run = 0
+
+    def time(self) -> float:
+        """Virtual seconds since slot 0; usable as a GroupKeyManager clock."""
+        return self.slot * self.slot_duration
+
+    def schedule(self, slot: int, priority: int, callback: Callable, *args):
+        if slot < self.slot:
+            raise ValueError(f"slot {slot} is in the past (now {self.slot})")
+        heapq.heappush(self.queue, (slot, priority, next(self.sequence), callback, args))
+
+    def schedule_in(self, slots: int, priority: int, callback: Callable, *args):
+        self.schedule(self.slot + slots, priority, callback, *args)
+
+    def run(self, until_slot: Optional[int] = None) -> int:
+        """Run events up to and including until_slot (all of them if None);
+        returns the number of events run."""
+        queue = self.queue
+        start_events = self.events_run
+        wall_start = time.monotonic() - self.time()
+        while queue and (until_slot is None or queue[0][0] <= until_slot):
+            slot, _, _, callback, args = heapq.heappop(queue)
+            if slot != self.slot:
+                self.slot = slot
+                if self.realtime:
+                    delay = wall_start + self.time() - time.monotonic()
+                    if delay > 0:
+                        time.sleep(delay)
+            callback(*args)
+            self.events_run += 1
+        if until_slot is not None and until_slot > self.slot:
+            self.slot = until_slot
+        return self.events_run - start_events
+
 # RRC Layer
+G_RNTI_FIRST = 1000
+G_RNTI_LAST = 0xFFEF  # top of the C-RNTI/G-RNTI value range
+
 class RRCLayer:
-    def __init__(self):
-        self.ues: Dict[int, UE] = {}
-        self.group_g_rnti = 1000  # Fixed G-RNTI for multicast group
-        self.multicast_configured = False
+    def __init__(self, rekey_interval: float = 1.0, rekey_max_pending: int = 1,
+                 clock: Callable[[], float] = time.monotonic, recorder: Optional[EventRecorder] = None):
+        self.ues = UETable()
+        self.recorder = recorder
+        self.groups: Dict[int, MulticastGroup] = {}
+        # G-RNTIs are handed out from G_RNTI_FIRST up; released ones go to
+        # the back of the queue so a stale G-RNTI is not reused right away
+        self.free_g_rntis = deque(range(G_RNTI_FIRST, G_RNTI_LAST + 1))
+        self.group_g_rnti: Optional[int] = None  # first group created, the default for sends
+        # Membership changes are rekeyed in batches of rekey_max_pending or
+        # after rekey_interval seconds, whichever comes first
+        self.group_keys = GroupKeyManager(rekey_interval, rekey_max_pending, clock)
 
     def connect_ue(self, ue_id: int) -> bool:
         """Simulate RRC connection setup for a UE."""
-        if ue_id not in self.ues:
-            self.ues[ue_id] = UE(ue_id=ue_id, rrc_state="IDLE", g_rnti=0, last_ack=False)
-        if self.ues[ue_id].rrc_state == "IDLE":
-            logging.info(f"RRC: UE {ue_id} initiating connection setup")
-            # Simulate RRC Connection Request, Setup, and Complete
-            self.ues[ue_id].rrc_state = "CONNECTED"
-            logging.info(f"RRC: UE {ue_id} moved to CONNECTED state")
-            return True
-        return False
+        return self.connect_ues([ue_id]) == 1
+
+    def connect_ues(self, ue_ids: List[int]) -> int:
+        """Simulate RRC connection setup for many UEs; returns how many were IDLE."""
+        rows = self.ues.add(ue_ids)
+        # Simulate RRC Connection Request, Setup, and Complete
+        idle = rows[self.ues.rrc_state[rows] == RRC_IDLE]
+        self.ues.rrc_state[idle] = RRC_CONNECTED
+        if self.recorder is not None:
+            self.recorder.record_many(EVENT_RRC_CONNECTED, self.ues.ue_id[idle])
+        if len(idle):
+            logging.debug("RRC: %d UEs moved to CONNECTED state", len(idle))
+        return len(idle)
+
+    def _connected_row(self, ue_id: int) -> Optional[int]:
+        row = self.ues.rows.get(ue_id)
+        if row is None or self.ues.rrc_state[row] != RRC_CONNECTED:
+            return None
+        return row
 
     def configure_multicast_group(self, ue_ids: List[int]) -> bool:
-        """Configure multicast session for a group of UEs."""
-        if self.multicast_configured:
-            logging.warning("RRC: Multicast group already configured")
+        """Configure a multicast session for a group of UEs."""
+        return self.create_multicast_group(ue_ids) is not None
+
+    def create_multicast_group(self, ue_ids: List[int] = ()) -> Optional[int]:
+        """Allocate a G-RNTI and key tree for a new group of connected UEs;
+        returns the G-RNTI. UEs already in another group move to this one."""
+        rows = self.ues.rows
+        missing = [ue_id for ue_id in ue_ids if ue_id not in rows]
+        if missing:
+            logging.error("RRC: UE %d not connected, cannot join multicast", missing[0])
+            return None
+        group_rows = self.ues.rows_of(ue_ids)
+        idle = group_rows[self.ues.rrc_state[group_rows] != RRC_CONNECTED]
+        if len(idle):
+            logging.error("RRC: UE %d not connected, cannot join multicast", self.ues.ue_id[idle[0]])
+            return None
+        if not self.free_g_rntis:
+            logging.error("RRC: No free G-RNTI for a new multicast group")
+            return None
+        g_rnti = self.free_g_rntis.popleft()
+        for row in group_rows[self.ues.g_rnti[group_rows] != 0]:
+            self.leave_multicast_group(int(self.ues.ue_id[row]))
+        group = self.groups[g_rnti] = MulticastGroup(g_rnti)
+        group.members.add_many(group_rows.tolist())
+        self.ues.g_rnti[group_rows] = g_rnti
+        if self.group_g_rnti is None:
+            self.group_g_rnti = g_rnti
+        tree = self.group_keys.create_group(g_rnti, max(len(ue_ids), 2))
+        messages = tree.join_many(ue_ids)
+        if self.recorder is not None:
+            self.recorder.record_many(EVENT_GROUP_CREATED, self.ues.ue_id[group_rows], value=g_rnti)
+        logging.info("RRC: G-RNTI %d configured for %d UEs, %d key distribution messages",
+                     g_rnti, len(group_rows), len(messages))
+        return g_rnti
+
+    def release_multicast_group(self, g_rnti: int) -> bool:
+        """Tear down a group: its members drop out and the G-RNTI is freed."""
+        group = self.groups.pop(g_rnti, None)
+        if group is None:
             return False
-        for ue_id in ue_ids:
-            if ue_id in self.ues and self.ues[ue_id].rrc_state == "CONNECTED":
-                self.ues[ue_id].g_rnti = self.group_g_rnti
-                logging.info(f"RRC: UE {ue_id} assigned G-RNTI {self.group_g_rnti} for multicast")
-            else:
-                logging.error(f"RRC: UE {ue_id} not connected, cannot join multicast")
-                return False
-        self.multicast_configured = True
-        logging.info("RRC: Multicast group configured successfully")
+        self.ues.g_rnti[group.members.rows()] = 0
+        self.group_keys.delete_group(g_rnti)
+        self.free_g_rntis.append(g_rnti)
+        if self.group_g_rnti == g_rnti:
+            self.group_g_rnti = next(iter(self.groups), None)
+        if self.recorder is not None:
+            self.recorder.record(EVENT_GROUP_RELEASED, value=g_rnti)
+        logging.info("RRC: Released G-RNTI %d, %d members", g_rnti, len(group.members))
         return True
 
+    def members(self, g_rnti: int) -> np.ndarray:
+        """UE rows of a group, straight from its member index."""
+        group = self.groups.get(g_rnti)
+        return group.members.rows() if group else np.empty(0, np.int64)
+
+    def join_multicast_group(self, ue_id: int, g_rnti: Optional[int] = None) -> List[RekeyMessage]:
+        """Add a connected UE to a group (the default one if g_rnti is None),
+        rekeying only its key-tree path. A UE is in at most one group, so a
+        UE in another group leaves that one first."""
+        g_rnti = self.group_g_rnti if g_rnti is None else g_rnti
+        row = self._connected_row(ue_id)
+        if g_rnti not in self.groups or row is None:
+            logging.error("RRC: UE %d cannot join multicast", ue_id)
+            return []
+        current = int(self.ues.g_rnti[row])
+        if current == g_rnti:
+            return []
+        messages = self.leave_multicast_group(ue_id) if current else []
+        self.groups[g_rnti].members.add(row)
+        self.ues.g_rnti[row] = g_rnti
+        messages += self.group_keys.join(g_rnti, ue_id)
+        if self.recorder is not None:
+            self.recorder.record(EVENT_JOIN, ue_id, value=g_rnti)
+        logging.debug("RRC: UE %d joining G-RNTI %d, %d rekey messages sent", ue_id, g_rnti, len(messages))
+        return messages
+
+    def leave_multicast_group(self, ue_id: int) -> List[RekeyMessage]:
+        """Remove a UE from its group so it cannot read later multicast traffic."""
+        row = self.ues.rows.get(ue_id)
+        if row is None or self.ues.g_rnti[row] == 0:
+            return []
+        g_rnti = int(self.ues.g_rnti[row])
+        self.groups[g_rnti].members.remove(row)
+        self.ues.g_rnti[row] = 0
+        messages = self.group_keys.leave(g_rnti, ue_id)
+        if self.recorder is not None:
+            self.recorder.record(EVENT_LEAVE, ue_id, value=g_rnti)
+        logging.debug("RRC: UE %d leaving G-RNTI %d, %d rekey messages sent", ue_id, g_rnti, len(messages))
+        return messages
+
+    def poll_rekey(self) -> List[RekeyMessage]:
+        """Send any batched rekey whose interval has expired."""
+        messages = self.group_keys.poll()
+        if messages:
+            if self.recorder is not None:
+                self.recorder.record(EVENT_REKEY, value=len(messages))
+            logging.debug("RRC: Batched rekey sent, %d messages", len(messages))
+        return messages
+
 # MAC Layer
+@dataclass
+class Transmission:
+    """One transport block on a HARQ process: a packet's first transmission
+    or a PTM retransmission to the members that NACKed it."""
+    packet: MulticastPacket
+    g_rnti: int
+    rbs: int
+    pending: Optional[np.ndarray] = None  # UE rows still missing the packet, None before the first try
+    attempt: int = 0  # 0 = new data
+    due_slot: int = 0
+
+@dataclass
+class MACStats:
+    """Per scheduled slot: RBs granted, new and retransmitted TBs, and bytes
+    delivered summed over receiving members. Slots with nothing to send are
+    not recorded but count towards utilization over the run."""
+    slots: List[int] = field(default_factory=list)
+    rbs: List[int] = field(default_factory=list)
+    new_tbs: List[int] = field(default_factory=list)
+    retx_tbs: List[int] = field(default_factory=list)
+    delivered_bytes: List[int] = field(default_factory=list)
+    dropped_packets: int = 0  # too large for a slot
+    lost_receptions: int = 0  # members still missing a packet after the last retransmission
+
 class MACLayer:
-    def __init__(self):
-        self.slot_number = 0
-        self.resource_blocks = 100  # Available RBs per slot
-        self.multicast_tb_size = 1000  # Transport block size in bytes
-
-    def schedule_multicast(self, packet: MulticastPacket, g_rnti: int) -> bool:
-        """Schedule a multicast packet for transmission."""
-        if self.resource_blocks >= 20:  # Assume 20 RBs needed for multicast
-            self.resource_blocks -= 20
-            packet.slot = self.slot_number
-            logging.info(f"MAC: Scheduled multicast packet {packet.packet_id} in slot {self.slot_number}, G-RNTI {g_rnti}")
-            self.slot_number += 1
-            self.resource_blocks = 100  # Reset for next slot
-            return True
-        logging.warning("MAC: Insufficient resources for multicast")
-        return False
+    """Per-slot multicast scheduler with HARQ.
+
+    Each slot packs transport blocks into total_rbs resource blocks, sized
+    from the packet (bytes_per_rb), first-fit over the queue: due HARQ
+    retransmissions first, then new packets. Several grant rounds in one
+    slot share its RBs; what does not fit stays queued for a later slot. A TB that some members NACKed
+    is retransmitted harq_rtt slots later, point-to-multipoint to its group,
+    up to max_retransmissions times; a TB everyone ACKed frees its process.
+    """
+
+    def __init__(self, clock: SlotClock, total_rbs: int = 100, bytes_per_rb: int = 50,
+                 max_retransmissions: int = 3, harq_rtt: int = 4, lookahead: int = 16,
+                 recorder: Optional[EventRecorder] = None):
+        self.clock = clock
+        self.recorder = recorder
+        self.total_rbs = total_rbs  # Available RBs per slot
+        self.bytes_per_rb = bytes_per_rb  # 1000-byte packet -> 20 RBs
+        self.max_retransmissions = max_retransmissions
+        self.harq_rtt = harq_rtt  # slots from a transmission to its retransmission
+        self.lookahead = lookahead  # queued TBs tried past one that does not fit
+        self.queue: deque = deque()  # new data
+        self.retransmissions: deque = deque()  # due_slot order, harq_rtt is constant
+        self.rb_slot = -1  # slot the free_rbs count belongs to
+        self.free_rbs = total_rbs
+        self.stats = MACStats()
+
+    @property
+    def slot_number(self) -> int:
+        return self.clock.slot
+
+    def rbs_for(self, size: int) -> int:
+        return max(1, math.ceil(size / self.bytes_per_rb))
+
+    def enqueue(self, packet: MulticastPacket, g_rnti: int) -> bool:
+        """Queue a multicast packet for the next slots with room for it."""
+        rbs = self.rbs_for(packet.size)
+        if rbs > self.total_rbs:
+            logging.warning("MAC: Packet %d needs %d RBs, more than a slot has", packet.packet_id, rbs)
+            if self.recorder is not None:
+                self.recorder.record(EVENT_PACKET_DROPPED, packet_id=packet.packet_id, value=rbs)
+            self.stats.dropped_packets += 1
+            return False
+        self.queue.append(Transmission(packet, g_rnti, rbs))
+        return True
+
+    def has_work(self) -> bool:
+        return bool(self.queue or self.retransmissions)
+
+    def next_work_slot(self) -> Optional[int]:
+        """Earliest slot after the current one with something to send."""
+        if self.queue:
+            return self.clock.slot + 1
+        if self.retransmissions:
+            return max(self.retransmissions[0].due_slot, self.clock.slot + 1)
+        return None
+
+    def schedule_slot(self) -> List[Transmission]:
+        """Grant this slot's remaining RBs; returns the TBs to transmit."""
+        slot = self.clock.slot
+        if self.rb_slot != slot:
+            self.rb_slot = slot
+            self.free_rbs = self.total_rbs  # Fresh RBs every slot
+        free = self.free_rbs
+        grants: List[Transmission] = []
+        for queue, due_only in ((self.retransmissions, True), (self.queue, False)):
+            skipped = 0
+            index = 0
+            while index < len(queue) and free and skipped <= self.lookahead:
+                tx = queue[index]
+                if due_only and tx.due_slot > slot:
+                    break
+                if tx.rbs <= free:
+                    del queue[index]
+                    free -= tx.rbs
+                    tx.packet.slot = slot
+                    grants.append(tx)
+                else:
+                    index += 1
+                    skipped += 1
+        self.free_rbs = free
+        if grants:
+            stats = self.stats
+            retx = sum(1 for tx in grants if tx.attempt)
+            if stats.slots and stats.slots[-1] == slot:
+                # Another round in the same slot adds to its row
+                stats.rbs[-1] = self.total_rbs - free
+                stats.new_tbs[-1] += len(grants) - retx
+                stats.retx_tbs[-1] += retx
+            else:
+                stats.slots.append(slot)
+                stats.rbs.append(self.total_rbs - free)
+                stats.new_tbs.append(len(grants) - retx)
+                stats.retx_tbs.append(retx)
+                stats.delivered_bytes.append(0)
+            if self.recorder is not None:
+                self.recorder.record_many(EVENT_TB_SCHEDULED, packet_id=[tx.packet.packet_id for tx in grants],
+                                          value=[tx.attempt for tx in grants])
+            logging.debug("MAC: Slot %d, %d TBs (%d HARQ retransmissions), %d/%d RBs",
+                          slot, len(grants), retx, self.total_rbs - free, self.total_rbs)
+        return grants
+
+    def feedback(self, tx: Transmission, rows: np.ndarray, acks: np.ndarray):
+        """HARQ ACK/NACK of one TB from the UEs at rows (all members on the
+        first transmission, the pending ones after)."""
+        self.stats.delivered_bytes[-1] += tx.packet.size * int(acks.sum())
+        pending = rows[~acks]
+        if not len(pending):
+            return
+        if tx.attempt >= self.max_retransmissions:
+            self.stats.lost_receptions += len(pending)
+            return
+        tx.pending = pending
+        tx.attempt += 1
+        tx.due_slot = self.clock.slot + self.harq_rtt
+        self.retransmissions.append(tx)
+
+    def summary(self, slots: int, members: int, slot_duration: float) -> Dict[str, float]:
+        """RB utilization and member-averaged goodput over slots slots."""
+        stats = self.stats
+        rbs = np.asarray(stats.rbs, dtype=np.int64)
+        delivered = np.asarray(stats.delivered_bytes, dtype=np.int64)
+        slots = max(slots, 1)
+        per_member = delivered.sum() / max(members, 1)
+        return {
+            "scheduled_slots": len(rbs),
+            "rb_utilization": float(rbs.sum() / (slots * self.total_rbs)),
+            "busy_slot_rb_utilization": float(rbs.mean() / self.total_rbs) if len(rbs) else 0.0,
+            "new_tbs": int(np.sum(stats.new_tbs)),
+            "retx_tbs": int(np.sum(stats.retx_tbs)),
+            "goodput_bytes_per_slot": float(per_member / slots),
+            "goodput_mbps": float(per_member * 8 / (slots * slot_duration) / 1e6),
+            "lost_receptions": stats.lost_receptions,
+            "dropped_packets": stats.dropped_packets,
+        }
 
 # PHY Layer
 class PHYLayer:
-    def __init__(self):
-        self.channel_reliability = 0.9  # 90% chance of successful transmission
-
-    def transmit_multicast(self, packet: MulticastPacket, ues: List[UE]) -> Dict[int, bool]:
-        """Simulate multicast transmission to all UEs in the group."""
-        results = {}
-        logging.info(f"PHY: Transmitting multicast packet {packet.packet_id} in slot {packet.slot}")
-        for ue in ues:
-            # Simulate channel conditions
-            success = random.random() < self.channel_reliability
-            results[ue.ue_id] = success
-            ue.last_ack = success
-            status = "ACK" if success else "NACK"
-            logging.info(f"PHY: UE {ue.ue_id} received packet {packet.packet_id} -> {status}")
-        return results
+    def __init__(self, channel_reliability: float = 0.9, seed: Optional[int] = None,
+                 recorder: Optional[EventRecorder] = None):
+        self.channel_reliability = channel_reliability  # 90% chance of successful transmission
+        self.rng = np.random.default_rng(seed)
+        self.recorder = recorder
+
+    def draw_acks(self, num_packets: int, num_ues: int) -> np.ndarray:
+        """ACK (True) / NACK outcomes for every packet and UE, as a
+        packets x UEs array from one draw (float32 halves the memory)."""
+        return self.rng.random((num_packets, num_ues), dtype=np.float32) < self.channel_reliability
+
+    def transmit_multicast(self, packet: MulticastPacket, ues: UETable, rows: np.ndarray) -> np.ndarray:
+        """Simulate multicast transmission to the UEs at rows; returns their ACKs."""
+        return self.transmit_batch([packet], ues, rows)[0]
+
+    def transmit_batch(self, packets: List[MulticastPacket], ues: UETable, rows: np.ndarray) -> np.ndarray:
+        """Transmit several packets to the same UEs; row i of the result holds
+        the ACKs of packets[i], and last_ack keeps the last packet's."""
+        acks = self.draw_acks(len(packets), len(rows))
+        if len(packets):
+            ues.last_ack[rows] = acks[-1]
+        if self.recorder is not None:
+            # One reception event per packet and UE, from whole arrays
+            self.recorder.record_many(EVENT_RECEPTION, ues.ue_id[rows][None, :],
+                                      np.array([packet.packet_id for packet in packets])[:, None], acks)
+        if logging.getLogger().isEnabledFor(logging.DEBUG):
+            for packet, packet_acks in zip(packets, acks):
+                logging.debug("PHY: Transmitted multicast packet %d in slot %d, %d/%d ACK",
+                              packet.packet_id, packet.slot, packet_acks.sum(), len(rows))
+        return acks
 
 # gNB Simulator
 class GNBSimulator:
-    def __init__(self):
-        self.rrc = RRCLayer()
-        self.mac = MACLayer()
-        self.phy = PHYLayer()
+    def __init__(self, rekey_interval: float = 1.0, rekey_max_pending: int = 1,
+                 slot_duration: float = 1e-3, realtime: bool = False, seed: Optional[int] = None,
+                 recorder: Optional[EventRecorder] = None):
+        self.clock = SlotClock(slot_duration, realtime)
+        # Every layer records its events here; text logging is opt-in
+        if recorder is None:
+            recorder = EventRecorder()
+        recorder.clock = self.clock
+        self.recorder = recorder
+        # Rekey batching intervals run on virtual time too
+        self.rrc = RRCLayer(rekey_interval, rekey_max_pending, self.clock.time, recorder)
+        self.mac = MACLayer(self.clock, recorder=recorder)
+        self.phy = PHYLayer(seed=seed, recorder=recorder)
         self.packet_counter = 0
+        self.next_mac_slot: Optional[int] = None
+        self.awaited: Dict[int, Optional[Dict[int, bool]]] = {}  # send_multicast_packet's packet ID -> ACKs
+        self.traffic_groups: List[int] = []  # G-RNTIs run_simulation sends to
+        self.next_group = 0
+        self.churn_events = 0
+        self.rng = np.random.default_rng(seed)
 
-    def setup_multicast_group(self, ue_ids: List[int]):
-        """Set up the multicast group with RRC and connect UEs."""
-        for ue_id in ue_ids:
-            self.rrc.connect_ue(ue_id)
-        self.rrc.configure_multicast_group(ue_ids)
+    def setup_multicast_group(self, ue_ids: List[int]) -> Optional[int]:
+        """Set up a multicast group with RRC and connect UEs; returns its G-RNTI."""
+        self.rrc.connect_ues(ue_ids)
+        return self.rrc.create_multicast_group(ue_ids)
 
-    def send_multicast_packet(self, data: str, size: int) -> Dict[int, bool]:
-        """Send a multicast packet to the group."""
+    def send_multicast_packet(self, data: str, size: int, g_rnti: Optional[int] = None) -> Dict[int, bool]:
+        """Send a multicast packet to a group (the first one by default) in
+        the first slot, from the current one on, with RBs left for it; runs
+        the clock up to that slot and returns ACK/NACK per member UE ID.
+        NACKs are retransmitted in later slots once the clock runs."""
+        g_rnti = self.rrc.group_g_rnti if g_rnti is None else g_rnti
         self.packet_counter += 1
         packet = MulticastPacket(packet_id=self.packet_counter, data=data, size=size, slot=0)
-        
-        # MAC scheduling
-        if not self.mac.schedule_multicast(packet, self.rrc.group_g_rnti):
+        if g_rnti not in self.rrc.groups or not self.mac.enqueue(packet, g_rnti):
             logging.error("gNB: Failed to schedule multicast packet")
             return {}
-        
-        # PHY transmission
-        multicast_ues = [ue for ue in self.rrc.ues.values() if ue.g_rnti == self.rrc.group_g_rnti]
-        results = self.phy.transmit_multicast(packet, multicast_ues)
-        return results
-
-    def run_simulation(self, num_packets: int):
-        """Run a simulation sending multiple multicast packets."""
-        ue_ids = [1, 2, 3, 4, 5]  # Five UEs
-        self.setup_multicast_group(ue_ids)
-        
-        for i in range(num_packets):
-            logging.info(f"gNB: Preparing packet {i+1}")
-            results = self.send_multicast_packet(data=f"Multicast data packet {i+1}", size=1000)
-            if results:
-                logging.info(f"gNB: Packet {i+1} transmission results: {results}")
-            time.sleep(1)  # Simulate slot timing
-            logging.info("-" * 50)
+        self.awaited[packet.packet_id] = None
+        # A MAC event in this slot grants whatever RBs earlier ones left
+        self._schedule_mac(self.clock.slot)
+        while self.awaited[packet.packet_id] is None and self.next_mac_slot is not None:
+            self.clock.run(self.next_mac_slot)
+        return self.awaited.pop(packet.packet_id) or {}
+
+    def _transmit(self, grants: List[Transmission]):
+        """PHY for one slot's TBs with HARQ feedback; yields (tx, rows, acks)."""
+        ues = self.rrc.ues
+        # Split before feedback bumps the attempt of NACKed new TBs
+        new = [tx for tx in grants if not tx.attempt]
+        retransmissions = [tx for tx in grants if tx.attempt]
+        # New TBs of a group share its member rows, so they are drawn in one batch
+        for g_rnti in dict.fromkeys(tx.g_rnti for tx in new):
+            group = [tx for tx in new if tx.g_rnti == g_rnti]
+            rows = self.rrc.members(g_rnti)
+            for tx, acks in zip(group, self.phy.transmit_batch([tx.packet for tx in group], ues, rows)):
+                self.mac.feedback(tx, rows, acks)
+                yield tx, rows, acks
+        for tx in retransmissions:
+            # Members that left the group since are not retransmitted to
+            rows = tx.pending[ues.g_rnti[tx.pending] == tx.g_rnti]
+            acks = self.phy.transmit_multicast(tx.packet, ues, rows)
+            self.mac.feedback(tx, rows, acks)
+            yield tx, rows, acks
+
+    # Slot events
+    def _schedule_mac(self, slot: Optional[int]):
+        # One MAC event per slot with work; a later one already queued
+        # becomes stale and is skipped
+        if slot is not None and (self.next_mac_slot is None or slot < self.next_mac_slot):
+            self.next_mac_slot = slot
+            self.clock.schedule(slot, PRIORITY_MAC, self._on_mac_slot)
+
+    def _on_packet_arrival(self, index: int, num_packets: int, interval: int, size: int, burst: int):
+        # Packets go to the groups in turn
+        logging.debug("gNB: Preparing packets %d..%d", index, index + burst - 1)
+        for offset in range(burst):
+            self.packet_counter += 1
+            self.mac.enqueue(MulticastPacket(packet_id=self.packet_counter, data=f"Multicast data packet {index + offset}",
+                                             size=size, slot=0), self.traffic_groups[self.next_group])
+            self.next_group = (self.next_group + 1) % len(self.traffic_groups)
+        self._schedule_mac(self.clock.slot)
+        if index + burst <= num_packets:
+            self.clock.schedule_in(interval, PRIORITY_RRC, self._on_packet_arrival,
+                                   index + burst, num_packets, interval, size, min(burst, num_packets - index - burst + 1))
+        else:
+            self.traffic_groups = []
+
+    def _on_churn(self, interval: int):
+        # A random UE moves to a random group, while traffic lasts
+        if not self.traffic_groups:
+            return
+        ue_id = int(self.rrc.ues.ue_id[self.rng.integers(len(self.rrc.ues))])
+        self.rrc.join_multicast_group(ue_id, self.traffic_groups[self.rng.integers(len(self.traffic_groups))])
+        self.churn_events += 1
+        self.clock.schedule_in(interval, PRIORITY_RRC, self._on_churn, interval)
+
+    def _on_mac_slot(self):
+        if self.clock.slot != self.next_mac_slot:
+            return
+        self.next_mac_slot = None
+        # Pending membership changes must be keyed before more data goes out
+        self.rrc.poll_rekey()
+        grants = self.mac.schedule_slot()
+        if grants:
+            self.clock.schedule_in(0, PRIORITY_PHY, self._on_phy_slot, grants)
+        else:
+            self._schedule_mac(self.mac.next_work_slot())
+
+    def _on_phy_slot(self, grants: List[Transmission]):
+        for tx, rows, acks in self._transmit(grants):
+            if tx.packet.packet_id in self.awaited:
+                self.awaited[tx.packet.packet_id] = dict(zip(self.rrc.ues.ue_id[rows].tolist(), acks.tolist()))
+        self._schedule_mac(self.mac.next_work_slot())
+
+    def run_simulation(self, num_packets: int, packet_interval: int = 1000, size: int = 1000,
+                       num_ues: int = 5, burst: int = 1, num_groups: int = 1,
+                       churn_interval: int = 0) -> Dict[str, float]:
+        """Run a simulation with burst packets arriving every packet_interval slots.
+
+        The UEs are split evenly over num_groups multicast groups and packets
+        go to the groups in turn. With churn_interval, a random UE moves to a
+        random group every churn_interval slots while traffic lasts.
+
+        Packet arrivals, RRC rekey polls, MAC scheduling, PHY transmission and
+        HARQ retransmissions are events on the slot clock; without realtime
+        pacing the run takes only as long as the events themselves. Returns
+        the MAC's utilization and goodput summary.
+        """
+        ue_ids = list(range(1, num_ues + 1))  # Five UEs by default
+        self.rrc.connect_ues(ue_ids)
+        self.traffic_groups = [g_rnti for g_rnti in (self.rrc.create_multicast_group(ue_ids[i::num_groups])
+                                                     for i in range(num_groups)) if g_rnti is not None]
+        self.next_group = 0
+        start_slot = self.clock.slot
+        if num_packets > 0 and self.traffic_groups:
+            self.clock.schedule_in(0, PRIORITY_RRC, self._on_packet_arrival, 1, num_packets, packet_interval, size,
+                                   min(burst, num_packets))
+            if churn_interval:
+                self.clock.schedule_in(churn_interval, PRIORITY_RRC, self._on_churn, churn_interval)
+        self.clock.run()
+        summary = self.mac.summary(self.clock.slot - start_slot + 1, num_ues, self.clock.slot_duration)
+        summary["groups"] = len(self.rrc.groups)
+        summary["churn_events"] = self.churn_events
+        logging.info("gNB: MAC %s", summary)
+        rekeys = [scheduler.metrics for scheduler in self.rrc.group_keys.schedulers.values()]
+        logging.info("gNB: Rekey metrics over %d groups: %d rekeys, %d messages, %d bytes", len(rekeys),
+                     sum(m.rekeys for m in rekeys), sum(m.messages for m in rekeys), sum(m.bytes for m in rekeys))
+        self.recorder.flush()
+        logging.info("gNB: Events %s", self.recorder.summary())
+        return summary
 
 if __name__ == "__main__":
-    gnb = GNBSimulator()
-    gnb.run_simulation(num_packets=3)  # Send 3 multicast packets
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="gNB multicast simulator")
+    parser.add_argument("--packets", type=int, default=3)
+    parser.add_argument("--ues", type=int, default=5, help="UEs in the cell")
+    parser.add_argument("--groups", type=int, default=1, help="multicast groups the UEs are split over")
+    parser.add_argument("--churn-interval", type=int, default=0, help="slots between UE group moves, 0 = none")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--packet-interval", type=int, default=1000, help="slots between packet arrivals")
+    parser.add_argument("--burst", type=int, default=1, help="packets per arrival")
+    parser.add_argument("--size", type=int, default=1000, help="packet size in bytes")
+    parser.add_argument("--slot-duration", type=float, default=1e-3, help="seconds per slot")
+    parser.add_argument("--realtime", action="store_true", help="pace slots to the wall clock")
+    parser.add_argument("--events", metavar="PATH", help="write every event to a binary recording "
+                                                          "(summarize it with event_recorder.py PATH)")
+    parser.add_argument("--event-buffer", type=int, default=1 << 20, help="events held in memory")
+    parser.add_argument("-v", "--verbose", action="count", default=0,
+                        help="text log: -v for run summaries, -vv for every slot and UE")
+    args = parser.parse_args()
+    logging.basicConfig(level=(logging.WARNING, logging.INFO, logging.DEBUG)[min(args.verbose, 2)],
+                        format='%(asctime)s - %(levelname)s - %(message)s')
+
+    recorder = EventRecorder(capacity=args.event_buffer, path=args.events)
+    gnb = GNBSimulator(slot_duration=args.slot_duration, realtime=args.realtime, seed=args.seed, recorder=recorder)
+    start = time.perf_counter()
+    summary = gnb.run_simulation(num_packets=args.packets, packet_interval=args.packet_interval, size=args.size,
+                                 num_ues=args.ues, burst=args.burst, num_groups=args.groups,
+                                 churn_interval=args.churn_interval)
+    elapsed = time.perf_counter() - start
+    print(f"{gnb.clock.slot + 1} slots ({gnb.clock.time():.3f} s virtual), {gnb.clock.events_run} events "
+          f"in {elapsed:.3f} s wall")
+    print(f"RB utilization {summary['rb_utilization']:.1%} ({summary['busy_slot_rb_utilization']:.1%} of busy slots), "
+          f"goodput {summary['goodput_mbps']:.2f} Mbit/s per member, {summary['new_tbs']} new + "
+          f"{summary['retx_tbs']} retransmitted TBs, {summary['lost_receptions']} receptions lost, "
+          f"{summary['groups']} groups, {summary['churn_events']} group moves")
+    recorder.close()
+    print("events: " + ", ".join(f"{name} {count}" for name, count in recorder.summary().items()))
@@ -0,0 +1,274 @@
+import hashlib
+import hmac
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, List, Optional
+
+KEY_SIZE = 16  # bytes per node key
+
+@dataclass
+class RekeyMessage:
+    g_rnti: int
+    epoch: int
+    node: int  # tree node whose new key is carried
+    kek_node: int  # node whose key encrypts it, every member below it can decrypt
+    ciphertext: bytes
+
+    @property
+    def size(self) -> int:
+        """Bytes on the air: G-RNTI, epoch, node, KEK node and wrapped key."""
+        return 2 + 4 + 4 + 4 + len(self.ciphertext)
+
+def wrap_key(kek: bytes, key: bytes, epoch: int, node: int) -> bytes:
+    """Encrypt a node key under a KEK (HMAC-SHA-256 keystream, stand-in for AES key wrap)."""
+    pad = hmac.digest(kek, epoch.to_bytes(4, "big") + node.to_bytes(4, "big"), hashlib.sha256)
+    return bytes(a ^ b for a, b in zip(key, pad))
+
+unwrap_key = wrap_key  # XOR keystream, unwrapping is the same operation
+
+# Key tree
+class KeyTree:
+    """Binary Logical Key Hierarchy (LKH) for one multicast group.
+
+    Nodes are heap-indexed from the root (1); leaves are capacity..2*capacity-1
+    and hold each member's individual key. Only nodes with at least one member
+    below them hold a key. A join or leave refreshes the keys on the member's
+    leaf-to-root path, so it costs O(log n) rekey messages.
+    """
+
+    def __init__(self, g_rnti: int, capacity: int = 2):
+        self.g_rnti = g_rnti
+        self.capacity = 1 << max(1, (capacity - 1).bit_length())
+        self.keys: Dict[int, bytes] = {}
+        self.members: Dict[int, int] = {}  # member id -> leaf
+        self.free_leaves: List[int] = list(range(2 * self.capacity - 1, self.capacity - 1, -1))
+        self.epoch = 0
+
+    @property
+    def group_key(self) -> Optional[bytes]:
+        return self.keys.get(1)
+
+    def __len__(self) -> int:
+        return len(self.members)
+
+    def join(self, member_id: int) -> List[RekeyMessage]:
+        """Add a member and rekey its path."""
+        return self.join_many([member_id])
+
+    def leave(self, member_id: int) -> List[RekeyMessage]:
+        """Remove a member and rekey its path."""
+        return self.leave_many([member_id])
+
+    def join_many(self, member_ids: Iterable[int]) -> List[RekeyMessage]:
+        """Add members with one rekey over the union of their paths."""
+        return self.batch_rekey(member_ids, ())
+
+    def leave_many(self, member_ids: Iterable[int]) -> List[RekeyMessage]:
+        """Remove members with one rekey over the union of their paths."""
+        return self.batch_rekey((), member_ids)
+
+    def batch_rekey(self, joins: Iterable[int], leaves: Iterable[int]) -> List[RekeyMessage]:
+        """Apply joins and leaves together, refreshing each shared path node once.
+
+        Joining members take over the leaves of departing ones first, so a
+        join/leave pair costs a single path refresh.
+        """
+        leaves = [member_id for member_id in dict.fromkeys(leaves) if member_id in self.members]
+        leaving = set(leaves)
+        joins = [member_id for member_id in dict.fromkeys(joins)
+                 if member_id not in self.members or member_id in leaving]
+        # Grow up front, growing renumbers leaves
+        while len(self.free_leaves) + len(leaves) < len(joins):
+            self._grow()
+        dirty = []
+        for member_id in leaves:
+            leaf = self.members.pop(member_id)
+            del self.keys[leaf]
+            self.free_leaves.append(leaf)
+            dirty.append(leaf)
+        for member_id in joins:
+            leaf = self.free_leaves.pop()
+            self.members[member_id] = leaf
+            # Individual key, delivered over the member's unicast security context
+            self.keys[leaf] = os.urandom(KEY_SIZE)
+            dirty.append(leaf)
+        return self._rekey(dirty)
+
+    def path_keys(self, member_id: int) -> Dict[int, bytes]:
+        """Keys a member holds: its leaf key and every ancestor key."""
+        node = self.members[member_id]
+        path = {}
+        while node:
+            path[node] = self.keys[node]
+            node >>= 1
+        return path
+
+    def _rekey(self, leaves: List[int]) -> List[RekeyMessage]:
+        if not leaves:
+            return []
+        self.epoch += 1
+        dirty = set()
+        for leaf in leaves:
+            node = leaf >> 1
+            while node and node not in dirty:
+                dirty.add(node)
+                node >>= 1
+        messages = []
+        # Children have larger indices, so descending order refreshes bottom-up
+        for node in sorted(dirty, reverse=True):
+            children = [child for child in (2 * node, 2 * node + 1) if child in self.keys]
+            if not children:
+                self.keys.pop(node, None)
+                continue
+            new_key = os.urandom(KEY_SIZE)
+            self.keys[node] = new_key
+            for child in children:
+                messages.append(RekeyMessage(self.g_rnti, self.epoch, node, child,
+                                             wrap_key(self.keys[child], new_key, self.epoch, node)))
+        return messages
+
+    def _grow(self):
+        """Double the leaf count; the old tree becomes the root's left subtree."""
+        def moved(node: int) -> int:
+            return node + (1 << (node.bit_length() - 1))
+        self.keys = {moved(node): key for node, key in self.keys.items()}
+        self.members = {member: moved(leaf) for member, leaf in self.members.items()}
+        self.free_leaves = [moved(leaf) for leaf in self.free_leaves]
+        # New right-half leaves, lowest index popped first
+        self.free_leaves.extend(range(4 * self.capacity - 1, 3 * self.capacity - 1, -1))
+        self.capacity *= 2
+
+# Batch rekeying
+@dataclass
+class RekeyMetrics:
+    rekeys: int = 0
+    messages: int = 0
+    bytes: int = 0
+    joins: int = 0
+    leaves: int = 0
+    leave_lag: List[float] = field(default_factory=list)  # leave request -> rekey, forward secrecy lag
+    join_lag: List[float] = field(default_factory=list)  # join request -> group key delivered
+
+    def summary(self) -> Dict[str, float]:
+        events = self.joins + self.leaves
+        lags = sorted(self.leave_lag)
+        return {
+            "rekeys": self.rekeys,
+            "events": events,
+            "messages": self.messages,
+            "bytes": self.bytes,
+            "messages_per_event": self.messages / events if events else 0.0,
+            "mean_leave_lag": sum(lags) / len(lags) if lags else 0.0,
+            "p95_leave_lag": lags[int(0.95 * (len(lags) - 1))] if lags else 0.0,
+            "max_leave_lag": lags[-1] if lags else 0.0,
+            "mean_join_lag": sum(self.join_lag) / len(self.join_lag) if self.join_lag else 0.0,
+        }
+
+class BatchRekeyScheduler:
+    """Collects membership changes for one key tree and rekeys them in batches.
+
+    A batch is flushed when max_pending changes are queued or interval has
+    passed since the oldest one, whichever comes first. max_pending=1 rekeys
+    every event immediately.
+    """
+
+    def __init__(self, tree: KeyTree, interval: float = 1.0, max_pending: int = 1,
+                 clock: Callable[[], float] = time.monotonic):
+        self.tree = tree
+        self.interval = interval
+        self.max_pending = max_pending
+        self.clock = clock
+        self.pending_joins: Dict[int, float] = {}
+        self.pending_leaves: Dict[int, float] = {}
+        self.metrics = RekeyMetrics()
+
+    def request_join(self, member_id: int) -> List[RekeyMessage]:
+        if self.pending_leaves.pop(member_id, None) is None:
+            self.pending_joins[member_id] = self.clock()
+        return self._maybe_flush()
+
+    def request_leave(self, member_id: int) -> List[RekeyMessage]:
+        # A join still waiting in the batch never received a key, just drop it
+        if self.pending_joins.pop(member_id, None) is None:
+            self.pending_leaves[member_id] = self.clock()
+        return self._maybe_flush()
+
+    def pending(self) -> int:
+        return len(self.pending_joins) + len(self.pending_leaves)
+
+    def poll(self) -> List[RekeyMessage]:
+        """Flush if the oldest queued change has waited for interval."""
+        if not self.pending():
+            return []
+        oldest = min(min(self.pending_joins.values(), default=float("inf")),
+                     min(self.pending_leaves.values(), default=float("inf")))
+        if self.clock() - oldest >= self.interval:
+            return self.flush()
+        return []
+
+    def flush(self) -> List[RekeyMessage]:
+        if not self.pending():
+            return []
+        messages = self.tree.batch_rekey(self.pending_joins, self.pending_leaves)
+        now = self.clock()
+        metrics = self.metrics
+        metrics.rekeys += 1
+        metrics.messages += len(messages)
+        metrics.bytes += sum(message.size for message in messages)
+        metrics.joins += len(self.pending_joins)
+        metrics.leaves += len(self.pending_leaves)
+        metrics.join_lag.extend(now - t for t in self.pending_joins.values())
+        metrics.leave_lag.extend(now - t for t in self.pending_leaves.values())
+        self.pending_joins = {}
+        self.pending_leaves = {}
+        return messages
+
+    def _maybe_flush(self) -> List[RekeyMessage]:
+        if self.pending() >= self.max_pending:
+            return self.flush()
+        return self.poll()
+
+# Group key manager
+class GroupKeyManager:
+    """Key trees for the gNB's multicast groups, keyed by G-RNTI.
+
+    Joins and leaves go through each group's BatchRekeyScheduler; the
+    default max_pending=1 rekeys on every event.
+    """
+
+    def __init__(self, rekey_interval: float = 1.0, rekey_max_pending: int = 1,
+                 clock: Callable[[], float] = time.monotonic):
+        self.rekey_interval = rekey_interval
+        self.rekey_max_pending = rekey_max_pending
+        self.clock = clock
+        self.trees: Dict[int, KeyTree] = {}
+        self.schedulers: Dict[int, BatchRekeyScheduler] = {}
+
+    def create_group(self, g_rnti: int, expected_size: int = 2) -> KeyTree:
+        if g_rnti not in self.trees:
+            self.trees[g_rnti] = KeyTree(g_rnti, expected_size)
+            self.schedulers[g_rnti] = BatchRekeyScheduler(
+                self.trees[g_rnti], self.rekey_interval, self.rekey_max_pending, self.clock)
+        return self.trees[g_rnti]
+
+    def delete_group(self, g_rnti: int):
+        self.trees.pop(g_rnti, None)
+        self.schedulers.pop(g_rnti, None)
+
+    def join(self, g_rnti: int, ue_id: int) -> List[RekeyMessage]:
+        return self.schedulers[g_rnti].request_join(ue_id)
+
+    def leave(self, g_rnti: int, ue_id: int) -> List[RekeyMessage]:
+        return self.schedulers[g_rnti].request_leave(ue_id)
+
+    def poll(self) -> List[RekeyMessage]:
+        """Flush every group whose batch interval has expired."""
+        return [message for scheduler in self.schedulers.values() for message in scheduler.poll()]
+
+    def metrics(self, g_rnti: int) -> RekeyMetrics:
+        return self.schedulers[g_rnti].metrics
+
+    def group_key(self, g_rnti: int) -> Optional[bytes]:
+        tree = self.trees.get(g_rnti)
+        return tree.group_key if tree else None
@@ -0,0 +1,52 @@
+"""Peak memory and time of long runs: one dense draw of every slot against
+slot-chunked streaming into per-UE success counts.
+
+Dense is simulate_drops with slotChunk=numSlots, the memory the model
+needed before streaming, run only up to --dense-max-slots; streamed uses
+the default chunking. Both must give identical metrics. Peak memory is
+NumPy's allocations as seen by tracemalloc.
+
+    python bench_slot_chunks.py --ues 1000 --slots 100 10000 100000 1000000
+"""
+import argparse
+import dataclasses
+import time
+import tracemalloc
+
+import numpy as np
+
+import unimulbro
+
+
+def measure(numUE, numDrops, p, slotChunk):
+    tracemalloc.start()
+    start = time.perf_counter()
+    results = unimulbro.simulate_drops(numUE, numDrops, 1, p, slotChunk)
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return results, elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--ues", type=int, default=1000)
+    parser.add_argument("--drops", type=int, default=1)
+    parser.add_argument("--slots", type=int, nargs="+", default=[100, 10000, 100000, 1000000])
+    parser.add_argument("--dense-max-slots", type=int, default=100000)
+    args = parser.parse_args()
+
+    print(f"{'slots':>8} {'mode':>9} {'seconds':>8} {'peak MiB':>9} {'slot-UEs/s':>11}")
+    for numSlots in args.slots:
+        p = dataclasses.replace(unimulbro.DEFAULTS, numSlots=numSlots)
+        outcomes = 2 * numSlots * args.ues * args.drops  # unicast and multicast
+        streamed, elapsed, peak = measure(args.ues, args.drops, p, None)
+        print(f"{numSlots:>8} {'streamed':>9} {elapsed:>8.2f} {peak / 2**20:>9.1f} {outcomes / elapsed:>11.3g}")
+        if numSlots <= args.dense_max_slots:
+            dense, elapsed, peak = measure(args.ues, args.drops, p, numSlots)
+            print(f"{numSlots:>8} {'dense':>9} {elapsed:>8.2f} {peak / 2**20:>9.1f} {outcomes / elapsed:>11.3g}")
+            assert all(np.array_equal(streamed[name], dense[name]) for name in unimulbro.METRICS)
+
+
+if __name__ == '__main__':
+    main()
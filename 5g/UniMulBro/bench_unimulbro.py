@@ -0,0 +1,83 @@
+"""Drops per second: the per-UE loop of the original script against the
+vectorized Monte Carlo engine, and agreement of their means.
+
+The loop baseline is the original body for one density: one np.random.rand
+call and one np.searchsorted per UE, one drop per pass. The engine draws
+whole batches of drops at once (simulate_drops), here in one process.
+
+    python bench_unimulbro.py --ues 10 100 1000 --drops 2000
+"""
+import argparse
+import time
+
+import numpy as np
+
+import unimulbro
+
+u = unimulbro.DEFAULTS
+
+
+def loop_drop(numUE):
+    # The original script's loop body, returning [Unicast, Multicast] metrics
+    r = u.cellRadius * np.sqrt(np.random.rand(numUE))
+    pathLoss = 32.45 + 20 * np.log10(r / 1000) + 20 * np.log10(3.5e9 / 1e6)
+    sinr = u.txPower - pathLoss - u.noisePower
+    rbsPerUE = np.ceil(u.dataRate / (u.bandwidth / u.numRBs * np.mean(u.mcsTable)))
+    metrics = np.zeros((4, 2))
+    success = np.zeros((numUE, u.numSlots))
+    ueDataRates = np.zeros(numUE)
+    ueBLER = np.zeros(numUE)
+    for ue in range(numUE):
+        mcsIdx = np.searchsorted(u.sinrThresholds, sinr[ue], side='right') - 1
+        if mcsIdx >= 0:
+            ueDataRates[ue] = u.mcsTable[mcsIdx] * (u.bandwidth / u.numRBs) * rbsPerUE
+            success[ue, :] = np.random.rand(u.numSlots) > u.blerTarget
+            ueBLER[ue] = 1 - np.mean(success[ue, :])
+    metrics[:, 0] = (np.mean(ueDataRates) / 1e6, np.mean(np.mean(success, axis=1)) * 100,
+                     np.sum(success) * u.dataRate / u.numSlots / 1e6, np.mean(ueBLER) * 100)
+    mcsIdx = np.searchsorted(u.sinrThresholds, np.min(sinr), side='right') - 1
+    groupDataRate = u.mcsTable[mcsIdx] * (u.bandwidth / u.numRBs) * rbsPerUE if mcsIdx >= 0 else 0
+    success = np.zeros((numUE, u.numSlots))
+    ueBLER = np.zeros(numUE)
+    for ue in range(numUE):
+        if sinr[ue] >= u.sinrThresholds[mcsIdx] and mcsIdx >= 0:
+            success[ue, :] = np.random.rand(u.numSlots) > u.blerTarget
+            ueBLER[ue] = 1 - np.mean(success[ue, :])
+    metrics[:, 1] = (groupDataRate / 1e6, np.mean(np.mean(success, axis=1)) * 100,
+                     np.sum(success) * u.dataRate / u.numSlots / 1e6, np.mean(ueBLER) * 100)
+    return metrics
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--ues", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--drops", type=int, default=2000)
+    args = parser.parse_args()
+    np.random.seed(1)
+    names = ("perUEDataRate", "reliability", "throughput", "bler")
+
+    print(f"{'UEs':>6} {'loop drops/s':>13} {'vector drops/s':>15} {'speedup':>8} {'max |z|':>8}")
+    for numUE in args.ues:
+        # The loop is slow enough at many UEs that fewer drops suffice for its rate
+        loopDrops = max(20, min(args.drops, 200_000 // numUE))
+        start = time.perf_counter()
+        loop = np.array([loop_drop(numUE) for _ in range(loopDrops)])
+        loopRate = loopDrops / (time.perf_counter() - start)
+
+        start = time.perf_counter()
+        results = unimulbro.simulate_drops(numUE, args.drops, 1)
+        rate = args.drops / (time.perf_counter() - start)
+
+        # Both are estimates of the same means: their gap in units of the
+        # combined standard error should stay within a few
+        worst = 0.0
+        for i, name in enumerate(names):
+            error = np.hypot(loop[:, i].std(axis=0) / np.sqrt(loopDrops),
+                             results[name].std(axis=0) / np.sqrt(args.drops))
+            gap = np.abs(loop[:, i].mean(axis=0) - results[name].mean(axis=0))
+            worst = max(worst, float(np.max(np.divide(gap, error, out=np.zeros_like(gap), where=error > 0))))
+        print(f"{numUE:>6} {loopRate:>13.0f} {rate:>15.0f} {rate / loopRate:>8.0f} {worst:>8.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+"""Plot UniMulBro results from the sweep cache (sweep.py).
+
+Points are grouped into curves by parameter set; a curve is labelled with
+the parameters that differ from the defaults. --set selects parameter
+values the same way sweep.py takes them. Nothing is simulated here.
+
+    python plot_sweep.py
+    python plot_sweep.py --set txPower=46 --drops 1000 --out figures
+"""
+import argparse
+import dataclasses
+import os
+from collections import defaultdict
+from typing import List, Tuple
+
+import numpy as np
+
+from sweep import CACHE_DIR, Cache, parse_grid
+from unimulbro import DEFAULTS
+
+FIGURES = (
+    # metric, title, y label, y label in the comparison, file
+    ("perUEDataRate", 'Per UE Data Rate vs. Number of UEs', 'Data Rate (Mbps)', 'Data Rate (Mbps)',
+     'per_ue_data_rate.png'),
+    ("reliability", 'Reliability vs. Number of UEs', 'Reliability (%)', 'Reliability (%)', 'reliability.png'),
+    ("rbUsage", 'Resource Block Usage vs. Number of UEs', 'Resource Blocks Used', 'Resource Blocks',
+     'rb_usage.png'),
+    ("throughput", 'Total Throughput vs. Number of UEs', 'Throughput (Mbps)', 'Throughput (Mbps)',
+     'throughput.png'),
+    ("bler", 'Block Error Rate vs. Number of UEs', 'BLER (%)', 'BLER (%)', 'bler.png'),
+)
+
+def plot_results(curves: List[Tuple], directory: str = "."):
+    """Save the per-metric figures and the comparison figure. curves are
+    (label, ueCounts, mean, ci), mean and ci mapping each metric to
+    (len(ueCounts), 2) [Unicast, Multicast]; the 95% confidence band is
+    shaded."""
+    import matplotlib.pyplot as plt
+
+    def plot(name):
+        for index, (label, ueCounts, mean, ci) in enumerate(curves):
+            for mode, style, mode_label in ((0, 'b-o', 'Unicast'), (1, 'g-^', 'Multicast')):
+                if len(curves) > 1:
+                    # One color per parameter set, line style per mode
+                    style = f"C{index}" + ('-o' if mode == 0 else '--^')
+                line, = plt.plot(ueCounts, mean[name][:, mode], style,
+                                 label=f"{mode_label} {label}".strip())
+                plt.fill_between(ueCounts, mean[name][:, mode] - ci[name][:, mode],
+                                 mean[name][:, mode] + ci[name][:, mode], color=line.get_color(), alpha=0.2)
+
+    for name, title, ylabel, _, filename in FIGURES:
+        plt.figure(figsize=(8, 6))
+        plot(name)
+        plt.title(title)
+        plt.xlabel('Number of UEs')
+        plt.ylabel(ylabel)
+        plt.legend()
+        plt.grid(True)
+        plt.savefig(os.path.join(directory, filename))
+        plt.close()
+
+    # Comparison Plot
+    plt.figure(figsize=(10, 15))
+    for i, (name, _, _, ylabel, _) in enumerate(FIGURES):
+        plt.subplot(5, 1, i + 1)
+        plot(name)
+        if i == 0:
+            plt.title('Comparison of Unicast and Multicast Metrics')
+        if i == len(FIGURES) - 1:
+            plt.xlabel('Number of UEs')
+        plt.ylabel(ylabel)
+        plt.legend()
+        plt.grid(True)
+    plt.tight_layout()
+    plt.savefig(os.path.join(directory, 'comparison.png'))
+    plt.close()
+
+def label(p) -> str:
+    changed = [f"{field.name}={getattr(p, field.name)}" for field in dataclasses.fields(p)
+               if getattr(p, field.name) != getattr(DEFAULTS, field.name)]
+    return ", ".join(changed)
+
+def load_curves(cache: Cache, selected=None, drops=None, seed=None) -> List[Tuple]:
+    """Cached points as (label, ueCounts, mean, ci) curves, one per parameter
+    set, drops and seed, restricted to the selected parameter sets."""
+    groups = defaultdict(list)
+    for point in cache.points():
+        if selected is not None and point["parameters"] not in selected:
+            continue
+        if (drops is not None and point["drops"] != drops) or (seed is not None and point["seed"] != seed):
+            continue
+        groups[point["parameters"], point["drops"], point["seed"]].append(point)
+    curves = []
+    for (p, _, _), points in groups.items():
+        points.sort(key=lambda point: point["numUE"])
+        curves.append((label(p), [point["numUE"] for point in points],
+                       {name: np.array([point["mean"][name] for point in points]) for name in points[0]["mean"]},
+                       {name: np.array([point["ci"][name] for point in points]) for name in points[0]["ci"]}))
+    return curves
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--set", action="append", default=[], metavar="NAME=V1,V2",
+                        help="plot only these parameter values (default: every cached parameter set)")
+    parser.add_argument("--drops", type=int, default=None, help="plot only points with this many drops")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--cache", default=CACHE_DIR, help="cache directory")
+    parser.add_argument("--out", default=".", help="directory for the figures")
+    args = parser.parse_args()
+
+    curves = load_curves(Cache(args.cache), set(parse_grid(args.set)) if args.set else None, args.drops, args.seed)
+    if not curves:
+        raise SystemExit("no cached points match; run sweep.py first")
+    for name, ueCounts, _, _ in curves:
+        print(f"{name or 'defaults'}: {len(ueCounts)} UE counts, {ueCounts[0]}..{ueCounts[-1]}")
+    os.makedirs(args.out, exist_ok=True)
+    plot_results(curves, args.out)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""Cached, resumable parameter sweeps of the UniMulBro Monte Carlo.
+
+Each point of the grid, one parameter set at one UE count, is stored in
+the cache directory as <key>.npz, the key hashing the parameters, UE
+count, drops, seed and MODEL_VERSION. Points already in the cache are
+skipped, and each point is written as soon as it is computed, so an
+interrupted sweep resumes where it stopped and widening the grid only
+computes the new points. Plot the cache with plot_sweep.py.
+
+    python sweep.py --set txPower=40,46 --set blerTarget=0.1,0.01 --drops 1000
+    python sweep.py --ues 100 1000 --set numRBs=50,100,200
+"""
+import argparse
+import dataclasses
+import hashlib
+import itertools
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, Iterator, List, Optional
+
+import numpy as np
+
+import unimulbro
+from unimulbro import DEFAULTS, METRICS, MODEL_VERSION, Parameters
+
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sweep_cache")
+
+def parse_value(field: dataclasses.Field, text: str):
+    # Tuple parameters (MCS table, SINR thresholds) are given as a:b:c;
+    # Parameters converts the numbers to the field types
+    if field.type in (int, float):
+        return float(text)
+    return tuple(float(item) for item in text.split(":"))
+
+def parse_grid(settings: List[str]) -> List[Parameters]:
+    """Parameter sets of the grid given as name=value,value,... settings:
+    every combination of the listed values, the rest at their defaults."""
+    fields = {field.name: field for field in dataclasses.fields(Parameters)}
+    axes = {}
+    for setting in settings:
+        name, _, values = setting.partition("=")
+        if name not in fields or not values:
+            raise ValueError(f"expected name=value[,value...] with name one of {', '.join(fields)}: {setting!r}")
+        axes[name] = [parse_value(fields[name], value) for value in values.split(",")]
+    return [dataclasses.replace(DEFAULTS, **dict(zip(axes, combination)))
+            for combination in itertools.product(*axes.values())]
+
+def point_key(p: Parameters, numUE: int, numDrops: int, seed: int) -> str:
+    description = {"parameters": dataclasses.asdict(p), "numUE": numUE, "drops": numDrops, "seed": seed,
+                   "version": MODEL_VERSION}
+    return hashlib.sha256(json.dumps(description, sort_keys=True).encode()).hexdigest()[:24]
+
+class Cache:
+    """Sweep points as one .npz each: mean and ci (METRICS x [Unicast,
+    Multicast]) plus the parameters, UE count, drops and seed."""
+
+    def __init__(self, directory: str = CACHE_DIR):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.npz")
+
+    def __contains__(self, key: str) -> bool:
+        return os.path.exists(self.path(key))
+
+    def store(self, key: str, p: Parameters, numUE: int, numDrops: int, seed: int, mean, ci):
+        # Written under a temporary name and renamed, so an interrupted
+        # write never leaves a truncated point behind
+        temporary = self.path(key) + ".tmp.npz"
+        np.savez(temporary, mean=np.stack([mean[name] for name in METRICS]),
+                 ci=np.stack([ci[name] for name in METRICS]),
+                 parameters=json.dumps(dataclasses.asdict(p)), numUE=numUE, drops=numDrops, seed=seed,
+                 version=MODEL_VERSION)
+        os.replace(temporary, self.path(key))
+
+    def points(self) -> Iterator[Dict]:
+        """Every cached point of the current MODEL_VERSION."""
+        for name in sorted(os.listdir(self.directory)):
+            if not name.endswith(".npz") or ".tmp." in name:
+                continue
+            with np.load(os.path.join(self.directory, name)) as data:
+                if int(data["version"]) != MODEL_VERSION:
+                    continue
+                yield {
+                    "parameters": Parameters(**json.loads(str(data["parameters"]))),
+                    "numUE": int(data["numUE"]), "drops": int(data["drops"]), "seed": int(data["seed"]),
+                    "mean": dict(zip(METRICS, data["mean"])), "ci": dict(zip(METRICS, data["ci"])),
+                }
+
+def run_sweep(grid: List[Parameters], ueCounts: List[int], numDrops: int, seed: int = 0,
+              workers: Optional[int] = None, cache: Optional[Cache] = None) -> Dict[str, int]:
+    """Compute every grid point missing from the cache; returns how many
+    points were computed and how many were already cached.
+
+    The tasks of all missing points go to one process pool at once, so
+    every worker stays busy however few tasks a point has; a point is
+    stored as soon as its last task finishes."""
+    cache = cache or Cache()
+    todo = [(p, numUE) for p in grid for numUE in ueCounts if point_key(p, numUE, numDrops, seed) not in cache]
+    done = {"computed": 0, "cached": len(grid) * len(ueCounts) - len(todo)}
+    tasks = [unimulbro.density_tasks(numUE, numDrops, seed, p) for p, numUE in todo]
+
+    def store(point, outputs):
+        p, numUE = todo[point]
+        mean, ci = unimulbro.aggregate(outputs)
+        cache.store(point_key(p, numUE, numDrops, seed), p, numUE, numDrops, seed, mean, ci)
+        done["computed"] += 1
+
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or not todo:
+        for point, pointTasks in enumerate(tasks):
+            store(point, [unimulbro.simulate_drops(*task) for task in pointTasks])
+        return done
+    outputs = [[None] * len(pointTasks) for pointTasks in tasks]
+    remaining = [len(pointTasks) for pointTasks in tasks]
+    pool = ProcessPoolExecutor(workers)
+    try:
+        futures = {pool.submit(unimulbro.simulate_drops, *task): (point, index)
+                   for point, pointTasks in enumerate(tasks) for index, task in enumerate(pointTasks)}
+        for future in as_completed(futures):
+            point, index = futures.pop(future)
+            outputs[point][index] = future.result()
+            remaining[point] -= 1
+            if not remaining[point]:
+                store(point, outputs[point])
+                outputs[point] = None
+    finally:
+        pool.shutdown(cancel_futures=True)
+    return done
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--set", action="append", default=[], metavar="NAME=V1,V2",
+                        help="parameter values to sweep; repeat for a grid over several parameters")
+    parser.add_argument("--ues", type=int, nargs="+", default=unimulbro.numUEs, help="UE counts (densities)")
+    parser.add_argument("--drops", type=int, default=1000, help="random drops per point")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=None, help="processes (default: one per CPU)")
+    parser.add_argument("--cache", default=CACHE_DIR, help="cache directory")
+    args = parser.parse_args()
+
+    grid = parse_grid(args.set)
+    start = time.perf_counter()
+    done = run_sweep(grid, args.ues, args.drops, args.seed, args.workers, Cache(args.cache))
+    print(f"{len(grid)} parameter sets x {len(args.ues)} UE counts: {done['computed']} points computed, "
+          f"{done['cached']} cached, in {time.perf_counter() - start:.2f} s")
+
+if __name__ == "__main__":
+    main()
@@ -1,173 +1,187 @@
-import matplotlib.pyplot as plt
+import argparse
+import os
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor
+import dataclasses
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
 import numpy as np
 
 # Simulation Parameters
 numUEs = [5, 10,15, 20, 25,30,35, 40, 45,50,55, 60, 65, 70, 75,80, 85, 90, 95, 100, 110, 120, 130, 140, 150]  # Low, medium, high user densities
-cellRadius = 500  # Cell radius in meters
-bandwidth = 20e6  # 20 MHz bandwidth
-numRBs = 100  # Number of resource blocks per slot
-txPower = 40  # Transmit power in dBm
-noisePower = -90  # Noise power in dBm
-dataRate = 4e6  # 4 Mbps CBR traffic
-numSlots = 100  # Number of slots to simulate
-mcsTable = [2, 4, 6, 8, 10, 12, 14, 16, 18, 20]  # Simplified MCS (bits/symbol)
-sinrThresholds = [0, 5, 10, 15, 20, 25, 30, 35, 40, 45]  # SINR thresholds (dB)
-blerTarget = 0.1  # Target BLER of 10%
-
-# Initialize results
-perUEDataRate = np.zeros((len(numUEs), 2))  # [Unicast, Multicast]
-reliability = np.zeros((len(numUEs), 2))
-rbUsage = np.zeros((len(numUEs), 2))
-throughput = np.zeros((len(numUEs), 2))
-bler = np.zeros((len(numUEs), 2))
-
-for n in range(len(numUEs)):
-    numUE = numUEs[n]
-    
-    # Generate random UE positions
-    theta = 2 * np.pi * np.random.rand(numUE)
-    r = cellRadius * np.sqrt(np.random.rand(numUE))
-    distances = np.sqrt(r**2)
-    
-    # Calculate SINR (simplified free-space path loss)
-    pathLoss = 32.45 + 20 * np.log10(distances / 1000) + 20 * np.log10(3.5e9 / 1e6)
-    receivedPower = txPower - pathLoss
-    sinr = receivedPower - noisePower
-    
-    # Unicast Simulation
-    rbsPerUE = np.ceil(dataRate / (bandwidth / numRBs * np.mean(mcsTable)))  # RBs per UE
-    rbUsage[n, 0] = min(rbsPerUE * numUE, numRBs)  # Cap at available RBs
-    success = np.zeros((numUE, numSlots))
-    ueDataRates = np.zeros(numUE)
-    ueBLER = np.zeros(numUE)
-    for ue in range(numUE):
-        mcsIdx = np.searchsorted(sinrThresholds, sinr[ue], side='right') - 1
-        if mcsIdx >= 0:
-            ueDataRates[ue] = mcsTable[mcsIdx] * (bandwidth / numRBs) * rbsPerUE
-            success[ue, :] = np.random.rand(numSlots) > blerTarget  # Simplified BLER model
-            ueBLER[ue] = 1 - np.mean(success[ue, :])
-    perUEDataRate[n, 0] = np.mean(ueDataRates) / 1e6  # Mbps
-    reliability[n, 0] = np.mean(np.mean(success, axis=1)) * 100  # Percentage
-    throughput[n, 0] = np.sum(success) * dataRate / numSlots / 1e6  # Mbps
-    bler[n, 0] = np.mean(ueBLER) * 100  # Percentage
-    
-    # Multicast Simulation
-    rbUsage[n, 1] = rbsPerUE  # Fixed RBs for group
-    minSINR = np.min(sinr)
-    mcsIdx = np.searchsorted(sinrThresholds, minSINR, side='right') - 1
-    groupDataRate = 0
-    if mcsIdx >= 0:
-        groupDataRate = mcsTable[mcsIdx] * (bandwidth / numRBs) * rbsPerUE
-    success = np.zeros((numUE, numSlots))
-    ueBLER = np.zeros(numUE)
-    for ue in range(numUE):
-        if sinr[ue] >= sinrThresholds[mcsIdx] and mcsIdx >= 0:
-            success[ue, :] = np.random.rand(numSlots) > blerTarget
-            ueBLER[ue] = 1 - np.mean(success[ue, :])
-    perUEDataRate[n, 1] = groupDataRate / 1e6  # Same for all UEs
-    reliability[n, 1] = np.mean(np.mean(success, axis=1)) * 100
-    throughput[n, 1] = np.sum(success) * dataRate / numSlots / 1e6
-    bler[n, 1] = np.mean(ueBLER) * 100
-
-# Plot and Save Graphs
-# Per UE Data Rate
-plt.figure(figsize=(8, 6))
-plt.plot(numUEs, perUEDataRate[:, 0], 'b-o', label='Unicast')
-plt.plot(numUEs, perUEDataRate[:, 1], 'g-^', label='Multicast')
-plt.title('Per UE Data Rate vs. Number of UEs')
-plt.xlabel('Number of UEs')
-plt.ylabel('Data Rate (Mbps)')
-plt.legend()
-plt.grid(True)
-plt.savefig('per_ue_data_rate.png')
-plt.close()
-
-# Reliability
-plt.figure(figsize=(8, 6))
-plt.plot(numUEs, reliability[:, 0], 'b-o', label='Unicast')
-plt.plot(numUEs, reliability[:, 1], 'g-^', label='Multicast')
-plt.title('Reliability vs. Number of UEs')
-plt.xlabel('Number of UEs')
-plt.ylabel('Reliability (%)')
-plt.legend()
-plt.grid(True)
-plt.savefig('reliability.png')
-plt.close()
-
-# RB Usage
-plt.figure(figsize=(8, 6))
-plt.plot(numUEs, rbUsage[:, 0], 'b-o', label='Unicast')
-plt.plot(numUEs, rbUsage[:, 1], 'g-^', label='Multicast')
-plt.title('Resource Block Usage vs. Number of UEs')
-plt.xlabel('Number of UEs')
-plt.ylabel('Resource Blocks Used')
-plt.legend()
-plt.grid(True)
-plt.savefig('rb_usage.png')
-plt.close()
-
-# Throughput
-plt.figure(figsize=(8, 6))
-plt.plot(numUEs, throughput[:, 0], 'b-o', label='Unicast')
-plt.plot(numUEs, throughput[:, 1], 'g-^', label='Multicast')
-plt.title('Total Throughput vs. Number of UEs')
-plt.xlabel('Number of UEs')
-plt.ylabel('Throughput (Mbps)')
-plt.legend()
-plt.grid(True)
-plt.savefig('throughput.png')
-plt.close()
-
-# BLER
-plt.figure(figsize=(8, 6))
-plt.plot(numUEs, bler[:, 0], 'b-o', label='Unicast')
-plt.plot(numUEs, bler[:, 1], 'g-^', label='Multicast')
-plt.title('Block Error Rate vs. Number of UEs')
-plt.xlabel('Number of UEs')
-plt.ylabel('BLER (%)')
-plt.legend()
-plt.grid(True)
-plt.savefig('bler.png')
-plt.close()
-
-# Comparison Plot
-plt.figure(figsize=(10, 15))
-plt.subplot(5, 1, 1)
-plt.plot(numUEs, perUEDataRate[:, 0], 'b-o', label='Unicast')
-plt.plot(numUEs, perUEDataRate[:, 1], 'g-^', label='Multicast')
-plt.title('Comparison of Unicast and Multicast Metrics')
-plt.ylabel('Data Rate (Mbps)')
-plt.legend()
-plt.grid(True)
-
-plt.subplot(5, 1, 2)
-plt.plot(numUEs, reliability[:, 0], 'b-o', label='Unicast')
-plt.plot(numUEs, reliability[:, 1], 'g-^', label='Multicast')
-plt.ylabel('Reliability (%)')
-plt.legend()
-plt.grid(True)
-
-plt.subplot(5, 1, 3)
-plt.plot(numUEs, rbUsage[:, 0], 'b-o', label='Unicast')
-plt.plot(numUEs, rbUsage[:, 1], 'g-^', label='Multicast')
-plt.ylabel('Resource Blocks')
-plt.legend()
-plt.grid(True)
-
-plt.subplot(5, 1, 4)
-plt.plot(numUEs, throughput[:, 0], 'b-o', label='Unicast')
-plt.plot(numUEs, throughput[:, 1], 'g-^', label='Multicast')
-plt.ylabel('Throughput (Mbps)')
-plt.legend()
-plt.grid(True)
-
-plt.subplot(5, 1, 5)
-plt.plot(numUEs, bler[:, 0], 'b-o', label='Unicast')
-plt.plot(numUEs, bler[:, 1], 'g-^', label='Multicast')
-plt.xlabel('Number of UEs')
-plt.ylabel('BLER (%)')
-plt.legend()
-plt.grid(True)
-plt.tight_layout()
-plt.savefig('comparison.png')
-plt.close()
\ No newline at end of file
+
+@dataclass(frozen=True)
+class Parameters:
+    cellRadius: float = 500  # Cell radius in meters
+    bandwidth: float = 20e6  # 20 MHz bandwidth
+    numRBs: int = 100  # Number of resource blocks per slot
+    txPower: float = 40  # Transmit power in dBm
+    noisePower: float = -90  # Noise power in dBm
+    dataRate: float = 4e6  # 4 Mbps CBR traffic
+    numSlots: int = 100  # Number of slots to simulate
+    mcsTable: Tuple[int, ...] = (2, 4, 6, 8, 10, 12, 14, 16, 18, 20)  # Simplified MCS (bits/symbol)
+    sinrThresholds: Tuple[float, ...] = (0, 5, 10, 15, 20, 25, 30, 35, 40, 45)  # SINR thresholds (dB)
+    blerTarget: float = 0.1  # Target BLER of 10%
+
+    def __post_init__(self):
+        # Normalized, so equal parameter sets compare and hash (sweep cache
+        # keys) the same however their numbers were written
+        for name, kind in (("mcsTable", int), ("sinrThresholds", float)):
+            object.__setattr__(self, name, tuple(kind(value) for value in getattr(self, name)))
+        for field in dataclasses.fields(self):
+            if field.type in (int, float):
+                object.__setattr__(self, field.name, field.type(getattr(self, field.name)))
+        if len(self.mcsTable) != len(self.sinrThresholds):
+            raise ValueError("mcsTable and sinrThresholds need one entry per MCS")
+
+DEFAULTS = Parameters()
+# Bumped whenever a change to the model alters results, so cached sweep
+# points (sweep.py) computed by an older model are not reused
+MODEL_VERSION = 1
+
+# Monte Carlo
+METRICS = ("perUEDataRate", "reliability", "rbUsage", "throughput", "bler")  # each [Unicast, Multicast]
+DROPS_PER_TASK = 256  # drops per seeded task; fixed so results do not depend on the worker count
+BATCH_BYTES = 64 << 20  # random draws held at once per task
+UINT32_RANGE = 1 << 32
+Z_95 = 1.959964  # two-sided 95% normal quantile
+
+def simulate_drops(numUE, numDrops, seed, p: Parameters = DEFAULTS, slotChunk: Optional[int] = None):
+    """Unicast and multicast metrics of numDrops independent random drops of
+    numUE UEs, all drops and UEs at once; returns METRICS -> (numDrops, 2).
+
+    A UE succeeds in a slot with probability 1 - blerTarget when its MCS
+    (unicast) or the group's MCS (multicast, set by the lowest SINR) is
+    usable; uncovered UEs never succeed and count as BLER 0, as in the
+    per-UE model. Slot outcomes are drawn slot-major, (slots, drops, UEs),
+    in batches of drops bounded by BATCH_BYTES.
+
+    Long runs stream: a batch's slots are drawn slotChunk at a time (by
+    default as many as fit in BATCH_BYTES) into running per-UE success
+    counts, so memory does not grow with numSlots. Chunks consume the
+    generator in the same order as one draw of every slot, so the results
+    are the same for any slotChunk.
+    """
+    rng = np.random.default_rng(seed)
+    mcs = np.asarray(p.mcsTable, dtype=float)
+    rbsPerUE = np.ceil(p.dataRate / (p.bandwidth / p.numRBs * np.mean(p.mcsTable)))  # RBs per UE
+    results = {name: np.zeros((numDrops, 2)) for name in METRICS}
+    results["rbUsage"][:] = (min(rbsPerUE * numUE, p.numRBs), rbsPerUE)  # Cap at available RBs; fixed RBs for group
+    batch = max(1, BATCH_BYTES // (4 * p.numSlots * numUE))
+    for first in range(0, numDrops, batch):
+        drops = slice(first, min(first + batch, numDrops))
+        size = drops.stop - drops.start
+
+        # Random UE distances (uniform over the cell disc) and SINR (simplified free-space path loss)
+        distances = p.cellRadius * np.sqrt(rng.random((size, numUE)))
+        pathLoss = 32.45 + 20 * np.log10(distances / 1000) + 20 * np.log10(3.5e9 / 1e6)
+        sinr = p.txPower - pathLoss - p.noisePower
+        mcsIdx = np.searchsorted(p.sinrThresholds, sinr, side='right') - 1  # (drops, UEs)
+        groupIdx = mcsIdx.min(axis=1)  # the lowest SINR sets the group MCS
+
+        # Unicast
+        covered = mcsIdx >= 0
+        ueDataRates = np.where(covered, mcs[mcsIdx] * (p.bandwidth / p.numRBs) * rbsPerUE, 0.0)
+        successes = _slot_successes(rng, p, size, numUE, slotChunk)
+        _reduce(results, p, drops, 0, ueDataRates.mean(axis=1), covered, successes)
+
+        # Multicast
+        groupCovered = groupIdx >= 0
+        groupDataRate = np.where(groupCovered, mcs[groupIdx] * (p.bandwidth / p.numRBs) * rbsPerUE, 0.0)
+        successes = _slot_successes(rng, p, size, numUE, slotChunk)
+        _reduce(results, p, drops, 1, groupDataRate, np.broadcast_to(groupCovered[:, None], covered.shape), successes)
+    return results
+
+def _slot_successes(rng, p, numDrops, numUE, slotChunk=None):
+    # Successful slots per drop and UE, accumulated over chunks of slots.
+    # Each slot outcome compares one 32-bit half of the generator's raw
+    # 64-bit output with the BLER, about twice as fast as drawing floats,
+    # with a 2**-32 resolution
+    perSlot = numDrops * numUE
+    if slotChunk is None:
+        slotChunk = BATCH_BYTES // (4 * perSlot)
+    slotChunk = max(1, min(slotChunk, p.numSlots))
+    if perSlot % 2 and slotChunk % 2 and slotChunk < p.numSlots:
+        # An odd chunk would leave half of its last raw output unused, and
+        # the next chunk's outcomes would differ from a single draw's
+        slotChunk = slotChunk + 1 if slotChunk == 1 else slotChunk - 1
+    threshold = round(p.blerTarget * UINT32_RANGE)
+    successes = np.zeros((numDrops, numUE), np.int64)
+    for first in range(0, p.numSlots, slotChunk):
+        count = min(slotChunk, p.numSlots - first) * perSlot
+        draws = rng.bit_generator.random_raw((count + 1) // 2).view(np.uint32)[:count]
+        successes += (draws.reshape(-1, numDrops, numUE) >= threshold).sum(axis=0, dtype=np.int32)
+    return successes
+
+def _reduce(results, p, drops, mode, dataRates, covered, successes):
+    # Per-drop metrics from per-UE success counts over numSlots
+    successes = np.where(covered, successes, 0)
+    ueSuccess = successes / p.numSlots
+    results["perUEDataRate"][drops, mode] = dataRates / 1e6  # Mbps
+    results["reliability"][drops, mode] = ueSuccess.mean(axis=1) * 100  # Percentage
+    results["throughput"][drops, mode] = successes.sum(axis=1) * p.dataRate / p.numSlots / 1e6  # Mbps
+    results["bler"][drops, mode] = np.where(covered, 1 - ueSuccess, 0).mean(axis=1) * 100  # Percentage
+
+def run_monte_carlo(ueCounts, numDrops, seed=None, workers=None, p: Parameters = DEFAULTS,
+                    pool: Optional[Executor] = None):
+    """numDrops drops per UE count in ueCounts, spread over a process pool
+    (pool, or one of workers processes) as independently seeded tasks;
+    returns (mean, ci) dicts of METRICS -> (len(ueCounts), 2), ci being the
+    95% confidence half-width of the mean. A UE count's tasks are seeded
+    from (seed, UE count) alone, so its results do not depend on the other
+    counts simulated with it."""
+    tasks = [task for numUE in ueCounts for task in density_tasks(numUE, numDrops, seed, p)]
+    workers = workers or os.cpu_count() or 1
+    if pool is not None:
+        outputs = list(pool.map(simulate_drops, *zip(*tasks)))
+    elif workers > 1:
+        with ProcessPoolExecutor(workers) as pool:
+            outputs = list(pool.map(simulate_drops, *zip(*tasks), chunksize=max(1, len(tasks) // (4 * workers))))
+    else:
+        outputs = [simulate_drops(*task) for task in tasks]
+
+    tasksPerDensity = len(tasks) // len(ueCounts)
+    perDensity = [aggregate(outputs[n * tasksPerDensity:(n + 1) * tasksPerDensity]) for n in range(len(ueCounts))]
+    return tuple({name: np.stack([result[name] for result in results]) for name in METRICS}
+                 for results in zip(*perDensity))
+
+def density_tasks(numUE, numDrops, seed=None, p: Parameters = DEFAULTS):
+    """simulate_drops arguments of one UE count's numDrops drops, in
+    DROPS_PER_TASK tasks seeded from (seed, numUE)."""
+    density = np.random.SeedSequence(None if seed is None else (seed, numUE))
+    counts = [min(DROPS_PER_TASK, numDrops - first) for first in range(0, numDrops, DROPS_PER_TASK)]
+    return [(numUE, count, child, p) for count, child in zip(counts, density.spawn(len(counts)))]
+
+def aggregate(outputs):
+    """(mean, ci) dicts of METRICS -> [Unicast, Multicast] over the
+    simulate_drops outputs of one UE count's tasks, in task order."""
+    mean, ci = {}, {}
+    for name in METRICS:
+        samples = np.concatenate([output[name] for output in outputs])
+        mean[name] = samples.mean(axis=0)
+        ci[name] = Z_95 * samples.std(axis=0, ddof=1) / np.sqrt(len(samples)) if len(samples) > 1 else np.zeros(2)
+    return mean, ci
+
+# One run of the default parameters; for cached parameter sweeps and
+# plots from the cache see sweep.py and plot_sweep.py
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Unicast vs. multicast Monte Carlo over UE densities")
+    parser.add_argument("--ues", type=int, nargs="+", default=numUEs, help="UE counts (densities) to simulate")
+    parser.add_argument("--drops", type=int, default=1000, help="random drops per density")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--workers", type=int, default=None, help="processes (default: one per CPU)")
+    parser.add_argument("--no-plot", action="store_true", help="print the results only")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    mean, ci = run_monte_carlo(args.ues, args.drops, args.seed, args.workers)
+    print(f"{args.drops} drops x {len(args.ues)} densities in {time.perf_counter() - start:.2f} s")
+    print(f"{'UEs':>5} " + " ".join(f"{name + ' U/M':>30}" for name in METRICS))
+    for n, numUE in enumerate(args.ues):
+        print(f"{numUE:>5} " + " ".join(
+            f"{mean[name][n, 0]:>7.2f}±{ci[name][n, 0]:<5.2f} {mean[name][n, 1]:>7.2f}±{ci[name][n, 1]:<5.2f}"
+            for name in METRICS))
+    if not args.no_plot:
+        from plot_sweep import plot_results
+        plot_results([("", args.ues, mean, ci)])
@@ -1,8 +1,18 @@
 from flask import Flask, request, jsonify
-import requests
-import hashlib
+import asyncio
+
+from common.aio_server import RUNTIME, run_async
+from common.context_store import UEContextStore
+from common.kdf import ALG_IA0, DEFAULT_SN_NAME, N_NAS_INT, KeyHierarchy, mac
+from common.metrics import Metrics
+from common.tracing import Tracer
+from common.transport import HTTPTransport
 
 app = Flask(__name__)
+tracer = Tracer("amf")
+tracer.instrument(app)
+metrics = Metrics("amf")
+metrics.instrument(app)
 
 # Network function addresses
 AUSF_ADDRESS = "http://ausf:5003"
@@ -10,72 +20,144 @@ SMF_ADDRESS = "http://smf:5005"
 G_NB_ADDRESS = "http://gnb:5001"
 
 class AMF:
-    def __init__(self):
-        self.ue_contexts = {}
-        self.k_amf = None
+    def __init__(self, transport):
+        self.transport = transport
+        self.ue_contexts = UEContextStore()
 
     def handle_registration(self, registration_request):
         print("[AMF] Received Registration Request")
         ue_id = registration_request['ue_id']
         
         # Initiate authentication
-        auth_request = {
+        auth_response = self.transport.post("ausf", "/authenticate", self.auth_request(ue_id))
+        security_command = self.on_authenticated(ue_id, auth_response)
+        self.transport.post("gnb", "/security_command", security_command)
+        
+        return {"status": "authentication_initiated"}
+
+    async def handle_registration_async(self, registration_request):
+        print("[AMF] Received Registration Request")
+        ue_id = registration_request['ue_id']
+
+        auth_response = await self.transport.post_async("ausf", "/authenticate", self.auth_request(ue_id))
+        security_command = self.on_authenticated(ue_id, auth_response)
+        await self.transport.post_async("gnb", "/security_command", security_command)
+
+        return {"status": "authentication_initiated"}
+
+    def auth_request(self, ue_id):
+        return {
             "ue_id": ue_id,
-            "serving_network": "5G:mnc001.mcc001.3gppnetwork.org"
+            "serving_network": DEFAULT_SN_NAME
         }
-        response = requests.post(f"{AUSF_ADDRESS}/authenticate", json=auth_request)
-        
-        # Store authentication context
-        self.ue_contexts[ue_id] = response.json()
-        self.k_amf = self.derive_k_amf(response.json()['k_ausf'])
+
+    def on_authenticated(self, ue_id, auth_response):
+        # Store authentication context with this UE's key hierarchy
+        keys = KeyHierarchy(ue_id, bytes.fromhex(auth_response['k_ausf']), DEFAULT_SN_NAME)
+        self.ue_contexts.put(ue_id, dict(auth_response, keys=keys))
         
-        # Send Security Mode Command
-        k_nas_enc = self.derive_key(self.k_amf, "NAS_ENC")
-        k_nas_int = self.derive_key(self.k_amf, "NAS_INT")
+        # Build Security Mode Command
+        k_nas_int = keys.nas_key(N_NAS_INT, ALG_IA0)
         
-        security_command = {
+        return {
             "ue_id": ue_id,
             "command": "NAS Security Mode Command",
             "mac": self.calculate_mac({"command": "NAS Security Mode Command"}, k_nas_int)
         }
-        requests.post(f"{G_NB_ADDRESS}/security_command", json=security_command)
-        
-        return {"status": "authentication_initiated"}
 
     def handle_security_complete(self, complete_message):
         print("[AMF] Received Security Mode Complete")
         ue_id = complete_message['ue_id']
+        context = self.ue_contexts.get(ue_id)
+        if context is None:
+            return {"status": "ue_not_found"}
+        ue_context, smf_request = self.security_complete_requests(ue_id, context['keys'],
+                                                                 complete_message.get('gnb_tunnel'))
+        
+        # Setup UE context in gNB
+        self.transport.post("gnb", "/ue_context_setup", ue_context)
+        
+        # Notify SMF
+        self.transport.post("smf", "/session_establishment", smf_request)
         
+        return {"status": "registration_complete"}
+
+    async def handle_security_complete_async(self, complete_message):
+        print("[AMF] Received Security Mode Complete")
+        ue_id = complete_message['ue_id']
+        context = self.ue_contexts.get(ue_id)
+        if context is None:
+            return {"status": "ue_not_found"}
+        ue_context, smf_request = self.security_complete_requests(ue_id, context['keys'],
+                                                                 complete_message.get('gnb_tunnel'))
+
+        # gNB context setup and SMF session establishment are independent
+        await asyncio.gather(
+            self.transport.post_async("gnb", "/ue_context_setup", ue_context),
+            self.transport.post_async("smf", "/session_establishment", smf_request),
+        )
+
+        return {"status": "registration_complete"}
+
+    def handle_deregistration(self, deregistration_request):
+        print("[AMF] Received Deregistration Request")
+        ue_id = deregistration_request['ue_id']
+        if self.ue_contexts.pop(ue_id) is None:
+            return {"status": "ue_not_found"}
+        # Release the PDU session (and its address) and the gNB's UE context
+        self.transport.post("smf", "/session_release", {"ue_id": ue_id})
+        self.transport.post("gnb", "/ue_context_release", {"ue_id": ue_id})
+        return {"status": "deregistered"}
+
+    async def handle_deregistration_async(self, deregistration_request):
+        print("[AMF] Received Deregistration Request")
+        ue_id = deregistration_request['ue_id']
+        if self.ue_contexts.pop(ue_id) is None:
+            return {"status": "ue_not_found"}
+        await asyncio.gather(
+            self.transport.post_async("smf", "/session_release", {"ue_id": ue_id}),
+            self.transport.post_async("gnb", "/ue_context_release", {"ue_id": ue_id}),
+        )
+        return {"status": "deregistered"}
+
+    def security_complete_requests(self, ue_id, keys, gnb_tunnel=None):
         # Derive K_gNB
-        k_gnb = self.derive_key(self.k_amf, "K_gNB")
+        k_gnb = keys.k_gnb().hex()
         
-        # Setup UE context in gNB
         ue_context = {
             "ue_id": ue_id,
             "k_gnb": k_gnb,
             "security_capabilities": ["5G-EA0", "5G-IA0"]
         }
-        requests.post(f"{G_NB_ADDRESS}/ue_context_setup", json=ue_context)
-        
-        # Notify SMF
         smf_request = {
             "ue_id": ue_id,
             "k_gnb": k_gnb
         }
-        requests.post(f"{SMF_ADDRESS}/session_establishment", json=smf_request)
-        
-        return {"status": "registration_complete"}
+        if gnb_tunnel is not None:
+            # Downlink tunnel endpoint the UPF sends to
+            smf_request["gnb_tunnel"] = gnb_tunnel
+        return ue_context, smf_request
 
-    def derive_k_amf(self, k_ausf):
-        return f"K_AMF_derived_from_{k_ausf[:10]}"
+    def calculate_mac(self, message, key):
+        return mac(key, str(message).encode())
 
-    def derive_key(self, parent_key, key_name):
-        return f"{key_name}_derived_from_{parent_key[:10]}"
+    def routes(self):
+        return {
+            '/registration': self.handle_registration,
+            '/security_complete': self.handle_security_complete,
+            '/deregistration': self.handle_deregistration,
+        }
 
-    def calculate_mac(self, message, key):
-        return f"MAC_{hashlib.sha256((str(message)+key).encode()).hexdigest()[:8]}"
+    def async_routes(self):
+        return {
+            '/registration': self.handle_registration_async,
+            '/security_complete': self.handle_security_complete_async,
+            '/deregistration': self.handle_deregistration_async,
+        }
 
-amf = AMF()
+amf = AMF(HTTPTransport({"ausf": AUSF_ADDRESS, "smf": SMF_ADDRESS, "gnb": G_NB_ADDRESS},
+                        tracer=tracer, metrics=metrics))
+metrics.gauge("ue_contexts", lambda: len(amf.ue_contexts))
 
 @app.route('/registration', methods=['POST'])
 def registration():
@@ -89,5 +171,14 @@ def security_complete():
     response = amf.handle_security_complete(data)
     return jsonify(response)
 
+@app.route('/deregistration', methods=['POST'])
+def deregistration():
+    data = request.json
+    response = amf.handle_deregistration(data)
+    return jsonify(response)
+
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5002)
\ No newline at end of file
+    if RUNTIME == "async":
+        run_async(amf.async_routes(), port=5002, clients=[amf.transport], tracer=tracer, metrics=metrics)
+    else:
+        app.run(host='0.0.0.0', port=5002)
@@ -1,23 +1,157 @@
 from flask import Flask, request, jsonify
-import requests
+import asyncio
+import collections
 import hashlib
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from common.aio_server import RUNTIME, run_async
+from common.kdf import DEFAULT_SN_NAME
+from common.metrics import Metrics
+from common.tracing import Tracer
+from common.transport import HTTPTransport
 
 app = Flask(__name__)
+tracer = Tracer("ausf")
+tracer.instrument(app)
+metrics = Metrics("ausf")
+metrics.instrument(app)
 
 UDM_ADDRESS = "http://udm:5004"
 
+# Prefetched authentication vectors kept per IMSI
+VECTOR_POOL_SIZE = int(os.environ.get("AUSF_VECTOR_POOL_SIZE", "8"))
+VECTOR_POOL_LOW_WATERMARK = int(os.environ.get("AUSF_VECTOR_POOL_LOW_WATERMARK", "2"))
+VECTOR_POOL_MAX_IMSIS = int(os.environ.get("AUSF_VECTOR_POOL_MAX_IMSIS", "100000"))
+
+class VectorPool:
+    """Bounded per-IMSI queues of unused authentication vectors from UDM."""
+
+    def __init__(self, size=VECTOR_POOL_SIZE, low_watermark=VECTOR_POOL_LOW_WATERMARK,
+                 max_imsis=VECTOR_POOL_MAX_IMSIS):
+        self.size = size
+        self.low_watermark = low_watermark
+        self.max_imsis = max_imsis
+        self.pools = collections.OrderedDict()
+        self.refilling = set()
+        self.lock = threading.Lock()
+
+    def take(self, ue_id):
+        with self.lock:
+            pool = self.pools.get(ue_id)
+            if not pool:
+                return None
+            self.pools.move_to_end(ue_id)
+            return pool.popleft()
+
+    def put(self, ue_id, vectors):
+        with self.lock:
+            pool = self.pools.get(ue_id)
+            if pool is None:
+                pool = self.pools[ue_id] = collections.deque(maxlen=self.size)
+                # Drop the least recently authenticated IMSI
+                if len(self.pools) > self.max_imsis:
+                    self.pools.popitem(last=False)
+            pool.extend(vectors)
+
+    def __len__(self):
+        return len(self.pools)
+
+    def claim_refill(self, ue_id):
+        """Return how many vectors to fetch, marking the IMSI as refilling."""
+        with self.lock:
+            missing = self.size - len(self.pools.get(ue_id, ()))
+            if ue_id in self.refilling or missing <= 0 or self.size - missing > self.low_watermark:
+                return 0
+            self.refilling.add(ue_id)
+            return missing
+
+    def refill_done(self, ue_id):
+        with self.lock:
+            self.refilling.discard(ue_id)
+
 class AUSF:
-    def __init__(self):
+    def __init__(self, transport, vector_pool=None):
+        self.transport = transport
+        self.vector_pool = vector_pool or VectorPool()
+        self.refill_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="av-refill")
+        self.refill_tasks = set()
         self.authentication_vectors = {}
 
     def authenticate(self, auth_request):
         print("[AUSF] Received Authentication Request")
         ue_id = auth_request['ue_id']
+        sn_name = auth_request.get('serving_network', DEFAULT_SN_NAME)
         
-        # Get authentication vector from UDM
-        response = requests.post(f"{UDM_ADDRESS}/auth_data", json={"ue_id": ue_id})
-        auth_vector = response.json()
-        
+        auth_vector = self.vector_pool.take(ue_id)
+        if auth_vector is None:
+            # Pool is cold, get authentication vectors from UDM on the critical path
+            auth_vector = self.fetch_vectors(ue_id, sn_name)
+            if 'k_ausf' not in auth_vector:
+                return auth_vector
+        count = self.vector_pool.claim_refill(ue_id)
+        if count:
+            self.refill_executor.submit(self.refill, ue_id, count, sn_name)
+        return self.on_auth_vector(ue_id, auth_vector)
+
+    async def authenticate_async(self, auth_request):
+        print("[AUSF] Received Authentication Request")
+        ue_id = auth_request['ue_id']
+        sn_name = auth_request.get('serving_network', DEFAULT_SN_NAME)
+
+        auth_vector = self.vector_pool.take(ue_id)
+        if auth_vector is None:
+            auth_vector = await self.fetch_vectors_async(ue_id, sn_name)
+            if 'k_ausf' not in auth_vector:
+                return auth_vector
+        count = self.vector_pool.claim_refill(ue_id)
+        if count:
+            task = asyncio.create_task(self.refill_async(ue_id, count, sn_name))
+            self.refill_tasks.add(task)
+            task.add_done_callback(self.refill_tasks.discard)
+        return self.on_auth_vector(ue_id, auth_vector)
+
+    def vector_request(self, ue_id, count, sn_name):
+        return {"ue_id": ue_id, "count": count, "serving_network": sn_name}
+
+    def fetch_vectors(self, ue_id, sn_name):
+        # Fetch a batch, use the first vector now and pool the rest
+        batch = self.transport.post("udm", "/auth_data", self.vector_request(ue_id, self.vector_pool.size, sn_name))
+        return self.on_vector_batch(ue_id, batch)
+
+    async def fetch_vectors_async(self, ue_id, sn_name):
+        batch = await self.transport.post_async("udm", "/auth_data",
+                                                self.vector_request(ue_id, self.vector_pool.size, sn_name))
+        return self.on_vector_batch(ue_id, batch)
+
+    def on_vector_batch(self, ue_id, batch):
+        if batch.get('status') != "success" or not batch['vectors']:
+            return batch
+        self.vector_pool.put(ue_id, batch['vectors'][1:])
+        return batch['vectors'][0]
+
+    def refill(self, ue_id, count, sn_name):
+        try:
+            batch = self.transport.post("udm", "/auth_data", self.vector_request(ue_id, count, sn_name))
+            if batch.get('status') == "success":
+                self.vector_pool.put(ue_id, batch['vectors'])
+        except Exception as e:
+            print(f"[AUSF] Vector prefetch for {ue_id} failed: {e}")
+        finally:
+            self.vector_pool.refill_done(ue_id)
+
+    async def refill_async(self, ue_id, count, sn_name):
+        try:
+            batch = await self.transport.post_async("udm", "/auth_data", self.vector_request(ue_id, count, sn_name))
+            if batch.get('status') == "success":
+                self.vector_pool.put(ue_id, batch['vectors'])
+        except Exception as e:
+            print(f"[AUSF] Vector prefetch for {ue_id} failed: {e}")
+        finally:
+            self.vector_pool.refill_done(ue_id)
+
+    def on_auth_vector(self, ue_id, auth_vector):
         # Store K_AUSF
         self.authentication_vectors[ue_id] = auth_vector
         
@@ -27,7 +161,15 @@ class AUSF:
             "auth_result": "authenticated"
         }
 
-ausf = AUSF()
+    def routes(self):
+        return {'/authenticate': self.authenticate}
+
+    def async_routes(self):
+        return {'/authenticate': self.authenticate_async}
+
+ausf = AUSF(HTTPTransport({"udm": UDM_ADDRESS}, tracer=tracer, metrics=metrics))
+metrics.gauge("authentication_vectors", lambda: len(ausf.authentication_vectors))
+metrics.gauge("vector_pool_imsis", lambda: len(ausf.vector_pool))
 
 @app.route('/authenticate', methods=['POST'])
 def authenticate():
@@ -36,4 +178,7 @@ def authenticate():
     return jsonify(response)
 
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5003)
\ No newline at end of file
+    if RUNTIME == "async":
+        run_async(ausf.async_routes(), port=5003, clients=[ausf.transport], tracer=tracer, metrics=metrics)
+    else:
+        app.run(host='0.0.0.0', port=5003)
@@ -0,0 +1,109 @@
+"""Contention benchmark for the per-UE security context store.
+
+Drives AMF registrations for many UEs from a thread pool with the network
+replaced by an in-memory stub, so only context handling is measured. All
+registrations finish before any security-complete is processed, which keeps
+every UE's context live at once. Each K_gNB is then checked against the K_AMF
+of its own UE.
+
+    python benchmarks/bench_context_store.py --ues 10000 --workers 64
+"""
+import argparse
+import contextlib
+import hashlib
+import importlib.util
+import io
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+from common.context_store import UEContextStore  # noqa: E402
+from common.kdf import KeyHierarchy  # noqa: E402
+from common.transport import Transport  # noqa: E402
+
+
+def load_nf(name):
+    spec = importlib.util.spec_from_file_location(name, os.path.join(ROOT, name, f"{name}.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def stub_k_ausf(ue_id):
+    return hashlib.sha256(ue_id.encode()).hexdigest()
+
+
+class StubTransport(Transport):
+    """Answers AUSF with a per-UE K_AUSF and records the K_gNB sent to gNB."""
+
+    def __init__(self):
+        self.k_gnb = {}
+
+    def post(self, peer, path, payload):
+        if path == "/authenticate":
+            return {"status": "success", "k_ausf": stub_k_ausf(payload['ue_id'])}
+        if path == "/ue_context_setup":
+            self.k_gnb[payload['ue_id']] = payload['k_gnb']
+        return {"status": "success"}
+
+    async def post_async(self, peer, path, payload):
+        return self.post(peer, path, payload)
+
+
+def run_amf(amf_module, stripes, ues, workers):
+    transport = StubTransport()
+    amf = amf_module.AMF(transport)
+    amf.ue_contexts = UEContextStore(stripes)
+    ue_ids = [f"imsi-00101{i:010d}" for i in range(ues)]
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool, contextlib.redirect_stdout(io.StringIO()):
+        list(pool.map(lambda ue_id: amf.handle_registration({"ue_id": ue_id}), ue_ids))
+        list(pool.map(lambda ue_id: amf.handle_security_complete({"ue_id": ue_id}), ue_ids))
+    elapsed = time.perf_counter() - start
+
+    mismatches = 0
+    for ue_id in ue_ids:
+        expected = KeyHierarchy(ue_id, bytes.fromhex(stub_k_ausf(ue_id))).k_gnb().hex()
+        mismatches += transport.k_gnb.get(ue_id) != expected
+    return ues / elapsed, mismatches
+
+
+def run_store(stripes, ues, workers, rounds=20):
+    store = UEContextStore(stripes)
+    ue_ids = [f"imsi-00101{i:010d}" for i in range(ues)]
+
+    def touch(ue_id):
+        for n in range(rounds):
+            store.update(ue_id, nas_count=n)
+            store.get(ue_id)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        list(pool.map(touch, ue_ids))
+    return 2 * rounds * ues / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--ues", type=int, default=10000)
+    parser.add_argument("--workers", type=int, default=64)
+    args = parser.parse_args()
+
+    # Switch threads aggressively so interleavings actually happen
+    sys.setswitchinterval(1e-5)
+    amf_module = load_nf("amf")
+
+    print(f"{args.ues} concurrent UEs, {args.workers} worker threads")
+    for stripes in (1, 16, 64, 256):
+        rate, mismatches = run_amf(amf_module, stripes, args.ues, args.workers)
+        ops = run_store(stripes, args.ues, args.workers)
+        print(f"stripes={stripes:4d}  AMF {rate:9.0f} registrations/s  "
+              f"store {ops:10.0f} ops/s  key mismatches {mismatches}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+"""Packets/s and Gbit/s through the user-space GTP-U data path over loopback.
+
+The data path runs in its own process with --tunnels sessions installed. A
+load process blasts G-PDUs at N3 (uplink) or raw IP packets at N6 (downlink)
+for --seconds, and a sink counts what comes out the other side, so the
+figures are forwarded traffic only. No kernel gtp module is needed.
+
+    python benchmarks/bench_gtpu.py --sizes 64 512 1400 --seconds 3
+"""
+import argparse
+import multiprocessing
+import os
+import socket
+import struct
+import sys
+import threading
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, os.path.join(ROOT, "upf"))
+from gtpu import GTPU_FLAGS, GTPU_G_PDU, GTPU_HEADER, GTPUDataPath  # noqa: E402
+from session_table import DryRunBackend, SessionTable  # noqa: E402
+
+LOOPBACK = "127.0.0.1"
+
+
+def ue_ip(i):
+    i += 1
+    return f"10.{(i >> 16) & 0xff}.{(i >> 8) & 0xff}.{i & 0xff}"
+
+
+def ip_packet(size, destination):
+    # Only the IPv4 destination matters to the data path
+    header = struct.pack("!BBHHHBBH4s4s", 0x45, 0, size, 0, 0, 64, 17, 0,
+                         socket.inet_aton("192.0.2.1"), socket.inet_aton(destination))
+    return header + bytes(size - len(header))
+
+
+def serve(tunnels, sink_port, ready, ports, stop):
+    table = SessionTable(DryRunBackend())
+    for i in range(tunnels):
+        table.establish(f"imsi-00101{i:010d}", ue_ip(i), gnb_teid=0x1000 + i, gnb_address=(LOOPBACK, sink_port))
+    datapath = GTPUDataPath(table, (LOOPBACK, 0), (LOOPBACK, 0), n6_peer=(LOOPBACK, sink_port))
+    ports.extend([datapath.n3.getsockname()[1], datapath.n6.getsockname()[1]])
+    ready.set()
+    threading.Thread(target=lambda: (stop.wait(), datapath.stop()), daemon=True).start()
+    datapath.serve()
+    print(f"  data path {datapath.stats}", file=sys.stderr)
+
+
+def blast(port, packets, seconds, stop):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 4 << 20)
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline and not stop.is_set():
+        for packet in packets:
+            try:
+                sock.sendto(packet, (LOOPBACK, port))
+            except BlockingIOError:
+                pass
+
+
+def run(direction, size, tunnels, seconds):
+    sink = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sink.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 8 << 20)
+    sink.bind((LOOPBACK, 0))
+    sink.settimeout(0.5)
+
+    manager = multiprocessing.Manager()
+    ports, ready, stop = manager.list(), manager.Event(), manager.Event()
+    server = multiprocessing.Process(target=serve, args=(tunnels, sink.getsockname()[1], ready, ports, stop))
+    server.start()
+    ready.wait()
+    n3_port, n6_port = ports
+
+    # A spread of tunnels so lookups are not all one dict slot
+    if direction == "uplink":
+        packets = [GTPU_HEADER.pack(GTPU_FLAGS, GTPU_G_PDU, size, 1 + i % tunnels) + ip_packet(size, ue_ip(i % tunnels))
+                   for i in range(64)]
+        target = n3_port
+    else:
+        packets = [ip_packet(size, ue_ip(i % tunnels)) for i in range(64)]
+        target = n6_port
+    loader = multiprocessing.Process(target=blast, args=(target, packets, seconds, stop))
+
+    buf = bytearray(65535)
+    received = octets = 0
+    loader.start()
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        try:
+            octets += sink.recv_into(buf)
+            received += 1
+        except socket.timeout:
+            pass
+    elapsed = time.perf_counter() - start
+    stop.set()
+    loader.join()
+    server.join()
+    sink.close()
+    return received / elapsed, octets * 8 / elapsed / 1e9
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[64, 512, 1400], help="inner IP packet bytes")
+    parser.add_argument("--tunnels", type=int, default=10000)
+    parser.add_argument("--seconds", type=float, default=3)
+    args = parser.parse_args()
+
+    print(f"{args.tunnels} tunnels, {args.seconds:.0f}s per run")
+    for direction in ("uplink", "downlink"):
+        for size in args.sizes:
+            pps, gbps = run(direction, size, args.tunnels, args.seconds)
+            print(f"{direction:<9} {size:>5} B  {pps:>10.0f} packets/s  {gbps:>7.3f} Gbit/s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""Registrations/sec over the NF call chain with and without pooled clients.
+
+A local keep-alive HTTP server stands in for every NF so only the client-side
+connection handling differs between the two runs. One registration replays
+the eight hops of the group_key_mgmt attach flow.
+
+    python benchmarks/bench_http_pool.py --registrations 2000 --concurrency 32
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.http_client import NFClient  # noqa: E402
+
+# gNB->AMF, AMF->AUSF, AUSF->UDM, AMF->gNB, gNB->AMF, AMF->gNB, AMF->SMF, SMF->UPF
+REGISTRATION_HOPS = [
+    "/registration", "/authenticate", "/auth_data", "/security_command",
+    "/security_complete", "/ue_context_setup", "/session_establishment", "/configure",
+]
+
+RESPONSE = json.dumps({"status": "success", "k_ausf": "K_AUSF_bench"}).encode()
+
+
+class StandInServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(RESPONSE)))
+        self.end_headers()
+        self.wfile.write(RESPONSE)
+
+    def log_message(self, *args):
+        pass
+
+
+def run(post, base_url, registrations, concurrency):
+    def register(i):
+        ue_id = f"imsi-00101{i:010d}"
+        for hop in REGISTRATION_HOPS:
+            post(f"{base_url}{hop}", json={"ue_id": ue_id}).json()
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(register, range(registrations)))
+    return registrations / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--registrations", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    args = parser.parse_args()
+
+    server = StandInServer(("127.0.0.1", 0), StandInHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_port}"
+
+    unpooled = run(requests.post, base_url, args.registrations, args.concurrency)
+    client = NFClient(pool_maxsize=args.concurrency)
+    pooled = run(client.post, base_url, args.registrations, args.concurrency)
+    client.close()
+    server.shutdown()
+
+    print(f"hops/registration: {len(REGISTRATION_HOPS)}, concurrency: {args.concurrency}")
+    print(f"unpooled requests.post : {unpooled:10.1f} registrations/s")
+    print(f"pooled NFClient        : {pooled:10.1f} registrations/s ({pooled / unpooled:.2f}x)")
+
+
+if __name__ == '__main__':
+    main()
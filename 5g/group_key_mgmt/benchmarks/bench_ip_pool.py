@@ -0,0 +1,56 @@
+"""Allocate/release rate of the SMF UE address pools at a million sessions.
+
+Allocates --sessions addresses from the internet DNN pools, releases a random
+half, allocates as many again, then releases everything, checking that no
+address is ever handed out twice.
+
+    python benchmarks/bench_ip_pool.py --sessions 1000000 --pools 10.0.0.0/12
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, os.path.join(ROOT, "smf"))
+from ip_pool import DEFAULT_DNN, PoolSet  # noqa: E402
+
+
+def timed(label, count, fn):
+    start = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<24} {count:>9} in {elapsed:6.2f}s  {count / elapsed:>10.0f}/s  "
+          f"{elapsed / count * 1e6:6.2f} us/op")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=1000000)
+    parser.add_argument("--pools", nargs="+", default=["10.0.0.0/12"],
+                        help="subnets of the internet DNN, used in order")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    pools = PoolSet({DEFAULT_DNN: args.pools})
+    print(f"pools {' '.join(args.pools)}: built in {(time.perf_counter() - start) * 1e3:.1f} ms")
+
+    addresses = timed("allocate", args.sessions,
+                      lambda: [pools.allocate() for _ in range(args.sessions)])
+    assert len(set(addresses)) == len(addresses), "duplicate address"
+
+    churn = random.sample(addresses, args.sessions // 2)
+    timed("release half", len(churn), lambda: [pools.release(address) for address in churn])
+    reused = timed("allocate again", len(churn), lambda: [pools.allocate() for _ in churn])
+    live = set(addresses).difference(churn)
+    assert len(set(reused)) == len(reused) and live.isdisjoint(reused), "duplicate address"
+
+    live.update(reused)
+    timed("release all", len(live), lambda: [pools.release(address) for address in live])
+    assert pools.in_use() == 0
+
+
+if __name__ == '__main__':
+    main()
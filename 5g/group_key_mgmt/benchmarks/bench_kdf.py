@@ -0,0 +1,76 @@
+"""Keys/sec for the TS 33.501 key derivations in common.kdf.
+
+Measures single KDF calls, the full per-UE hierarchy (K_SEAF down to the
+NAS/RRC/UP keys) derived one UE at a time, cached re-reads, and the batch
+API. It then estimates how many cores the AMF needs for a target
+registration rate. Runs on one core.
+
+    python benchmarks/bench_kdf.py --ues 100000 --target-rate 50000
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common import kdf  # noqa: E402
+
+# Derivations one registration costs the AMF: K_SEAF, K_AMF, K_NASint, K_gNB
+AMF_KEYS_PER_REGISTRATION = 4
+KEYS_PER_HIERARCHY = 9
+
+
+def full_hierarchy(keys):
+    keys.nas_key(kdf.N_NAS_ENC, kdf.ALG_EA0)
+    keys.nas_key(kdf.N_NAS_INT, kdf.ALG_IA0)
+    keys.as_key(kdf.N_RRC_ENC, kdf.ALG_EA0)
+    keys.as_key(kdf.N_RRC_INT, kdf.ALG_IA0)
+    keys.as_key(kdf.N_UP_ENC, kdf.ALG_EA0)
+    keys.as_key(kdf.N_UP_INT, kdf.ALG_IA0)
+    return keys
+
+
+def rate(label, keys, start):
+    per_sec = keys / (time.perf_counter() - start)
+    print(f"{label:<34} {per_sec:12.0f} keys/s")
+    return per_sec
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--ues", type=int, default=100000)
+    parser.add_argument("--target-rate", type=float, default=10000, help="registrations/s to size for")
+    args = parser.parse_args()
+
+    supis = [f"imsi-00101{i:010d}" for i in range(args.ues)]
+    k_ausfs = [os.urandom(32) for _ in range(args.ues)]
+
+    start = time.perf_counter()
+    for k_ausf in k_ausfs:
+        kdf.derive_k_seaf(k_ausf)
+    single = rate("single kdf() call", args.ues, start)
+
+    start = time.perf_counter()
+    hierarchies = [full_hierarchy(kdf.KeyHierarchy(supi, k_ausf)) for supi, k_ausf in zip(supis, k_ausfs)]
+    rate("per-UE hierarchy, cold", KEYS_PER_HIERARCHY * args.ues, start)
+
+    start = time.perf_counter()
+    for keys in hierarchies:
+        full_hierarchy(keys)
+    rate("per-UE hierarchy, cached", KEYS_PER_HIERARCHY * args.ues, start)
+
+    start = time.perf_counter()
+    batch = kdf.derive_hierarchy_batch(supis, k_ausfs)
+    rate("derive_hierarchy_batch", KEYS_PER_HIERARCHY * args.ues, start)
+
+    # The batch path must agree with the per-UE path
+    assert batch["k_gnb"][-1] == hierarchies[-1].k_gnb()
+    assert batch["k_up_int"][0] == hierarchies[0].as_key(kdf.N_UP_INT, kdf.ALG_IA0)
+
+    per_core = single / AMF_KEYS_PER_REGISTRATION
+    print(f"\nAMF key derivation: ~{per_core:.0f} registrations/s per core; "
+          f"{args.target_rate:.0f}/s needs {args.target_rate / per_core:.2f} cores for crypto alone")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+"""Recording cost of the NF metrics, per request and per downstream call.
+
+Times the pieces a request pays for: a route's start/finish pair (in-flight gauge, status counter, latency), and a handler
+wrapped by Metrics.wrap against the bare handler. Scrape cost is reported
+for context but is paid by the scraper, not by requests.
+
+    python benchmarks/bench_metrics.py --iterations 1000000
+"""
+import argparse
+import os
+import sys
+import time
+import timeit
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+from common.metrics import Metrics  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=1000000)
+    args = parser.parse_args()
+    n = args.iterations
+
+    def per_call_ns(fn):
+        return min(timeit.repeat(fn, number=n, repeat=5)) / n * 1e9
+
+    metrics = Metrics("bench")
+    stats = metrics.route("/registration")
+    payload = {"ue_id": "imsi-001010000000001"}
+
+    def handler(payload):
+        return {"status": "success"}
+    wrapped = metrics.wrap("/wrapped", handler)
+
+    def route_call():
+        stats.finish(stats.start(), 200)
+
+    def downstream_call():
+        call = metrics.call("ausf", "/authenticate")
+        call.finish(call.start(), 200)
+
+    baseline = per_call_ns(lambda: None)
+    rows = [
+        ("clock read", per_call_ns(time.perf_counter_ns)),
+        ("route start + finish", per_call_ns(route_call)),
+        ("downstream lookup + start + finish", per_call_ns(downstream_call)),
+        ("bare handler", per_call_ns(lambda: handler(payload))),
+        ("Metrics.wrap handler", per_call_ns(lambda: wrapped(payload))),
+    ]
+    print(f"{n} iterations, loop overhead {baseline:.0f} ns subtracted")
+    for label, ns in rows:
+        print(f"{label:<36} {ns - baseline:>8.0f} ns")
+
+    for i in range(20):
+        metrics.route(f"/route{i}")
+        metrics.call("peer", f"/route{i}")
+    start = time.perf_counter()
+    text = metrics.render()
+    print(f"scrape of {len(text.splitlines())} lines: {(time.perf_counter() - start) * 1e3:.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
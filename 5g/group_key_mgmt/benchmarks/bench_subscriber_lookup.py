@@ -0,0 +1,63 @@
+"""Open time and lookup latency of the UDM subscriber store at scale.
+
+Builds (or reuses) a synthetic SQLite store per size, then times random
+IMSI lookups and atomic SQN reservations.
+
+    python benchmarks/bench_subscriber_lookup.py --sizes 1000000 10000000 --db-dir /tmp/udm
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, os.path.join(ROOT, "udm"))
+from import_subscribers import synthetic_rows  # noqa: E402
+from subscriber_store import SubscriberStore  # noqa: E402
+
+
+def percentiles(samples):
+    samples = sorted(samples)
+    return {p: samples[min(len(samples) - 1, int(len(samples) * p / 100))] for p in (50, 99)}
+
+
+def timed(fn, imsis):
+    samples = []
+    for imsi in imsis:
+        start = time.perf_counter()
+        fn(imsi)
+        samples.append((time.perf_counter() - start) * 1e6)
+    return percentiles(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000000, 10000000])
+    parser.add_argument("--lookups", type=int, default=100000)
+    parser.add_argument("--db-dir", default=tempfile.gettempdir())
+    args = parser.parse_args()
+
+    for size in args.sizes:
+        path = os.path.join(args.db_dir, f"udm-subscribers-{size}.db")
+        if not os.path.exists(path):
+            start = time.perf_counter()
+            SubscriberStore(path).import_rows(synthetic_rows(size))
+            print(f"built {size} subscribers in {time.perf_counter() - start:.1f}s -> {path}")
+
+        start = time.perf_counter()
+        store = SubscriberStore(path)
+        store.get("imsi-001010000000001")
+        open_ms = (time.perf_counter() - start) * 1e3
+
+        imsis = [f"imsi-00101{random.randint(1, size):010d}" for _ in range(args.lookups)]
+        lookup = timed(store.get, imsis)
+        reserve = timed(lambda imsi: store.reserve_sqn(imsi, 1), imsis[:args.lookups // 10])
+        print(f"{size:>10} subscribers  open {open_ms:6.2f} ms  "
+              f"lookup p50 {lookup[50]:6.1f} us p99 {lookup[99]:6.1f} us  "
+              f"sqn reserve p50 {reserve[50]:6.1f} us p99 {reserve[99]:6.1f} us")
+
+
+if __name__ == '__main__':
+    main()
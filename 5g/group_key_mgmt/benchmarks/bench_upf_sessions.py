@@ -0,0 +1,84 @@
+"""Session setup rate of the UPF session table at different rule batch sizes.
+
+Establishes --sessions sessions, flushing the forwarding rules every
+--batch-sizes sessions through the dry-run backend, which renders the
+ip/iptables-restore batches without running them. A second pass re-sends
+every session to show that repeats change no rules.
+
+--spawn adds the cost of the two process launches each batch needs on a real
+host (a `true` per command), and a legacy row that launches the five
+commands the old /configure handler ran for every session.
+
+    python benchmarks/bench_upf_sessions.py --sessions 100000 --spawn
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, os.path.join(ROOT, "upf"))
+from session_table import DryRunBackend, SessionTable  # noqa: E402
+
+
+class SpawnBackend(DryRunBackend):
+    """Dry-run backend that also pays for launching ip and iptables-restore."""
+
+    def apply(self, adds, removes):
+        failed = super().apply(adds, removes)
+        subprocess.run(["true"], capture_output=True)
+        subprocess.run(["true"], capture_output=True)
+        return failed
+
+
+def ue_ip(i):
+    return f"10.{(i >> 16) & 0xff}.{(i >> 8) & 0xff}.{i & 0xff}"
+
+
+def run(backend, sessions, batch_size):
+    table = SessionTable(backend)
+    start = time.perf_counter()
+    for i in range(sessions):
+        table.establish(f"imsi-00101{i:010d}", ue_ip(i), "00" * 16)
+        if (i + 1) % batch_size == 0:
+            table.flush()
+    table.flush()
+    setup = time.perf_counter() - start
+
+    rules = backend.rules
+    start = time.perf_counter()
+    for i in range(sessions):
+        table.establish(f"imsi-00101{i:010d}", ue_ip(i), "00" * 16)
+    table.flush()
+    repeat = time.perf_counter() - start
+    assert backend.rules == rules, "repeated sessions changed rules"
+    return setup, repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=100000)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 16, 256, 4096])
+    parser.add_argument("--spawn", action="store_true", help="include process launch cost per batch")
+    args = parser.parse_args()
+
+    print(f"{args.sessions} sessions, {'spawning' if args.spawn else 'dry-run'} backend")
+    if args.spawn:
+        legacy = min(args.sessions, 200)
+        start = time.perf_counter()
+        for _ in range(legacy):
+            for _ in range(5):
+                subprocess.run(["true"])
+        print(f"legacy per-session commands  {legacy / (time.perf_counter() - start):>12.0f} sessions/s")
+
+    for batch_size in args.batch_sizes:
+        backend = SpawnBackend() if args.spawn else DryRunBackend()
+        setup, repeat = run(backend, args.sessions, batch_size)
+        print(f"batch {batch_size:>5}  {backend.batches:>7} batches  "
+              f"setup {args.sessions / setup:>10.0f} sessions/s  "
+              f"repeat {args.sessions / repeat:>10.0f} sessions/s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1 @@
+# Helpers shared by the group_key_mgmt network functions
@@ -0,0 +1,56 @@
+import os
+
+from common.metrics import CONTENT_TYPE
+from common.tracing import TRACEPARENT
+
+# "flask" keeps the threaded dev server, "async" serves every route on one event loop
+RUNTIME = os.environ.get("NF_RUNTIME", "flask")
+
+
+def _json_view(handler, path, tracer, metrics):
+    from aiohttp import web
+
+    name = f"{tracer.service} {path}" if tracer else None
+    stats = metrics.route(path) if metrics else None
+
+    async def call(request):
+        data = await request.json()
+        if tracer is None:
+            return await handler(data)
+        # Each request runs in its own task, so the span stays with it
+        with tracer.span(name, "server", request.headers.get(TRACEPARENT)):
+            return await handler(data)
+
+    async def view(request):
+        if stats is not None:
+            start, status = stats.start(), 500
+        try:
+            result = await call(request)
+            # Handlers may return (body, status) like Flask views
+            body, status = result if isinstance(result, tuple) else (result, 200)
+            return web.json_response(body, status=status)
+        finally:
+            if stats is not None:
+                stats.finish(start, status)
+    return view
+
+
+def run_async(routes, port, clients=(), host='0.0.0.0', tracer=None, metrics=None):
+    """Serve {path: coroutine(json) -> dict} as POST routes with aiohttp."""
+    from aiohttp import web
+
+    app = web.Application()
+    for path, handler in routes.items():
+        app.router.add_post(path, _json_view(handler, path, tracer, metrics))
+    if metrics is not None:
+        async def metrics_view(request):
+            return web.Response(text=metrics.render(), headers={"Content-Type": CONTENT_TYPE})
+        app.router.add_get('/metrics', metrics_view)
+
+    async def close_clients(app):
+        for client in clients:
+            await client.close()
+    app.on_cleanup.append(close_clients)
+
+    print(f"Serving {len(routes)} routes on {host}:{port} (async runtime)")
+    web.run_app(app, host=host, port=port, backlog=4096, print=None)
@@ -0,0 +1,44 @@
+import threading
+
+
+class UEContextStore:
+    """Per-UE contexts keyed by ue_id, sharded over independently locked stripes.
+
+    Registrations for different UEs only contend when their ids hash to the
+    same stripe, so parallel procedures never see each other's keys.
+    """
+
+    def __init__(self, stripes=64):
+        self._stripes = [({}, threading.Lock()) for _ in range(stripes)]
+
+    def _stripe(self, ue_id):
+        return self._stripes[hash(ue_id) % len(self._stripes)]
+
+    def get(self, ue_id, default=None):
+        contexts, lock = self._stripe(ue_id)
+        with lock:
+            return contexts.get(ue_id, default)
+
+    def put(self, ue_id, context):
+        contexts, lock = self._stripe(ue_id)
+        with lock:
+            contexts[ue_id] = context
+
+    def update(self, ue_id, **fields):
+        """Merge fields into the UE's context and return the new context."""
+        contexts, lock = self._stripe(ue_id)
+        with lock:
+            context = dict(contexts.get(ue_id, {}), **fields)
+            contexts[ue_id] = context
+            return context
+
+    def pop(self, ue_id, default=None):
+        contexts, lock = self._stripe(ue_id)
+        with lock:
+            return contexts.pop(ue_id, default)
+
+    def __contains__(self, ue_id):
+        return self.get(ue_id) is not None
+
+    def __len__(self):
+        return sum(len(contexts) for contexts, _ in self._stripes)
@@ -0,0 +1,67 @@
+import os
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Pool settings shared by every NF, overridable per container
+POOL_CONNECTIONS = int(os.environ.get("NF_POOL_CONNECTIONS", "8"))  # peer hosts kept pooled
+POOL_MAXSIZE = int(os.environ.get("NF_POOL_MAXSIZE", "64"))  # sockets kept per peer
+KEEPALIVE = os.environ.get("NF_KEEPALIVE", "1") != "0"
+TIMEOUT = float(os.environ.get("NF_HTTP_TIMEOUT", "5"))  # seconds, connect + read
+
+
+class NFClient:
+    """Keep-alive HTTP client that reuses pooled connections to peer NFs."""
+
+    def __init__(self, pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE,
+                 keepalive=KEEPALIVE, timeout=TIMEOUT):
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        if not keepalive:
+            self.session.headers["Connection"] = "close"
+
+    def post(self, url, json=None, **kwargs):
+        kwargs.setdefault("timeout", self.timeout)
+        return self.session.post(url, json=json, **kwargs)
+
+    def close(self):
+        self.session.close()
+
+
+class AsyncNFClient:
+    """aiohttp counterpart of NFClient for NFs served by the async runtime."""
+
+    def __init__(self, pool_maxsize=POOL_MAXSIZE, keepalive=KEEPALIVE, timeout=TIMEOUT):
+        self.pool_maxsize = pool_maxsize
+        self.keepalive = keepalive
+        self.timeout = timeout
+        self._session = None
+
+    def _get_session(self):
+        # Created lazily so the session binds to the loop that serves the NF
+        if self._session is None:
+            import aiohttp
+            connector = aiohttp.TCPConnector(limit=0, limit_per_host=self.pool_maxsize,
+                                             force_close=not self.keepalive)
+            self._session = aiohttp.ClientSession(
+                connector=connector, timeout=aiohttp.ClientTimeout(total=self.timeout))
+        return self._session
+
+    async def post_json(self, url, payload, headers=None):
+        return (await self.post_json_status(url, payload, headers))[1]
+
+    async def post_json_status(self, url, payload, headers=None):
+        """(HTTP status, decoded JSON body), the body None if it is not JSON."""
+        async with self._get_session().post(url, json=payload, headers=headers) as response:
+            try:
+                return response.status, await response.json(content_type=None)
+            except ValueError:
+                return response.status, None
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
@@ -0,0 +1,155 @@
+"""3GPP key derivations for the 5G key hierarchy (TS 33.220 Annex B, TS 33.501 Annex A).
+
+Keys are bytes; the NFs exchange them as hex strings in their JSON messages.
+"""
+import functools
+import hmac
+
+DEFAULT_SN_NAME = "5G:mnc001.mcc001.3gppnetwork.org"
+
+# FC values, TS 33.501 Annex A
+FC_K_AUSF = 0x6A
+FC_K_SEAF = 0x6C
+FC_K_AMF = 0x6D
+FC_K_GNB = 0x6E
+FC_ALGORITHM_KEY = 0x69
+
+# Algorithm type distinguishers, TS 33.501 Annex A.8
+N_NAS_ENC = 0x01
+N_NAS_INT = 0x02
+N_RRC_ENC = 0x03
+N_RRC_INT = 0x04
+N_UP_ENC = 0x05
+N_UP_INT = 0x06
+
+# Algorithm identities for the 5G-EA0 / 5G-IA0 capabilities the NFs negotiate
+ALG_EA0 = 0x00
+ALG_IA0 = 0x00
+
+ACCESS_3GPP = 0x01
+DEFAULT_ABBA = b"\x00\x00"
+
+
+def encode_s(fc, params):
+    """S = FC || P0 || L0 || ... || Pn || Ln."""
+    s = bytearray([fc])
+    for p in params:
+        s += p
+        s += len(p).to_bytes(2, "big")
+    return bytes(s)
+
+
+def kdf(key, fc, *params):
+    """Generic KDF: HMAC-SHA-256(key, S)."""
+    return hmac.digest(key, encode_s(fc, params), "sha256")
+
+
+def kdf_batch(keys, fc, *params):
+    """kdf() for many keys sharing the same parameters, S is encoded once."""
+    s = encode_s(fc, params)
+    digest = hmac.digest
+    return [digest(key, s, "sha256") for key in keys]
+
+
+def supi_param(supi):
+    return supi.split("-", 1)[-1].encode()
+
+
+def derive_k_ausf(ck_ik, sqn_xor_ak, sn_name=DEFAULT_SN_NAME):
+    return kdf(ck_ik, FC_K_AUSF, sn_name.encode(), sqn_xor_ak)
+
+
+def derive_k_seaf(k_ausf, sn_name=DEFAULT_SN_NAME):
+    return kdf(k_ausf, FC_K_SEAF, sn_name.encode())
+
+
+def derive_k_amf(k_seaf, supi, abba=DEFAULT_ABBA):
+    return kdf(k_seaf, FC_K_AMF, supi_param(supi), abba)
+
+
+def derive_k_gnb(k_amf, uplink_nas_count=0, access_type=ACCESS_3GPP):
+    return kdf(k_amf, FC_K_GNB, uplink_nas_count.to_bytes(4, "big"), bytes([access_type]))
+
+
+def derive_algorithm_key(parent_key, distinguisher, algorithm_id):
+    """NAS/RRC/UP key, the 128 least significant bits of the KDF output."""
+    return kdf(parent_key, FC_ALGORITHM_KEY, bytes([distinguisher]), bytes([algorithm_id]))[16:]
+
+
+def mac(key, message):
+    """32-bit HMAC-SHA-256 tag as hex, standing in for a 128-NIA MAC-I."""
+    return hmac.digest(key, message, "sha256")[:4].hex()
+
+
+class KeyHierarchy:
+    """One UE's keys below K_AUSF, each derived on first use and then cached."""
+
+    def __init__(self, supi, k_ausf, sn_name=DEFAULT_SN_NAME, abba=DEFAULT_ABBA):
+        self.supi = supi
+        self.k_ausf = k_ausf
+        self.sn_name = sn_name
+        self.abba = abba
+        self._k_gnb = {}
+        self._algorithm_keys = {}
+
+    @functools.cached_property
+    def k_seaf(self):
+        return derive_k_seaf(self.k_ausf, self.sn_name)
+
+    @functools.cached_property
+    def k_amf(self):
+        return derive_k_amf(self.k_seaf, self.supi, self.abba)
+
+    def k_gnb(self, uplink_nas_count=0):
+        key = self._k_gnb.get(uplink_nas_count)
+        if key is None:
+            key = self._k_gnb[uplink_nas_count] = derive_k_gnb(self.k_amf, uplink_nas_count)
+        return key
+
+    def nas_key(self, distinguisher, algorithm_id):
+        return self._algorithm_key(self.k_amf, distinguisher, algorithm_id)
+
+    def as_key(self, distinguisher, algorithm_id, uplink_nas_count=0):
+        """RRC or UP key below K_gNB."""
+        return self._algorithm_key(self.k_gnb(uplink_nas_count), distinguisher, algorithm_id)
+
+    def _algorithm_key(self, parent_key, distinguisher, algorithm_id):
+        cache_key = (parent_key, distinguisher, algorithm_id)
+        key = self._algorithm_keys.get(cache_key)
+        if key is None:
+            key = self._algorithm_keys[cache_key] = derive_algorithm_key(parent_key, distinguisher, algorithm_id)
+        return key
+
+
+def derive_hierarchy_batch(supis, k_ausfs, sn_name=DEFAULT_SN_NAME, abba=DEFAULT_ABBA,
+                           uplink_nas_count=0, enc_algorithm=0, int_algorithm=0):
+    """Derive the full key hierarchy for many UEs level by level.
+
+    Every level except K_AMF has the same S for all UEs, so each level is a
+    single kdf_batch pass. Returns a dict of per-level key lists in UE order.
+    """
+    k_seaf = kdf_batch(k_ausfs, FC_K_SEAF, sn_name.encode())
+    # K_AMF differs per UE only in P0, pre-encode the shared tail
+    tail = abba + len(abba).to_bytes(2, "big")
+    digest = hmac.digest
+    k_amf = []
+    for key, supi in zip(k_seaf, supis):
+        p0 = supi_param(supi)
+        k_amf.append(digest(key, bytes([FC_K_AMF]) + p0 + len(p0).to_bytes(2, "big") + tail, "sha256"))
+    k_gnb = kdf_batch(k_amf, FC_K_GNB, uplink_nas_count.to_bytes(4, "big"), bytes([ACCESS_3GPP]))
+
+    def algorithm_keys(parents, distinguisher, algorithm_id):
+        keys = kdf_batch(parents, FC_ALGORITHM_KEY, bytes([distinguisher]), bytes([algorithm_id]))
+        return [key[16:] for key in keys]
+
+    return {
+        "k_seaf": k_seaf,
+        "k_amf": k_amf,
+        "k_gnb": k_gnb,
+        "k_nas_enc": algorithm_keys(k_amf, N_NAS_ENC, enc_algorithm),
+        "k_nas_int": algorithm_keys(k_amf, N_NAS_INT, int_algorithm),
+        "k_rrc_enc": algorithm_keys(k_gnb, N_RRC_ENC, enc_algorithm),
+        "k_rrc_int": algorithm_keys(k_gnb, N_RRC_INT, int_algorithm),
+        "k_up_enc": algorithm_keys(k_gnb, N_UP_ENC, enc_algorithm),
+        "k_up_int": algorithm_keys(k_gnb, N_UP_INT, int_algorithm),
+    }
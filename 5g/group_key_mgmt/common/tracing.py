@@ -0,0 +1,159 @@
+import atexit
+import contextlib
+import contextvars
+import json
+import os
+import secrets
+import threading
+import time
+from collections import deque
+
+FLUSH_INTERVAL = 1.0  # seconds between exporter writes
+
+TRACEPARENT = "traceparent"
+
+# Span the current request or task is running in
+_current = contextvars.ContextVar("span", default=None)
+
+
+class SpanContext:
+    __slots__ = ("trace_id", "span_id")
+
+    def __init__(self, trace_id, span_id):
+        self.trace_id = trace_id
+        self.span_id = span_id
+
+    def traceparent(self):
+        # W3C trace context, always sampled
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+    @classmethod
+    def parse(cls, header):
+        parts = header.split("-") if header else ()
+        if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+            return None
+        return cls(parts[1], parts[2])
+
+
+class JSONLExporter:
+    """Buffers finished spans in memory and appends them to a file from a
+    background thread, so a request only pays for a deque append."""
+
+    def __init__(self, path):
+        self.path = path
+        self.buffer = deque()
+        self.lock = threading.Lock()
+        threading.Thread(target=self._run, daemon=True).start()
+        atexit.register(self.flush)
+
+    def export(self, record):
+        self.buffer.append(record)
+
+    def flush(self):
+        with self.lock:
+            # Drained in place: append and popleft are atomic, so a span
+            # exported meanwhile is either taken now or left for the next flush
+            buffer = self.buffer
+            records = [buffer.popleft() for _ in range(len(buffer))]
+            if records:
+                with open(self.path, "a") as f:
+                    f.writelines(json.dumps(record, separators=(",", ":")) + "\n" for record in records)
+
+    def _run(self):
+        while True:
+            time.sleep(FLUSH_INTERVAL)
+            self.flush()
+
+
+_exporters = {}
+_exporters_lock = threading.Lock()
+
+def exporter_for(path):
+    # NFs sharing a process (loadgen.py) and a file share one exporter
+    with _exporters_lock:
+        if path not in _exporters:
+            _exporters[path] = JSONLExporter(path)
+        return _exporters[path]
+
+
+class Tracer:
+    """Records server, client and internal spans of one NF.
+
+    Spans go to <NF_TRACE_DIR>/<service>.jsonl; with no directory nothing is
+    recorded, but incoming trace context is still passed on to the next hop.
+    """
+
+    def __init__(self, service=None, trace_dir=None):
+        self.service = service
+        self.exporter = None
+        trace_dir = trace_dir or os.environ.get("NF_TRACE_DIR")
+        if service and trace_dir:
+            os.makedirs(trace_dir, exist_ok=True)
+            self.exporter = exporter_for(os.path.join(trace_dir, f"{service}.jsonl"))
+
+    @contextlib.contextmanager
+    def span(self, name, kind="internal", traceparent=None):
+        """Runs the block as a child of the incoming traceparent, or of the
+        current span; with neither, the block starts a new trace."""
+        parent = SpanContext.parse(traceparent) if traceparent else _current.get()
+        if self.exporter is None:
+            token = _current.set(parent)
+            try:
+                yield parent
+            finally:
+                _current.reset(token)
+            return
+
+        span = SpanContext(parent.trace_id if parent else secrets.token_hex(16), secrets.token_hex(8))
+        token = _current.set(span)
+        start = time.time_ns()
+        try:
+            yield span
+        finally:
+            end = time.time_ns()
+            _current.reset(token)
+            self.exporter.export({
+                "trace_id": span.trace_id,
+                "span_id": span.span_id,
+                "parent_id": parent.span_id if parent else None,
+                "service": self.service,
+                "name": name,
+                "kind": kind,
+                "start": start,
+                "end": end,
+            })
+
+    def headers(self):
+        span = _current.get()
+        return {TRACEPARENT: span.traceparent()} if span else {}
+
+    def traceparent(self):
+        """The current span's context, to resume its trace later with span()."""
+        span = _current.get()
+        return span.traceparent() if span else None
+
+    def wrap(self, path, handler):
+        """Server span around a handler(payload) called without HTTP."""
+        name = f"{self.service} {path}"
+
+        def traced(payload):
+            with self.span(name, "server"):
+                return handler(payload)
+        return traced
+
+    def instrument(self, app):
+        """Server span around every request of a Flask app."""
+        from flask import g, request
+
+        @app.before_request
+        def start_span():
+            g.trace_span = self.span(f"{self.service} {request.path}", "server",
+                                     request.headers.get(TRACEPARENT))
+            g.trace_span.__enter__()
+
+        @app.teardown_request
+        def end_span(exc):
+            span = g.pop("trace_span", None)
+            if span is not None:
+                span.__exit__(None, None, None)
+        return app
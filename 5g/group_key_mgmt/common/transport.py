@@ -0,0 +1,101 @@
+import abc
+
+from common.http_client import AsyncNFClient, NFClient
+from common.tracing import Tracer
+
+
+class Transport(abc.ABC):
+    """How an NF reaches its peers: post(peer, path, payload) returns the peer's JSON reply."""
+
+    @abc.abstractmethod
+    def post(self, peer, path, payload):
+        pass
+
+    @abc.abstractmethod
+    async def post_async(self, peer, path, payload):
+        pass
+
+    async def close(self):
+        pass
+
+
+class HTTPTransport(Transport):
+    """JSON over HTTP through pooled clients, peers addressed by base URL."""
+
+    def __init__(self, addresses, http=None, aio_http=None, tracer=None, metrics=None):
+        self.addresses = dict(addresses)
+        self.http = http or NFClient()
+        self.aio_http = aio_http or AsyncNFClient()
+        self.tracer = tracer or Tracer()
+        self.metrics = metrics
+
+    def post(self, peer, path, payload):
+        stats = self.metrics.call(peer, path) if self.metrics else None
+        if stats is not None:
+            start, status = stats.start(), "error"
+        try:
+            # Client span covers the wire and the peer's queueing, the peer's
+            # server span is its child through the traceparent header
+            with self.tracer.span(f"{self.tracer.service} -> {peer} {path}", "client"):
+                response = self.http.post(f"{self.addresses[peer]}{path}", json=payload,
+                                          headers=self.tracer.headers())
+            status = response.status_code
+        finally:
+            if stats is not None:
+                stats.finish(start, status)
+        try:
+            return response.json()
+        except ValueError:
+            return {"status": "error", "http_status": response.status_code}
+
+    async def post_async(self, peer, path, payload):
+        stats = self.metrics.call(peer, path) if self.metrics else None
+        if stats is not None:
+            start, status = stats.start(), "error"
+        try:
+            with self.tracer.span(f"{self.tracer.service} -> {peer} {path}", "client"):
+                status, reply = await self.aio_http.post_json_status(f"{self.addresses[peer]}{path}", payload,
+                                                                     headers=self.tracer.headers())
+            if reply is None:
+                # Same reply post() gives for a body that is not JSON
+                return {"status": "error", "http_status": status}
+            return reply
+        finally:
+            if stats is not None:
+                stats.finish(start, status)
+
+    async def close(self):
+        await self.aio_http.close()
+
+
+class InProcessTransport(Transport):
+    """Calls the peer NF's handler directly, without serialising the payload.
+
+    Lets the whole control plane run in one process at function-call speed;
+    payloads are shared, so handlers must not mutate the dicts they receive.
+    """
+
+    def __init__(self):
+        self.handlers = {}
+
+    def register(self, peer, routes, tracer=None, metrics=None):
+        """routes maps path -> handler(payload) returning the reply dict;
+        a tracer and metrics record the peer's server span and route stats."""
+        for path, handler in routes.items():
+            if metrics is not None:
+                handler = metrics.wrap(path, handler)
+            if tracer is not None:
+                handler = tracer.wrap(path, handler)
+            self.handlers[(peer, path)] = handler
+
+    def post(self, peer, path, payload):
+        handler = self.handlers.get((peer, path))
+        if handler is None:
+            # Same reply HTTPTransport gives for an unrouted path
+            return {"status": "error", "http_status": 404}
+        reply = handler(payload)
+        # Handlers may return (body, status) like Flask views
+        return reply[0] if isinstance(reply, tuple) else reply
+
+    async def post_async(self, peer, path, payload):
+        return self.post(peer, path, payload)
@@ -1,50 +1,146 @@
 from flask import Flask, request, jsonify
-import requests
+import itertools
+import os
 import threading
 
+from common.aio_server import RUNTIME, run_async
+from common.context_store import UEContextStore
+from common.kdf import ALG_EA0, ALG_IA0, N_RRC_ENC, N_RRC_INT, derive_algorithm_key, mac
+from common.metrics import Metrics
+from common.tracing import Tracer
+from common.transport import HTTPTransport
+
 app = Flask(__name__)
+tracer = Tracer("gnb")
+tracer.instrument(app)
+metrics = Metrics("gnb")
+metrics.instrument(app)
 
 # Network function addresses
 AMF_ADDRESS = "http://amf:5002"
 UE_ADDRESS = "http://ue:5000"
+# Where the UPF sends this gNB's downlink GTP-U, "host:port"
+N3_ADDRESS = os.environ.get("GNB_N3_ADDRESS", "gnb:2152")
 
 class GNB:
-    def __init__(self):
-        self.ue_contexts = {}
-        self.k_gnb = None
+    def __init__(self, transport, tracer=tracer):
+        self.transport = transport
+        self.tracer = tracer
+        self.ue_contexts = UEContextStore()
+        # Registration trace per UE, continued by its Security Mode Complete
+        self.registration_traces = UEContextStore()
+        # Downlink TEIDs, one per UE until its context is released
+        self.downlink_teids = {}
+        self.teids = itertools.count(1)
 
     def handle_registration(self, registration_request):
         print("[gNB] Received Registration Request from UE")
+        self.registration_traces.put(registration_request['ue_id'], self.tracer.traceparent())
         # Forward to AMF
-        response = requests.post(f"{AMF_ADDRESS}/registration", json=registration_request)
-        return response.json()
+        return self.transport.post("amf", "/registration", registration_request)
+
+    async def handle_registration_async(self, registration_request):
+        print("[gNB] Received Registration Request from UE")
+        self.registration_traces.put(registration_request['ue_id'], self.tracer.traceparent())
+        return await self.transport.post_async("amf", "/registration", registration_request)
+
+    def handle_deregistration(self, deregistration_request):
+        print("[gNB] Received Deregistration Request from UE")
+        return self.transport.post("amf", "/deregistration", deregistration_request)
+
+    async def handle_deregistration_async(self, deregistration_request):
+        print("[gNB] Received Deregistration Request from UE")
+        return await self.transport.post_async("amf", "/deregistration", deregistration_request)
+
+    def handle_ue_context_release(self, release):
+        print("[gNB] Received UE Context Release from AMF")
+        ue_id = release['ue_id']
+        self.ue_contexts.pop(ue_id)
+        self.downlink_teids.pop(ue_id, None)
+        self.registration_traces.pop(ue_id)
+        return {"status": "success"}
+
+    async def handle_ue_context_release_async(self, release):
+        return self.handle_ue_context_release(release)
 
     def handle_ue_context_setup(self, context):
         print("[gNB] Received UE Context Setup from AMF")
+        security_command = self.rrc_security_command(context)
+        self.transport.post("ue", "/security_command", security_command)
+        print("[gNB] Sent RRC Security Mode Command to UE")
+        return {"status": "success"}
+
+    async def handle_ue_context_setup_async(self, context):
+        print("[gNB] Received UE Context Setup from AMF")
+        security_command = self.rrc_security_command(context)
+        await self.transport.post_async("ue", "/security_command", security_command)
+        print("[gNB] Sent RRC Security Mode Command to UE")
+        return {"status": "success"}
+
+    def rrc_security_command(self, context):
         ue_id = context['ue_id']
-        self.ue_contexts[ue_id] = context
-        self.k_gnb = context['k_gnb']
         
-        # Derive RRC keys
-        k_rrc_enc = self.derive_key(self.k_gnb, "RRC_ENC")
-        k_rrc_int = self.derive_key(self.k_gnb, "RRC_INT")
+        # Derive RRC keys once and keep them with the UE context
+        k_gnb = bytes.fromhex(context['k_gnb'])
+        k_rrc_enc = derive_algorithm_key(k_gnb, N_RRC_ENC, ALG_EA0)
+        k_rrc_int = derive_algorithm_key(k_gnb, N_RRC_INT, ALG_IA0)
+        self.ue_contexts.put(ue_id, dict(context, k_rrc_enc=k_rrc_enc.hex(), k_rrc_int=k_rrc_int.hex()))
         
-        # Send Security Mode Command to UE
-        security_command = {
+        # Security Mode Command for the UE
+        return {
             "ue_id": ue_id,
             "command": "RRC Security Mode Command",
             "mac": self.calculate_mac({"command": "RRC Security Mode Command"}, k_rrc_int)
         }
-        requests.post(f"{UE_ADDRESS}/security_command", json=security_command)
-        print("[gNB] Sent RRC Security Mode Command to UE")
 
-    def derive_key(self, parent_key, key_name):
-        return f"{key_name}_derived_from_{parent_key[:10]}"
+    def handle_security_complete(self, complete_message):
+        print("[gNB] Received Security Mode Complete from UE")
+        # Forward to AMF, in the UE's registration trace so the session
+        # setup (SMF, UPF) shows up in the same trace
+        with self.registration_span(complete_message['ue_id']):
+            self.transport.post("amf", "/security_complete", self.with_downlink_tunnel(complete_message))
+        return {"status": "success"}
+
+    async def handle_security_complete_async(self, complete_message):
+        print("[gNB] Received Security Mode Complete from UE")
+        with self.registration_span(complete_message['ue_id']):
+            await self.transport.post_async("amf", "/security_complete", self.with_downlink_tunnel(complete_message))
+        return {"status": "success"}
+
+    def registration_span(self, ue_id):
+        # Without a saved registration it is a child of the current span
+        return self.tracer.span("gnb security_complete", traceparent=self.registration_traces.pop(ue_id))
+
+    def with_downlink_tunnel(self, message):
+        # The UE's downlink tunnel endpoint, passed on by the AMF and SMF to the UPF
+        teid = self.downlink_teids.get(message['ue_id'])
+        if teid is None:
+            teid = self.downlink_teids.setdefault(message['ue_id'], next(self.teids))
+        return dict(message, gnb_tunnel={"teid": teid, "address": N3_ADDRESS})
 
     def calculate_mac(self, message, key):
-        return f"MAC_{hash(str(message)+key)[:8]}"
+        return mac(key, str(message).encode())
 
-gnb = GNB()
+    def routes(self):
+        return {
+            '/registration': self.handle_registration,
+            '/ue_context_setup': self.handle_ue_context_setup,
+            '/security_complete': self.handle_security_complete,
+            '/deregistration': self.handle_deregistration,
+            '/ue_context_release': self.handle_ue_context_release,
+        }
+
+    def async_routes(self):
+        return {
+            '/registration': self.handle_registration_async,
+            '/ue_context_setup': self.handle_ue_context_setup_async,
+            '/security_complete': self.handle_security_complete_async,
+            '/deregistration': self.handle_deregistration_async,
+            '/ue_context_release': self.handle_ue_context_release_async,
+        }
+
+gnb = GNB(HTTPTransport({"amf": AMF_ADDRESS, "ue": UE_ADDRESS}, tracer=tracer, metrics=metrics))
+metrics.gauge("ue_contexts", lambda: len(gnb.ue_contexts))
 
 @app.route('/registration', methods=['POST'])
 def registration():
@@ -55,16 +151,29 @@ def registration():
 @app.route('/ue_context_setup', methods=['POST'])
 def ue_context_setup():
     data = request.json
-    gnb.handle_ue_context_setup(data)
-    return jsonify({"status": "success"})
+    response = gnb.handle_ue_context_setup(data)
+    return jsonify(response)
 
 @app.route('/security_complete', methods=['POST'])
 def security_complete():
     data = request.json
-    print("[gNB] Received Security Mode Complete from UE")
-    # Forward to AMF
-    requests.post(f"{AMF_ADDRESS}/security_complete", json=data)
-    return jsonify({"status": "success"})
+    response = gnb.handle_security_complete(data)
+    return jsonify(response)
+
+@app.route('/deregistration', methods=['POST'])
+def deregistration():
+    data = request.json
+    response = gnb.handle_deregistration(data)
+    return jsonify(response)
+
+@app.route('/ue_context_release', methods=['POST'])
+def ue_context_release():
+    data = request.json
+    response = gnb.handle_ue_context_release(data)
+    return jsonify(response)
 
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5001)
\ No newline at end of file
+    if RUNTIME == "async":
+        run_async(gnb.async_routes(), port=5001, clients=[gnb.transport], tracer=tracer, metrics=metrics)
+    else:
+        app.run(host='0.0.0.0', port=5001)
@@ -0,0 +1,283 @@
+"""Registration load generator and latency benchmark for the group_key_mgmt core.
+
+Simulated UEs arrive at --rate per second (Poisson, 0 = all at once) and each
+runs gNB /registration (AMF -> AUSF -> UDM) followed by gNB /security_complete
+(AMF -> gNB/UE and SMF -> UPF). Throughput and p50/p95/p99 latency are reported
+per procedure. With --deregister each UE then deregisters (AMF -> SMF -> UPF and
+gNB), returning its address to the SMF pool.
+
+With --local every NF runs in this process on loopback ports, with a stand-in
+UE and host network commands disabled, so no Docker is needed:
+
+    python loadgen.py --local --ues 2000 --rate 200 --concurrency 64
+
+--transport inprocess skips HTTP entirely: the NFs are wired together through
+an InProcessTransport and each request is a direct call, which isolates the
+cost of the NF logic itself (use it for very large populations):
+
+    python loadgen.py --local --transport inprocess --ues 100000
+
+--metrics-dir writes each --local NF's /metrics text there after the run
+(<nf>.prom), for either transport.
+
+Against the compose deployment, point it at the published gNB port:
+
+    python loadgen.py --gnb-url http://localhost:5001 --ues 100
+"""
+import argparse
+import contextlib
+import importlib.util
+import logging
+import os
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path[:0] = [ROOT] + [os.path.join(ROOT, name) for name in ("udm", "upf", "smf")]
+from common.http_client import NFClient  # noqa: E402
+from common.metrics import Metrics  # noqa: E402
+from common.tracing import Tracer  # noqa: E402
+from common.transport import InProcessTransport  # noqa: E402
+
+PROCEDURES = ("registration", "security_complete", "attach")
+
+
+def load_nf(name):
+    spec = importlib.util.spec_from_file_location(name, os.path.join(ROOT, name, f"{name}.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def ue_ids(count):
+    return [f"imsi-00101{i:010d}" for i in range(1, count + 1)]
+
+
+class HTTPCore:
+    """A core that is already running, reached through its gNB."""
+
+    def __init__(self, gnb_url):
+        self.gnb_url = gnb_url
+
+    def registration(self, client, ue_id):
+        response = client.post(f"{self.gnb_url}/registration", json={"ue_id": ue_id})
+        if response.status_code != 200:
+            raise RuntimeError(f"registration: {response.status_code} {response.text[:80]}")
+        return response.json()
+
+    def security_complete(self, client, ue_id):
+        response = client.post(f"{self.gnb_url}/security_complete", json={"ue_id": ue_id})
+        if response.status_code != 200:
+            raise RuntimeError(f"security_complete: {response.status_code} {response.text[:80]}")
+        return response.json()
+
+    def deregistration(self, client, ue_id):
+        response = client.post(f"{self.gnb_url}/deregistration", json={"ue_id": ue_id})
+        if response.status_code != 200:
+            raise RuntimeError(f"deregistration: {response.status_code} {response.text[:80]}")
+        return response.json()
+
+    def metrics(self):
+        return {}
+
+    def close(self):
+        pass
+
+
+class LocalCore(HTTPCore):
+    """Every NF served from this process on loopback, plus a stand-in UE."""
+
+    def __init__(self, subscribers):
+        os.environ["NF_DRY_RUN"] = "1"
+        from flask import Flask
+        from werkzeug.serving import make_server
+        from import_subscribers import synthetic_rows
+
+        self.modules = {name: load_nf(name) for name in ("gnb", "amf", "ausf", "udm", "smf", "upf")}
+        ue = Flask("ue-stand-in")
+        ue.add_url_rule("/security_command", "security_command",
+                        lambda: {"status": "success"}, methods=["POST"])
+        apps = {name: module.app for name, module in self.modules.items()}
+        apps["ue"] = ue
+
+        self.servers = {name: make_server("127.0.0.1", 0, app, threaded=True) for name, app in apps.items()}
+        urls = {name: f"http://127.0.0.1:{server.server_port}" for name, server in self.servers.items()}
+
+        # Point each NF at its loopback peers
+        for name in ("gnb", "amf", "ausf", "smf"):
+            addresses = getattr(self.modules[name], name).transport.addresses
+            addresses.update({peer: urls[peer] for peer in addresses})
+        self.modules["udm"].udm.subscribers.import_rows(synthetic_rows(subscribers))
+
+        self.threads = [threading.Thread(target=server.serve_forever, daemon=True)
+                        for server in self.servers.values()]
+        for thread in self.threads:
+            thread.start()
+        super().__init__(urls["gnb"])
+
+    def metrics(self):
+        return {name: module.metrics for name, module in self.modules.items()}
+
+    def close(self):
+        for server in self.servers.values():
+            server.shutdown()
+
+
+class InProcessCore:
+    """Every NF in this process, calling each other directly through one InProcessTransport."""
+
+    def __init__(self, subscribers):
+        os.environ["NF_DRY_RUN"] = "1"
+        from import_subscribers import synthetic_rows
+        from subscriber_store import MEMORY_DB, SubscriberStore
+
+        self.modules = {name: load_nf(name) for name in ("gnb", "amf", "ausf", "udm", "smf", "upf")}
+        store = SubscriberStore(MEMORY_DB)
+        store.import_rows(synthetic_rows(subscribers))
+
+        self.transport = transport = InProcessTransport()
+        nfs = {
+            "gnb": self.modules["gnb"].GNB(transport),
+            "amf": self.modules["amf"].AMF(transport),
+            "ausf": self.modules["ausf"].AUSF(transport),
+            "udm": self.modules["udm"].UDM(store),
+            "smf": self.modules["smf"].SMF(transport),
+        }
+        self.nf_metrics = {name: Metrics(name) for name in (*nfs, "upf")}
+        for name, nf in nfs.items():
+            transport.register(name, nf.routes(), Tracer(name), self.nf_metrics[name])
+        transport.register("upf", self.modules["upf"].ROUTES, Tracer("upf"), self.nf_metrics["upf"])
+        transport.register("ue", {"/security_command": lambda payload: {"status": "success"}})
+
+    def registration(self, client, ue_id):
+        return self.transport.post("gnb", "/registration", {"ue_id": ue_id})
+
+    def security_complete(self, client, ue_id):
+        return self.transport.post("gnb", "/security_complete", {"ue_id": ue_id})
+
+    def deregistration(self, client, ue_id):
+        return self.transport.post("gnb", "/deregistration", {"ue_id": ue_id})
+
+    def metrics(self):
+        return self.nf_metrics
+
+    def close(self):
+        pass
+
+
+def percentile(samples, p):
+    return samples[min(len(samples) - 1, int(len(samples) * p / 100))] if samples else float("nan")
+
+
+def run_load(core, ues, rate, concurrency, client, deregister=False):
+    latencies = {procedure: [] for procedure in PROCEDURES + (("deregistration",) if deregister else ())}
+    errors = []
+    lock = threading.Lock()
+
+    def attach(ue_id, arrival):
+        try:
+            start = time.perf_counter()
+            response = core.registration(client, ue_id)
+            registered = time.perf_counter()
+            if response.get("status") != "authentication_initiated":
+                raise RuntimeError(f"registration: {response}")
+            response = core.security_complete(client, ue_id)
+            done = time.perf_counter()
+            if response.get("status") != "success":
+                raise RuntimeError(f"security_complete: {response}")
+            if deregister:
+                response = core.deregistration(client, ue_id)
+                released = time.perf_counter()
+                if response.get("status") != "deregistered":
+                    raise RuntimeError(f"deregistration: {response}")
+        except Exception as e:
+            with lock:
+                errors.append(f"{ue_id}: {e}")
+            return
+        with lock:
+            latencies["registration"].append(registered - start)
+            latencies["security_complete"].append(done - registered)
+            # Measured from arrival so queueing behind busy workers counts
+            latencies["attach"].append(done - arrival)
+            if deregister:
+                latencies["deregistration"].append(released - done)
+
+    start = time.perf_counter()
+    arrival = start
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for ue_id in ues:
+            if rate > 0:
+                arrival += random.expovariate(rate)
+                delay = arrival - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            else:
+                arrival = time.perf_counter()
+            pool.submit(attach, ue_id, arrival)
+    return latencies, errors, time.perf_counter() - start
+
+
+def report(latencies, errors, elapsed):
+    completed = len(latencies["attach"])
+    print(f"{completed} attaches in {elapsed:.2f}s: {completed / elapsed:.1f}/s, {len(errors)} errors")
+    print(f"{'procedure':<18} {'count':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+    for procedure, samples in latencies.items():
+        samples = sorted(samples)
+        print(f"{procedure:<18} {len(samples):>7} " + " ".join(
+            f"{percentile(samples, p) * 1e3:>9.2f}" for p in (50, 95, 99, 100)))
+    for error in errors[:5]:
+        print(f"  error {error}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument("--local", action="store_true", help="run every NF in-process, no Docker")
+    target.add_argument("--gnb-url", default="http://localhost:5001")
+    parser.add_argument("--transport", choices=("http", "inprocess"), default="http",
+                        help="how --local NFs reach each other")
+    parser.add_argument("--ues", type=int, default=100, help="registrations to run")
+    parser.add_argument("--subscribers", type=int, default=None,
+                        help="distinct IMSIs to cycle through (default: one per registration)")
+    parser.add_argument("--rate", type=float, default=0, help="UE arrivals per second, 0 = all at once")
+    parser.add_argument("--concurrency", type=int, default=32, help="UEs in flight at most")
+    parser.add_argument("--verbose", action="store_true", help="keep NF log output in --local mode")
+    parser.add_argument("--trace-dir", help="record --local NF spans here (see trace_report.py)")
+    parser.add_argument("--deregister", action="store_true",
+                        help="deregister each UE after its attach, releasing its session and address")
+    parser.add_argument("--metrics-dir", help="write each --local NF's metrics here after the run")
+    args = parser.parse_args()
+
+    subscribers = args.subscribers or args.ues
+    population = ue_ids(subscribers)
+    ues = [population[i % subscribers] for i in range(args.ues)]
+    client = NFClient(pool_maxsize=args.concurrency)
+
+    if args.trace_dir:
+        os.environ["NF_TRACE_DIR"] = args.trace_dir
+    if args.local and args.transport == "inprocess":
+        core = InProcessCore(subscribers)
+    elif args.local:
+        logging.getLogger("werkzeug").setLevel(logging.ERROR)
+        core = LocalCore(subscribers)
+    else:
+        core = HTTPCore(args.gnb_url)
+
+    quiet = open(os.devnull, "w") if args.local and not args.verbose else None
+    with contextlib.redirect_stdout(quiet) if quiet else contextlib.nullcontext():
+        latencies, errors, elapsed = run_load(core, ues, args.rate, args.concurrency, client, args.deregister)
+    if args.metrics_dir:
+        os.makedirs(args.metrics_dir, exist_ok=True)
+        for name, metrics in core.metrics().items():
+            with open(os.path.join(args.metrics_dir, f"{name}.prom"), "w") as f:
+                f.write(metrics.render())
+    core.close()
+    report(latencies, errors, elapsed)
+    return 1 if errors else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
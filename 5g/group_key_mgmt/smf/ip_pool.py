@@ -0,0 +1,144 @@
+import ipaddress
+import socket
+import struct
+import threading
+from array import array
+
+# .1-.9 of each pool stay free for the gateway and UPF addresses
+FIRST_HOST = 10
+# Host offsets of the NFs' gtp0 addresses in each pool
+SMF_HOST = 1
+UPF_HOST = 2  # the UEs' default gateway
+DEFAULT_DNN = "internet"
+
+# ipaddress objects are too slow per allocation, convert through packed bytes
+_ADDRESS = struct.Struct("!I")
+
+def address_to_int(address):
+    return _ADDRESS.unpack(socket.inet_aton(address))[0]
+
+def int_to_address(value):
+    return socket.inet_ntoa(_ADDRESS.pack(value))
+
+def host_address(network, offset):
+    return str(ipaddress.IPv4Network(network).network_address + offset)
+
+def interface_address(network, offset):
+    """host/prefix of network's host at offset, for `ip addr add`."""
+    network = ipaddress.IPv4Network(network)
+    return f"{network.network_address + offset}/{network.prefixlen}"
+
+class PoolExhausted(Exception):
+    pass
+
+class UnknownDNN(Exception):
+    pass
+
+
+class IPPool:
+    """UE addresses from one IPv4 subnet with O(1) allocate and release.
+
+    Addresses never handed out are taken from a cursor, released ones from a
+    LIFO free list; a bitmap (one byte per address) catches double releases.
+    Memory is one byte per address plus four per released address, so a /8
+    fits in about 16 MB.
+    """
+
+    def __init__(self, network, first_host=FIRST_HOST):
+        self.network = ipaddress.IPv4Network(network)
+        self.base = int(self.network.network_address)
+        self.first = first_host
+        # Broadcast address excluded
+        self.end = self.network.num_addresses - 1
+        if self.first >= self.end:
+            raise ValueError(f"{network} has no room for UE addresses")
+        self.allocated = bytearray(self.network.num_addresses)
+        self.free = array("I")
+        self.cursor = self.first
+        self.in_use = 0
+        self.lock = threading.Lock()
+
+    def allocate(self):
+        with self.lock:
+            if self.free:
+                offset = self.free.pop()
+            elif self.cursor < self.end:
+                offset = self.cursor
+                self.cursor += 1
+            else:
+                raise PoolExhausted(str(self.network))
+            self.allocated[offset] = 1
+            self.in_use += 1
+        return int_to_address(self.base + offset)
+
+    def release(self, address):
+        offset = address_to_int(address) - self.base
+        if not self.first <= offset < self.end:
+            raise ValueError(f"{address} is not in {self.network}")
+        with self.lock:
+            if not self.allocated[offset]:
+                raise ValueError(f"{address} is not allocated")
+            self.allocated[offset] = 0
+            self.free.append(offset)
+            self.in_use -= 1
+
+    def __contains__(self, address):
+        return 0 <= address_to_int(address) - self.base < self.network.num_addresses
+
+    @property
+    def capacity(self):
+        return self.end - self.first
+
+
+class PoolSet:
+    """Address pools per DNN; a DNN's pools are used in order as each fills up."""
+
+    def __init__(self, pools):
+        # dnn -> [IPPool]
+        self.pools = {dnn: [IPPool(network) for network in networks] for dnn, networks in pools.items()}
+        # Index of the first pool per DNN that may still have room
+        self.current = dict.fromkeys(self.pools, 0)
+
+    def allocate(self, dnn=DEFAULT_DNN):
+        pools = self.pools.get(dnn)
+        if not pools:
+            raise UnknownDNN(f"no address pool for DNN {dnn}")
+        start = self.current[dnn]
+        for i in range(len(pools)):
+            index = (start + i) % len(pools)
+            try:
+                address = pools[index].allocate()
+            except PoolExhausted:
+                continue
+            self.current[dnn] = index
+            return address
+        raise PoolExhausted(dnn)
+
+    def network(self, address, dnn=DEFAULT_DNN):
+        """The subnet of the dnn pool address came from."""
+        for pool in self.pools.get(dnn, ()):
+            if address in pool:
+                return pool.network
+        raise ValueError(f"{address} is not in a {dnn} pool")
+
+    def networks(self):
+        return [pool.network for pools in self.pools.values() for pool in pools]
+
+    def release(self, address, dnn=DEFAULT_DNN):
+        for pool in self.pools.get(dnn, ()):
+            if address in pool:
+                pool.release(address)
+                return
+        raise ValueError(f"{address} is not in a {dnn} pool")
+
+    def in_use(self, dnn=DEFAULT_DNN):
+        return sum(pool.in_use for pool in self.pools.get(dnn, ()))
+
+
+def parse_pools(spec):
+    """Parses "internet=10.10.0.0/16,10.11.0.0/16;ims=10.20.0.0/16" into {dnn: [network]}."""
+    pools = {}
+    for entry in filter(None, spec.split(";")):
+        dnn, _, networks = entry.partition("=")
+        pools[dnn.strip()] = [network.strip() for network in networks.split(",") if network.strip()]
+    return pools
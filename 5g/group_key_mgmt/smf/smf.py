@@ -1,61 +1,152 @@
-from flask import Flask, request, jsonify
-import requests
+from flask import Flask, request
 import os
-import random
+import threading
+
+from common.aio_server import RUNTIME, run_async
+from common.kdf import ALG_EA0, N_UP_ENC, derive_algorithm_key
+from common.metrics import Metrics
+from common.tracing import Tracer
+from common.transport import HTTPTransport
+from ip_pool import (DEFAULT_DNN, SMF_HOST, UPF_HOST, PoolExhausted, PoolSet, UnknownDNN, host_address,
+                     interface_address, parse_pools)
 
 
 app = Flask(__name__)
+tracer = Tracer("smf")
+tracer.instrument(app)
+metrics = Metrics("smf")
+metrics.instrument(app)
 
 UPF_ADDRESS = "http://upf:5006"
 
+# Skip host network commands, for running without containers (see loadgen.py)
+DRY_RUN = os.environ.get("NF_DRY_RUN") == "1"
+# UE address pools per DNN, "dnn=cidr,cidr;dnn=cidr"
+IP_POOLS = parse_pools(os.environ.get("SMF_IP_POOLS", f"{DEFAULT_DNN}=10.10.0.0/16"))
+
 class SMF:
-    def __init__(self):
+    def __init__(self, transport, ip_pools=None):
+        self.transport = transport
         self.sessions = {}
+        self.ip_pools = ip_pools or PoolSet(IP_POOLS)
+        self.session_lock = threading.Lock()
 
     def establish_session(self, session_request):
-        # Add GTP tunnel creation
+        try:
+            upf_request = self.create_session(session_request)
+        except (PoolExhausted, UnknownDNN) as e:
+            return {"status": "session_rejected", "cause": str(e)}, 503
+        self.transport.post("upf", "/configure", upf_request)
+        return self.session_response(upf_request)
+
+    async def establish_session_async(self, session_request):
+        try:
+            upf_request = self.create_session(session_request)
+        except (PoolExhausted, UnknownDNN) as e:
+            return {"status": "session_rejected", "cause": str(e)}, 503
+        await self.transport.post_async("upf", "/configure", upf_request)
+        return self.session_response(upf_request)
+
+    def release_session(self, release_request):
+        session = self.end_session(release_request['ue_id'])
+        if session is None:
+            return {"status": "session_not_found"}, 404
+        self.transport.post("upf", "/release", {"ue_id": release_request['ue_id']})
+        return {"status": "session_released", "ue_ip": session['ue_ip']}
+
+    async def release_session_async(self, release_request):
+        session = self.end_session(release_request['ue_id'])
+        if session is None:
+            return {"status": "session_not_found"}, 404
+        await self.transport.post_async("upf", "/release", {"ue_id": release_request['ue_id']})
+        return {"status": "session_released", "ue_ip": session['ue_ip']}
+
+    def setup_gtp(self):
+        # Once at startup, sessions only touch the address pools
+        if DRY_RUN:
+            return
+        # Add GTP tunnel creation, with an address in every UE pool
         os.system("sudo ip link add gtp0 type gtp")
-        os.system("sudo ip addr add 10.10.0.1/24 dev gtp0")
+        for network in self.ip_pools.networks():
+            os.system(f"sudo ip addr add {interface_address(network, SMF_HOST)} dev gtp0")
         os.system("sudo ip link set gtp0 up")
-        
+
+    def create_session(self, session_request):
         print("[SMF] Establishing user plane session")
         ue_id = session_request['ue_id']
         k_gnb = session_request['k_gnb']
         
         # Derive UP key
-        k_up_enc = self.derive_key(k_gnb, "UP_ENC")
+        k_up_enc = derive_algorithm_key(bytes.fromhex(k_gnb), N_UP_ENC, ALG_EA0).hex()
         
-        # Store session context
-        self.sessions[ue_id] = {
-            "k_up_enc": k_up_enc,
-            "status": "active"
-        }
+        # Store session context, a repeated request keeps its address
+        dnn = session_request.get('dnn', DEFAULT_DNN)
+        with self.session_lock:
+            session = self.sessions.get(ue_id)
+            if session is None or session['dnn'] != dnn:
+                if session is not None:
+                    self.ip_pools.release(session['ue_ip'], session['dnn'])
+                session = {"ue_ip": self.ip_pools.allocate(dnn), "dnn": dnn}
+            self.sessions[ue_id] = dict(session, k_up_enc=k_up_enc, status="active")
         
-        # Configure UPF
+        # UPF configuration request
         upf_request = {
             "ue_id": ue_id,
-            "k_up_enc": k_up_enc
+            "k_up_enc": k_up_enc,
+            "ue_ip": session['ue_ip'],
+            "subnet": str(self.ip_pools.network(session['ue_ip'], dnn))
         }
-        requests.post(f"{UPF_ADDRESS}/configure", json=upf_request)
-        
-        # return {"status": "session_established"}
-        # Configure UE IP address
-        ue_ip = f"10.10.0.{random.randint(10,254)}"
+        if 'gnb_tunnel' in session_request:
+            upf_request["gnb_tunnel"] = session_request['gnb_tunnel']
+        return upf_request
+
+    def end_session(self, ue_id):
+        with self.session_lock:
+            session = self.sessions.pop(ue_id, None)
+            if session is not None:
+                self.ip_pools.release(session['ue_ip'], session['dnn'])
+        return session
+
+    def session_response(self, upf_request):
         return {
             "status": "session_established",
-            "ue_ip": ue_ip,
+            "ue_ip": upf_request['ue_ip'],
+            "subnet": upf_request['subnet'],
+            "ue_gateway": host_address(upf_request['subnet'], UPF_HOST),
             "dns": "8.8.8.8"
             }
-    def derive_key(self, parent_key, key_name):
-        return f"{key_name}_derived_from_{parent_key[:10]}"
 
-smf = SMF()
+    def routes(self):
+        return {
+            '/session_establishment': self.establish_session,
+            '/session_release': self.release_session,
+        }
+
+    def async_routes(self):
+        return {
+            '/session_establishment': self.establish_session_async,
+            '/session_release': self.release_session_async,
+        }
+
+smf = SMF(HTTPTransport({"upf": UPF_ADDRESS}, tracer=tracer, metrics=metrics))
+metrics.gauge("sessions", lambda: len(smf.sessions))
+metrics.gauge("ip_pool_in_use", lambda: sum(smf.ip_pools.in_use(dnn) for dnn in smf.ip_pools.pools))
 
 @app.route('/session_establishment', methods=['POST'])
 def session_establishment():
     data = request.json
     response = smf.establish_session(data)
-    return jsonify(response)
+    return response
+
+@app.route('/session_release', methods=['POST'])
+def session_release():
+    data = request.json
+    response = smf.release_session(data)
+    return response
 
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5005)
\ No newline at end of file
+    smf.setup_gtp()
+    if RUNTIME == "async":
+        run_async(smf.async_routes(), port=5005, clients=[smf.transport], tracer=tracer, metrics=metrics)
+    else:
+        app.run(host='0.0.0.0', port=5005)
@@ -4,7 +4,7 @@
 docker compose up -d --scale ue=0
 
 # Wait for AMF to be ready
-while ! docker compose logs amf | grep -q "Ready"; do
+while ! docker compose logs amf | grep -q -E "Running on|async runtime"; do
   sleep 2
 done
 
@@ -16,13 +16,10 @@ LOGPID=$!
 docker compose up -d ue
 sleep 2  # Wait for UE to initialize
 
-# Trigger registration
-docker compose exec ue curl -X POST http://localhost:5000/trigger-registration
-
-# Wait for completion
-while ! docker compose logs ue | grep -q "Registration Complete"; do
-  sleep 1
-done
+# Drive a registration through the published gNB port
+python3 loadgen.py --gnb-url http://localhost:5001 --ues 1
+STATUS=$?
 
 # Stop logging
 kill $LOGPID
+exit $STATUS
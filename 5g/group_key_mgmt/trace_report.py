@@ -0,0 +1,147 @@
+"""Critical paths of NF call chains rebuilt from the JSONL span files.
+
+Reads every <service>.jsonl in the trace directory (written by the NFs with
+NF_TRACE_DIR set, or by loadgen.py --trace-dir), rebuilds each trace's span
+tree and walks its critical path: starting from the root, time is charged to
+whichever child was still running when its parent was waiting, and to the
+span itself otherwise. Summed over traces this shows which hop dominates
+attach latency.
+
+    python loadgen.py --local --ues 500 --trace-dir /tmp/traces
+    python trace_report.py /tmp/traces --root "gnb /registration" --slowest 3
+
+The gNB continues a UE's registration trace when its Security Mode
+Complete arrives, so one trace covers the whole attach: the continuation
+(session setup) is a child that starts after the registration span ended.
+A span's interval is stretched to its last descendant's end, and the time
+outside the span itself, while the UE was between procedures, is charged
+to a "(between procedures)" hop. --root may name any span, e.g. --root
+"gnb security_complete" for the session setup part alone.
+
+With docker compose, run with NF_TRACE_DIR=/traces and read ./traces.
+"""
+import argparse
+import glob
+import json
+import os
+from collections import defaultdict
+
+
+def load_spans(trace_dir):
+    traces = defaultdict(list)
+    for path in glob.glob(os.path.join(trace_dir, "*.jsonl")):
+        with open(path) as f:
+            for line in f:
+                span = json.loads(line)
+                traces[span["trace_id"]].append(span)
+    return traces
+
+
+BETWEEN = "(between procedures)"
+
+
+def extended_end(span, children):
+    """End of span or of its last descendant, whichever is later."""
+    return max([span["end"]] + [extended_end(child, children) for child in children.get(span["span_id"], ())])
+
+
+def critical_path(span, children, path):
+    """Appends (span, self_ns) for every span on the critical path below span.
+
+    Walks back from the end of the span's subtree: the child that finished
+    last before the cursor is what the span was waiting on, the gaps between
+    are its own time. Gaps after the span itself ended (a continuation child
+    such as the attach's session setup) go to a BETWEEN pseudo-span.
+    """
+    cursor = extended_end(span, children)
+    own = 0
+    between = 0
+
+    def charge(start, end):
+        nonlocal own, between
+        between += max(0, end - max(start, span["end"]))
+        own += max(0, min(end, span["end"]) - start)
+
+    pending = sorted(children.get(span["span_id"], ()), key=lambda child: child["end"], reverse=True)
+    on_path = []
+    for child in pending:
+        if child["end"] > cursor:
+            # Overlaps a later child that is already on the path
+            continue
+        charge(child["end"], cursor)
+        on_path.append(child)
+        cursor = max(child["start"], span["start"])
+    charge(span["start"], max(cursor, span["start"]))
+    path.append((span, own))
+    if between:
+        path.append(({"name": BETWEEN, "start": span["end"], "end": span["end"] + between}, between))
+    for child in reversed(on_path):
+        critical_path(child, children, path)
+    return path
+
+
+def build(spans):
+    children = defaultdict(list)
+    ids = {span["span_id"] for span in spans}
+    roots = []
+    for span in spans:
+        if span["parent_id"] in ids:
+            children[span["parent_id"]].append(span)
+        else:
+            roots.append(span)
+    return roots, children
+
+
+def percentile(samples, p):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * p / 100))] if samples else float("nan")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("trace_dir")
+    parser.add_argument("--root", default="gnb /registration",
+                        help="span name of the procedure to report, rooting its critical path")
+    parser.add_argument("--slowest", type=int, default=1, help="print the critical path of the N slowest traces")
+    args = parser.parse_args()
+
+    # span name -> critical-path self time per trace, in ns
+    hop_time = defaultdict(list)
+    totals = []
+    for spans in load_spans(args.trace_dir).values():
+        _, children = build(spans)
+        for root in spans:
+            if root["name"] != args.root:
+                continue
+            path = critical_path(root, children, [])
+            totals.append((extended_end(root, children) - root["start"], path))
+            for span, own in path:
+                hop_time[span["name"]].append(own)
+
+    if not totals:
+        print(f"no {args.root!r} spans in {args.trace_dir}")
+        return 1
+
+    total = sum(duration for duration, _ in totals)
+    count = len(totals)
+    print(f"{count} traces rooted at {args.root!r}, "
+          f"p50 {percentile([d for d, _ in totals], 50) / 1e6:.2f} ms, "
+          f"p99 {percentile([d for d, _ in totals], 99) / 1e6:.2f} ms")
+    print(f"{'hop on critical path':<40} {'share':>6} {'mean ms':>9} {'p95 ms':>9}")
+    for name, samples in sorted(hop_time.items(), key=lambda item: -sum(item[1])):
+        # Hops missing from a trace count as zero there
+        samples = samples + [0] * (count - len(samples))
+        print(f"{name:<40} {sum(samples) / total:>6.1%} {sum(samples) / count / 1e6:>9.3f} "
+              f"{percentile(samples, 95) / 1e6:>9.3f}")
+
+    for duration, path in sorted(totals, key=lambda item: -item[0])[:args.slowest]:
+        print(f"\nslowest trace {path[0][0]['trace_id']}: {duration / 1e6:.2f} ms")
+        for span, own in path:
+            offset = (span["start"] - path[0][0]["start"]) / 1e6
+            print(f"  +{offset:8.3f} ms  {span['name']:<40} {(span['end'] - span['start']) / 1e6:8.3f} ms"
+                  f"  self {own / 1e6:8.3f} ms")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,103 @@
+import contextlib
+import sqlite3
+import threading
+
+# In-memory database used when no subscriber file is configured
+MEMORY_DB = ":memory:"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS subscribers (
+    imsi TEXT PRIMARY KEY,
+    k TEXT NOT NULL,
+    opc TEXT NOT NULL,
+    sqn INTEGER NOT NULL DEFAULT 0
+) WITHOUT ROWID
+"""
+
+class SubscriberStore:
+    """SQLite subscriber table with a B-tree index on IMSI.
+
+    Opening the file does not read the subscriber rows, lookups are
+    O(log n) and SQN reservations are a single atomic UPDATE.
+    """
+
+    def __init__(self, path=MEMORY_DB):
+        self.path = path
+        self.local = threading.local()
+        # SQLite allows one writer at a time, queue writers here instead of
+        # spinning on SQLITE_BUSY
+        self.write_lock = threading.Lock()
+        self.in_memory = path == MEMORY_DB
+        self.conn = self._connect()
+        self.conn.execute(SCHEMA)
+        # An in-memory database only exists on its one connection, so every
+        # thread shares it; file databases get a reader connection per thread
+        self.read_lock = self.write_lock if self.in_memory else contextlib.nullcontext()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA busy_timeout=5000")
+        return conn
+
+    def connection(self):
+        if self.in_memory:
+            return self.conn
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            conn = self.local.conn = self._connect()
+        return conn
+
+    def get(self, imsi):
+        with self.read_lock:
+            row = self.connection().execute(
+                "SELECT k, opc, sqn FROM subscribers WHERE imsi = ?", (imsi,)).fetchone()
+        if row is None:
+            return None
+        return {"k": row[0], "opc": row[1], "sqn": row[2]}
+
+    def reserve_sqn(self, imsi, count):
+        """Advance the subscriber's SQN by count.
+
+        Returns (subscriber, first_sqn) for the reserved range, or None for
+        an unknown IMSI.
+        """
+        with self.write_lock:
+            row = self.connection().execute(
+                "UPDATE subscribers SET sqn = sqn + ? WHERE imsi = ? RETURNING k, opc, sqn",
+                (count, imsi)).fetchone()
+        if row is None:
+            return None
+        return {"k": row[0], "opc": row[1], "sqn": row[2]}, row[2] - count + 1
+
+    def import_rows(self, rows, batch_size=50000, replace=True):
+        """Insert (imsi, k, opc, sqn) rows in large transactions, return the count."""
+        verb = "INSERT OR REPLACE" if replace else "INSERT OR IGNORE"
+        sql = f"{verb} INTO subscribers (imsi, k, opc, sqn) VALUES (?, ?, ?, ?)"
+        conn = self.connection()
+        imported = 0
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= batch_size:
+                imported += self._insert_batch(conn, sql, batch)
+                batch = []
+        if batch:
+            imported += self._insert_batch(conn, sql, batch)
+        return imported
+
+    def _insert_batch(self, conn, sql, batch):
+        with self.write_lock:
+            conn.execute("BEGIN")
+            try:
+                conn.executemany(sql, batch)
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+        return len(batch)
+
+    def __len__(self):
+        with self.read_lock:
+            return self.connection().execute("SELECT COUNT(*) FROM subscribers").fetchone()[0]
@@ -1,7 +1,22 @@
 from flask import Flask, request, jsonify
-import hashlib
+import hmac
+import os
+
+from common.aio_server import RUNTIME, run_async
+from common.kdf import DEFAULT_SN_NAME, derive_k_ausf
+from common.metrics import Metrics
+from common.tracing import Tracer
+from subscriber_store import MEMORY_DB, SubscriberStore
 
 app = Flask(__name__)
+tracer = Tracer("udm")
+tracer.instrument(app)
+metrics = Metrics("udm")
+metrics.instrument(app)
+
+# SQLite subscriber file, see import_subscribers.py; unset keeps the mock
+# subscribers below in memory
+SUBSCRIBER_DB_PATH = os.environ.get("UDM_SUBSCRIBER_DB")
 
 # Mock subscriber database
 SUBSCRIBER_DB = {
@@ -12,37 +27,79 @@ SUBSCRIBER_DB = {
     }
 }
 
+# Upper bound on vectors handed out per batch request
+MAX_BATCH_SIZE = 32
+
 class UDM:
-    def __init__(self):
-        pass
+    def __init__(self, subscribers):
+        self.subscribers = subscribers
+
+    def handle_auth_data(self, auth_data_request):
+        return self.get_auth_data(auth_data_request['ue_id'], auth_data_request.get('count'),
+                                  auth_data_request.get('serving_network', DEFAULT_SN_NAME))
+
+    async def handle_auth_data_async(self, auth_data_request):
+        return self.handle_auth_data(auth_data_request)
 
-    def get_auth_data(self, ue_id):
+    def get_auth_data(self, ue_id, count=None, sn_name=DEFAULT_SN_NAME):
+        """Return one authentication vector, or a batch of `count` vectors."""
         print("[UDM] Generating authentication vector")
-        if ue_id not in SUBSCRIBER_DB:
+        batch_size = max(1, min(count or 1, MAX_BATCH_SIZE))
+        reserved = self.subscribers.reserve_sqn(ue_id, batch_size)
+        if reserved is None:
             return {"status": "ue_not_found"}
         
-        subscriber = SUBSCRIBER_DB[ue_id]
+        subscriber, first_sqn = reserved
+        k = bytes.fromhex(subscriber['k'].removeprefix("0x"))
+        vectors = [self.generate_vector(k, sqn, sn_name) for sqn in range(first_sqn, first_sqn + batch_size)]
         
-        # In real implementation, would generate RAND, AUTN, etc.
-        # Simplified for demonstration
+        if count is None:
+            return dict(vectors[0], status="success")
+        return {"status": "success", "vectors": vectors}
+
+    def generate_vector(self, k, sqn, sn_name):
+        rand = os.urandom(16)
+        ck_ik, ak, mac_a = self.milenage(k, rand, sqn)
+        sqn_xor_ak = (sqn ^ int.from_bytes(ak, "big")).to_bytes(6, "big")
         return {
-            "status": "success",
-            "k_ausf": self.derive_k_ausf(subscriber['k']),
-            "rand": "0x1234567890abcdef1234567890abcdef",
-            "autn": "0xabcdef1234567890abcdef1234567890"
+            "k_ausf": derive_k_ausf(ck_ik, sqn_xor_ak, sn_name).hex(),
+            "rand": f"0x{rand.hex()}",
+            "autn": f"0x{sqn_xor_ak.hex()}8000{mac_a.hex()}",
+            "sqn": sqn
         }
 
-    def derive_k_ausf(self, k):
-        # Simplified key derivation
-        return f"K_AUSF_derived_from_{k[:10]}"
+    def milenage(self, k, rand, sqn):
+        # In real implementation CK, IK, AK and MAC-A come from Milenage f1-f5
+        # Simplified with HMAC-SHA-256 for demonstration
+        ck_ik = hmac.digest(k, b"CK_IK" + rand, "sha256")
+        ak = hmac.digest(k, b"AK" + rand, "sha256")[:6]
+        mac_a = hmac.digest(k, b"MAC_A" + sqn.to_bytes(6, "big") + rand + b"\x80\x00", "sha256")[:8]
+        return ck_ik, ak, mac_a
+
+    def routes(self):
+        return {'/auth_data': self.handle_auth_data}
+
+    def async_routes(self):
+        return {'/auth_data': self.handle_auth_data_async}
+
+def open_subscriber_store():
+    if SUBSCRIBER_DB_PATH:
+        return SubscriberStore(SUBSCRIBER_DB_PATH)
+    store = SubscriberStore(MEMORY_DB)
+    store.import_rows((imsi, sub['k'], sub['opc'], sub['sqn']) for imsi, sub in SUBSCRIBER_DB.items())
+    return store
 
-udm = UDM()
+udm = UDM(open_subscriber_store())
+metrics.gauge("subscribers", lambda: len(udm.subscribers))
 
 @app.route('/auth_data', methods=['POST'])
 def auth_data():
     data = request.json
-    response = udm.get_auth_data(data['ue_id'])
+    response = udm.handle_auth_data(data)
     return jsonify(response)
 
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5004)
\ No newline at end of file
+    if RUNTIME == "async":
+        run_async(udm.async_routes(), port=5004, tracer=tracer, metrics=metrics)
+    else:
+        app.run(host='0.0.0.0', port=5004)
\ No newline at end of file
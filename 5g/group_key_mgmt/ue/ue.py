@@ -3,14 +3,19 @@ import threading
 import time
 import subprocess
 
+from common.metrics import Metrics
+
 app = Flask(__name__)
+metrics = Metrics("ue")
+metrics.instrument(app)
 
 class UE:
     def __init__(self):
         self.registered = False
         self.ue_id = "imsi-001010000000001"
         self.ip_address = None
-        self.default_gateway = "10.10.0.2"  # UPF's GTP interface
+        self.default_gateway = "10.10.0.2"  # UPF's GTP interface, until a session names it
+        self.prefix_length = 24
         
     def register(self):
         print(f"[UE {self.ue_id}] Starting registration procedure")
@@ -20,14 +25,19 @@ class UE:
 
     def configure_network(self, session_info):
         self.ip_address = session_info['ue_ip']
+        # The SMF reports the pool subnet and gateway with the address
+        if 'subnet' in session_info:
+            self.prefix_length = int(session_info['subnet'].rpartition('/')[2])
+        self.default_gateway = session_info.get('ue_gateway', self.default_gateway)
         
         # Configure UE network interface
-        subprocess.run(f"sudo ip addr add {self.ip_address}/24 dev eth0", shell=True)
+        subprocess.run(f"sudo ip addr add {self.ip_address}/{self.prefix_length} dev eth0", shell=True)
         subprocess.run(f"sudo ip route add default via {self.default_gateway}", shell=True)
         
     # def test_internet(self):
     #     return subprocess.run("ping -c 4 8.8.8.8", shell=True, capture_output=True)
 ue = UE()
+metrics.gauge("registered", lambda: int(ue.registered))
 
 @app.route('/register', methods=['POST'])
 def handle_register():
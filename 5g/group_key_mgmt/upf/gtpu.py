@@ -0,0 +1,134 @@
+import selectors
+import socket
+import struct
+
+GTPU_PORT = 2152
+# Version 1, protocol type GTP, no optional fields
+GTPU_FLAGS = 0x30
+GTPU_ECHO_REQUEST = 1
+GTPU_ECHO_RESPONSE = 2
+GTPU_G_PDU = 0xff
+GTPU_HEADER = struct.Struct("!BBHI")
+# Flags (E, S, PN) that add the 4-byte sequence/N-PDU/next-extension word
+GTPU_OPTIONAL_FIELDS = 0x07
+GTPU_EXTENSION_FLAG = 0x04
+
+MAX_PACKET = 65535
+# Datagrams drained per readiness event before going back to select()
+RECV_BATCH = 64
+
+class GTPUDataPath:
+    """User-space GTP-U forwarding between N3 (gNB side) and N6 (data network).
+
+    Uplink G-PDUs are looked up by TEID in the session table and their inner
+    IP packet is sent to the N6 peer. Downlink IP packets from N6 are looked
+    up by destination address and sent to the session's gNB tunnel. Each
+    direction receives into one preallocated buffer; the GTP-U header is
+    written in front of the payload in place, so no packet is copied.
+
+    N6 carries raw IP packets over UDP, which stands in for a TUN device and
+    needs no privileges.
+    """
+
+    def __init__(self, sessions, n3_address=("0.0.0.0", GTPU_PORT), n6_address=("0.0.0.0", 0), n6_peer=None):
+        self.sessions = sessions
+        self.n6_peer = n6_peer
+        self.n3 = self._bind(n3_address)
+        self.n6 = self._bind(n6_address)
+        # Uplink payloads are sent from inside this buffer
+        self.uplink_buffer = bytearray(MAX_PACKET)
+        self.uplink_view = memoryview(self.uplink_buffer)
+        # Downlink packets land after room for the header we prepend
+        self.downlink_buffer = bytearray(GTPU_HEADER.size + MAX_PACKET)
+        self.downlink_view = memoryview(self.downlink_buffer)
+        self.stats = {"uplink": 0, "downlink": 0, "echo": 0, "dropped": 0, "malformed": 0}
+        self.running = False
+
+    def _bind(self, address):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4 << 20)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 4 << 20)
+        sock.bind(address)
+        sock.setblocking(False)
+        return sock
+
+    def handle_uplink(self):
+        buf, view = self.uplink_buffer, self.uplink_view
+        for _ in range(RECV_BATCH):
+            try:
+                n, source = self.n3.recvfrom_into(buf)
+            except BlockingIOError:
+                return
+            if n < GTPU_HEADER.size:
+                self.stats["dropped"] += 1
+                continue
+            flags, message_type, length, teid = GTPU_HEADER.unpack_from(buf)
+            if message_type == GTPU_ECHO_REQUEST:
+                # Same header and sequence number back, only the type changes
+                GTPU_HEADER.pack_into(buf, 0, flags, GTPU_ECHO_RESPONSE, length, 0)
+                self.n3.sendto(view[:min(n, GTPU_HEADER.size + length)], source)
+                self.stats["echo"] += 1
+                continue
+            session = self.sessions.lookup_teid(teid)
+            if message_type != GTPU_G_PDU or session is None or self.n6_peer is None:
+                self.stats["dropped"] += 1
+                continue
+            offset = GTPU_HEADER.size
+            if flags & GTPU_OPTIONAL_FIELDS:
+                offset += 4
+                if offset > n:
+                    self.stats["malformed"] += 1
+                    continue
+                next_extension = buf[offset - 1] if flags & GTPU_EXTENSION_FLAG else 0
+                # Extension header length is in 4-byte units, its last byte is
+                # the next type; a zero length or one past the packet is malformed
+                while next_extension and offset < n and buf[offset] and offset + buf[offset] * 4 <= n:
+                    offset += buf[offset] * 4
+                    next_extension = buf[offset - 1]
+                if next_extension:
+                    self.stats["malformed"] += 1
+                    continue
+            end = GTPU_HEADER.size + length
+            if offset >= end or end > n:
+                self.stats["dropped"] += 1
+                continue
+            self.n6.sendto(view[offset:end], self.n6_peer)
+            self.stats["uplink"] += 1
+
+    def handle_downlink(self):
+        buf, view = self.downlink_buffer, self.downlink_view
+        payload = view[GTPU_HEADER.size:]
+        for _ in range(RECV_BATCH):
+            try:
+                n = self.n6.recv_into(payload)
+            except BlockingIOError:
+                return
+            # Destination address of the inner IPv4 packet
+            session = self.sessions.lookup_ip(bytes(payload[16:20])) if n >= 20 else None
+            if session is None or session.gnb_address is None:
+                self.stats["dropped"] += 1
+                continue
+            GTPU_HEADER.pack_into(buf, 0, GTPU_FLAGS, GTPU_G_PDU, n, session.gnb_teid)
+            self.n3.sendto(view[:GTPU_HEADER.size + n], session.gnb_address)
+            self.stats["downlink"] += 1
+
+    def serve(self):
+        self.running = True
+        with selectors.DefaultSelector() as selector:
+            selector.register(self.n3, selectors.EVENT_READ, self.handle_uplink)
+            selector.register(self.n6, selectors.EVENT_READ, self.handle_downlink)
+            while self.running:
+                for key, _ in selector.select(timeout=0.5):
+                    key.data()
+
+    def stop(self):
+        self.running = False
+
+    def close(self):
+        self.n3.close()
+        self.n6.close()
+
+
+def parse_address(value, default_port):
+    host, _, port = value.rpartition(":")
+    return (host, int(port)) if host else (value, default_port)
@@ -0,0 +1,219 @@
+import itertools
+import socket
+import subprocess
+import threading
+
+GTP_DEVICE = "gtp0"
+# Chain holding the per-UE forwarding rules, so they never pile up in FORWARD
+SESSION_CHAIN = "UPF-SESSIONS"
+
+class Session:
+    """One PFCP-style session: an uplink PDR matching the local TEID, a
+    downlink PDR matching the UE address, and the FAR both forward through."""
+
+    __slots__ = ("ue_id", "teid", "ue_ip", "k_up_enc", "gnb_teid", "gnb_address")
+
+    def __init__(self, ue_id, teid, ue_ip, k_up_enc, gnb_teid=None, gnb_address=None):
+        self.ue_id = ue_id
+        self.teid = teid
+        self.ue_ip = ue_ip
+        self.k_up_enc = k_up_enc
+        # Downlink tunnel endpoint on the gNB, (host, port)
+        self.gnb_teid = gnb_teid
+        self.gnb_address = gnb_address
+
+    def pdrs(self):
+        uplink = {"pdr_id": 1, "source_interface": "access", "teid": self.teid, "far_id": 1}
+        if self.ue_ip is None:
+            return [uplink]
+        return [uplink, {"pdr_id": 2, "source_interface": "core", "ue_ip": self.ue_ip, "far_id": 1}]
+
+    def far(self):
+        far = {"far_id": 1, "apply_action": "forward", "device": GTP_DEVICE}
+        if self.gnb_address is not None:
+            far["outer_header_creation"] = {"teid": self.gnb_teid, "address": list(self.gnb_address)}
+        return far
+
+    def to_dict(self):
+        return {"ue_id": self.ue_id, "teid": self.teid, "ue_ip": self.ue_ip,
+                "pdrs": self.pdrs(), "far": self.far()}
+
+    def same(self, ue_ip, k_up_enc, gnb_teid, gnb_address):
+        return (self.ue_ip, self.k_up_enc, self.gnb_teid, self.gnb_address) == (ue_ip, k_up_enc, gnb_teid, gnb_address)
+
+
+class SessionTable:
+    """In-memory session table indexed by UE id, by TEID and by UE address.
+
+    establish() is idempotent: re-sending the same session is a dict lookup
+    and changes no rules. Rule changes are queued and applied by flush() in
+    one backend call, however many sessions changed since the last flush;
+    adds the backend could not apply are queued again for the next flush.
+    """
+
+    def __init__(self, backend, first_teid=1):
+        self.backend = backend
+        self.by_ue = {}
+        self.by_teid = {}
+        # Packed IPv4 address -> session, for downlink lookups
+        self.by_ip = {}
+        self.teids = itertools.count(first_teid)
+        self.lock = threading.Lock()
+        # Rule changes not yet applied, keyed by UE address so an add and a
+        # delete of the same address within one batch cancel out
+        self.pending = {}
+
+    def establish(self, ue_id, ue_ip=None, k_up_enc=None, gnb_teid=None, gnb_address=None):
+        with self.lock:
+            session = self.by_ue.get(ue_id)
+            if session is None:
+                session = Session(ue_id, next(self.teids), ue_ip, k_up_enc, gnb_teid, gnb_address)
+                self.by_ue[ue_id] = session
+                self.by_teid[session.teid] = session
+                self._index_ip(session, True)
+                self._queue(ue_ip, True)
+            elif not session.same(ue_ip, k_up_enc, gnb_teid, gnb_address):
+                if session.ue_ip != ue_ip:
+                    self._index_ip(session, False)
+                    self._queue(session.ue_ip, False)
+                    self._queue(ue_ip, True)
+                session.ue_ip = ue_ip
+                session.k_up_enc = k_up_enc
+                session.gnb_teid = gnb_teid
+                session.gnb_address = gnb_address
+                self._index_ip(session, True)
+            return session
+
+    def release(self, ue_id):
+        with self.lock:
+            session = self.by_ue.pop(ue_id, None)
+            if session is None:
+                return None
+            del self.by_teid[session.teid]
+            self._index_ip(session, False)
+            self._queue(session.ue_ip, False)
+            return session
+
+    def lookup_teid(self, teid):
+        return self.by_teid.get(teid)
+
+    def lookup_ip(self, packed_ip):
+        return self.by_ip.get(packed_ip)
+
+    def _index_ip(self, session, add):
+        if session.ue_ip is None:
+            return
+        packed_ip = socket.inet_aton(session.ue_ip)
+        if add:
+            self.by_ip[packed_ip] = session
+        elif self.by_ip.get(packed_ip) is session:
+            del self.by_ip[packed_ip]
+
+    def _queue(self, ue_ip, add):
+        if ue_ip is None:
+            return
+        if self.pending.get(ue_ip) is (not add):
+            # Installed rule removed again (or vice versa) before it was applied
+            del self.pending[ue_ip]
+        else:
+            self.pending[ue_ip] = add
+
+    def flush(self):
+        with self.lock:
+            pending, self.pending = self.pending, {}
+        if not pending:
+            return 0
+        adds = [ue_ip for ue_ip, add in pending.items() if add]
+        removes = [ue_ip for ue_ip, add in pending.items() if not add]
+        failed = self.backend.apply(adds, removes)
+        if failed:
+            with self.lock:
+                for ue_ip in failed:
+                    # A change queued since (e.g. a release) supersedes the retry
+                    self.pending.setdefault(ue_ip, True)
+        return len(pending)
+
+    def __len__(self):
+        return len(self.by_ue)
+
+
+def route_batch(adds, removes):
+    """Input for `ip -batch -`."""
+    lines = [f"route del {ue_ip}/32 dev {GTP_DEVICE}" for ue_ip in removes]
+    lines += [f"route replace {ue_ip}/32 dev {GTP_DEVICE}" for ue_ip in adds]
+    return "\n".join(lines) + "\n"
+
+def forward_batch(adds, removes):
+    """Input for `iptables-restore --noflush`."""
+    lines = ["*filter"]
+    lines += [f"-D {SESSION_CHAIN} -s {ue_ip}/32 -j ACCEPT" for ue_ip in removes]
+    lines += [f"-A {SESSION_CHAIN} -s {ue_ip}/32 -j ACCEPT" for ue_ip in adds]
+    lines.append("COMMIT")
+    return "\n".join(lines) + "\n"
+
+def forward_rule(ue_ip):
+    return [SESSION_CHAIN, "-s", f"{ue_ip}/32", "-j", "ACCEPT"]
+
+def run_batch(command, batch=None):
+    """Runs command with batch on stdin; logs its stderr and returns False if it fails."""
+    result = subprocess.run(command, input=batch, text=True, capture_output=True)
+    if result.returncode:
+        print(f"[UPF] {' '.join(command)} failed ({result.returncode}): {result.stderr.strip()}")
+    return not result.returncode
+
+
+class KernelBackend:
+    """Programs routes and forwarding rules with one ip and one iptables-restore per batch."""
+
+    def setup(self):
+        """One-off chain and NAT setup, safe to repeat."""
+        subprocess.run(["iptables", "-N", SESSION_CHAIN], stderr=subprocess.DEVNULL)
+        if subprocess.run(["iptables", "-C", "FORWARD", "-j", SESSION_CHAIN], stderr=subprocess.DEVNULL).returncode:
+            subprocess.run(["iptables", "-A", "FORWARD", "-j", SESSION_CHAIN], check=True)
+        masquerade = ["POSTROUTING", "-o", "eth0", "-j", "MASQUERADE"]
+        if subprocess.run(["iptables", "-t", "nat", "-C", *masquerade], stderr=subprocess.DEVNULL).returncode:
+            subprocess.run(["iptables", "-t", "nat", "-A", *masquerade], check=True)
+
+    def apply(self, adds, removes):
+        """Applies a batch; returns the adds that failed, to be retried.
+
+        A failed batch is redone one change at a time. Removes that still
+        fail are dropped, their route or rule being gone already; a failed
+        add is rolled back, so it is either retried whole or cancelled by a
+        later remove.
+        """
+        failed = set()
+        # -force keeps going past a route that is already gone, but the
+        # batch does not say which lines failed
+        if not run_batch(["ip", "-force", "-batch", "-"], route_batch(adds, removes)):
+            for ue_ip in removes:
+                run_batch(["ip", "route", "del", f"{ue_ip}/32", "dev", GTP_DEVICE])
+            failed.update(ue_ip for ue_ip in adds
+                          if not run_batch(["ip", "route", "replace", f"{ue_ip}/32", "dev", GTP_DEVICE]))
+        # iptables-restore applies all of a batch or none of it
+        if not run_batch(["iptables-restore", "--noflush"], forward_batch(adds, removes)):
+            for ue_ip in removes:
+                run_batch(["iptables", "-D", *forward_rule(ue_ip)])
+            failed.update(ue_ip for ue_ip in adds if not run_batch(["iptables", "-A", *forward_rule(ue_ip)]))
+        for ue_ip in failed:
+            subprocess.run(["ip", "route", "del", f"{ue_ip}/32", "dev", GTP_DEVICE], capture_output=True)
+            subprocess.run(["iptables", "-D", *forward_rule(ue_ip)], capture_output=True)
+        return sorted(failed)
+
+
+class DryRunBackend:
+    """Renders the same batches without running them, counting what would be applied."""
+
+    def __init__(self):
+        self.batches = 0
+        self.rules = 0
+
+    def setup(self):
+        pass
+
+    def apply(self, adds, removes):
+        route_batch(adds, removes)
+        forward_batch(adds, removes)
+        self.batches += 1
+        self.rules += len(adds) + len(removes)
+        return []
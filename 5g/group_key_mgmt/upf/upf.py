@@ -1,7 +1,46 @@
-from flask import Flask
+from flask import Flask, request
+import asyncio
+import ipaddress
+import os
 import subprocess
+import threading
+import time
+
+from common.aio_server import RUNTIME, run_async
+from common.metrics import Metrics
+from common.tracing import Tracer
+from gtpu import GTPU_PORT, GTPUDataPath, parse_address
+from session_table import GTP_DEVICE, DryRunBackend, KernelBackend, SessionTable
 
 app = Flask(__name__)
+tracer = Tracer("upf")
+tracer.instrument(app)
+metrics = Metrics("upf")
+metrics.instrument(app)
+
+# Skip host network commands, for running without containers (see loadgen.py)
+DRY_RUN = os.environ.get("NF_DRY_RUN") == "1"
+# Seconds between forwarding-rule batches
+RULE_FLUSH_INTERVAL = float(os.environ.get("UPF_RULE_FLUSH_INTERVAL", "0.05"))
+# "kernel" uses the gtp module, "userspace" forwards GTP-U in this process (see gtpu.py)
+DATAPATH = os.environ.get("UPF_DATAPATH", "kernel")
+# Userspace data path: N3 listen address and where decapsulated packets go
+N3_ADDRESS = parse_address(os.environ.get("UPF_N3_ADDRESS", f"0.0.0.0:{GTPU_PORT}"), GTPU_PORT)
+N6_PEER = os.environ.get("UPF_N6_PEER")
+# UE subnet of /configure requests that do not name one (the SMF's default pool)
+DEFAULT_SUBNET = ipaddress.IPv4Network(os.environ.get("UPF_DEFAULT_SUBNET", "10.10.0.0/16"))
+# gtp0's host in every UE subnet, the UEs' gateway (ip_pool.UPF_HOST in the SMF)
+GATEWAY_HOST = 2
+
+USERSPACE = DATAPATH == "userspace"
+sessions = SessionTable(DryRunBackend() if DRY_RUN or USERSPACE else KernelBackend())
+metrics.gauge("sessions", lambda: len(sessions))
+metrics.gauge("pending_rules", lambda: len(sessions.pending))
+setup_lock = threading.Lock()
+interface_ready = False
+datapath = None
+# UE subnets gtp0 has an address in
+subnets = set()
 
 # def create_gtp_interface():
 #     try:
@@ -27,38 +66,115 @@ app = Flask(__name__)
 #         print(f"GTP creation failed: {e}")
 #         return False
 def create_gtp_interface():
+    if subprocess.run(["ip", "link", "show", GTP_DEVICE], capture_output=True).returncode == 0:
+        return True
     try:
         subprocess.run(["modprobe", "gtp"], check=True)
         subprocess.run([
             "ip", "link", "add", "gtp0", "type", "gtp",
             "role", "upf"
         ], check=True)
-        subprocess.run([
-            "ip", "addr", "add", "10.10.0.1/24", "dev", "gtp0"
-        ], check=True)
         subprocess.run(["ip", "link", "set", "gtp0", "up"], check=True)
         return True
     except subprocess.CalledProcessError as e:
         print(f"GTP creation failed: {e}")
         return False
 
-@app.route('/configure', methods=['POST'])
-def configure():
-    if not create_gtp_interface():
-        return {"status": "GTP interface creation failed"}, 500
-    
-    # Configure NATs
-    subprocess.run([
-        "iptables", "-t", "nat", "-A", "POSTROUTING",
-        "-o", "eth0", "-j", "MASQUERADE"
-    ])
-    
-    return {
+def add_subnet(network):
+    # The gateway address of each UE subnet goes on gtp0 once, so the
+    # subnet is routed to it whatever its size
+    with setup_lock:
+        if network in subnets:
+            return True
+        if not (DRY_RUN or USERSPACE):
+            gateway = f"{network.network_address + GATEWAY_HOST}/{network.prefixlen}"
+            if subprocess.run(["ip", "addr", "replace", gateway, "dev", GTP_DEVICE]).returncode:
+                print(f"[UPF] Adding {gateway} to {GTP_DEVICE} failed")
+                return False
+        subnets.add(network)
+        return True
+
+def setup_interface():
+    # Interface, chain and NAT setup run once per process, not per session
+    global interface_ready, datapath
+    with setup_lock:
+        if interface_ready:
+            return True
+        if USERSPACE:
+            datapath = GTPUDataPath(sessions, N3_ADDRESS, n6_peer=parse_address(N6_PEER, 0) if N6_PEER else None)
+            threading.Thread(target=datapath.serve, daemon=True).start()
+        elif not DRY_RUN:
+            if not create_gtp_interface():
+                return False
+            sessions.backend.setup()
+        threading.Thread(target=flush_rules, daemon=True).start()
+        interface_ready = True
+        return True
+
+def flush_rules():
+    # Sessions configured within one interval share a single batch
+    while True:
+        time.sleep(RULE_FLUSH_INTERVAL)
+        try:
+            sessions.flush()
+        except OSError as e:
+            print(f"[UPF] Rule batch failed: {e}")
+
+def configure_upf(configure_request=None):
+    if not interface_ready:
+        with tracer.span("upf setup_interface"):
+            ready = setup_interface()
+        if not ready:
+            return {"status": "GTP interface creation failed"}, 500
+
+    subnet = (configure_request or {}).get('subnet')
+    network = ipaddress.IPv4Network(subnet) if subnet else DEFAULT_SUBNET
+    if network not in subnets and not add_subnet(network):
+        return {"status": f"GTP address for {network} failed"}, 500
+
+    response = {
         "status": "UPF configured",
-        "gtp_interface": "gtp0",
-        "ue_gateway": "10.10.0.2",
-        "subnet": "10.10.0.0/24"
+        "gtp_interface": GTP_DEVICE,
+        "ue_gateway": str(network.network_address + GATEWAY_HOST),
+        "subnet": str(network)
     }
+    if configure_request and 'ue_id' in configure_request:
+        # Downlink tunnel on the gNB, {"teid": ..., "address": "host:port"}
+        gnb_tunnel = configure_request.get('gnb_tunnel') or {}
+        gnb_address = parse_address(gnb_tunnel['address'], GTPU_PORT) if 'address' in gnb_tunnel else None
+        session = sessions.establish(configure_request['ue_id'], configure_request.get('ue_ip'),
+                                     configure_request.get('k_up_enc'), gnb_tunnel.get('teid'), gnb_address)
+        response["teid"] = session.teid
+    return response
+
+def release_session(release_request):
+    session = sessions.release(release_request['ue_id'])
+    if session is None:
+        return {"status": "session_not_found"}, 404
+    return {"status": "released", "teid": session.teid}
+
+@app.route('/configure', methods=['POST'])
+def configure():
+    return configure_upf(request.get_json(silent=True))
+
+@app.route('/release', methods=['POST'])
+def release():
+    return release_session(request.json)
+
+async def configure_async(data):
+    # First call may shell out for interface setup, keep it off the event loop
+    return await asyncio.get_running_loop().run_in_executor(None, configure_upf, data)
+
+async def release_async(data):
+    return release_session(data)
+
+# Handlers for InProcessTransport and the async runtime
+ROUTES = {'/configure': configure_upf, '/release': release_session}
+ASYNC_ROUTES = {'/configure': configure_async, '/release': release_async}
 
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5006)
\ No newline at end of file
+    setup_interface()
+    if RUNTIME == "async":
+        run_async(ASYNC_ROUTES, port=5006, tracer=tracer, metrics=metrics)
+    else:
+        app.run(host='0.0.0.0', port=5006)
\ No newline at end of file